@@ -0,0 +1,192 @@
+# ai_backends.py
+"""
+Pluggable LLM backends for ai_logic.
+
+Every backend hands out an OpenAI-shaped client (client.chat.completions.create), built
+lazily on first use so importing the app never needs credentials or network access:
+
+    openai  - the hosted OpenAI API (key from st.secrets or OPENAI_API_KEY)
+    local   - any OpenAI-compatible HTTP server (vLLM, llama.cpp, Ollama) at QBE_AI_BASE_URL
+    fake    - in-process FakeOpenAIClient with configurable latency and output length
+
+The default backend comes from QBE_AI_BACKEND. Each prompt has a Route (ai_logic.PROMPT_ROUTES)
+naming a model tier, max_tokens and temperature; QBE_AI_ROUTES overrides any Route field per
+prompt, including an explicit backend or model, e.g.
+
+    QBE_AI_BACKEND=fake streamlit run app.py
+    QBE_AI_ROUTES='{"PROMPT_CHAMPION_KICKOFF": {"backend": "local", "model": "llama3.1:8b"}}'
+"""
+import dataclasses
+import json
+import os
+import threading
+from dataclasses import dataclass
+
+from ai_resilience import CircuitBreaker
+
+DEFAULT_BACKEND = os.environ.get("QBE_AI_BACKEND", "openai")
+
+# Model per backend for each tier: "heavy" for long-form generation, "light" for short drafts
+MODEL_TIERS = {
+    "openai": {
+        "heavy": os.environ.get("QBE_AI_MODEL", "gpt-4-turbo"),
+        "light": os.environ.get("QBE_AI_LIGHT_MODEL", "gpt-4o-mini"),
+    },
+    "local": {
+        "heavy": os.environ.get("QBE_AI_LOCAL_MODEL", "local-model"),
+        "light": os.environ.get("QBE_AI_LOCAL_LIGHT_MODEL", os.environ.get("QBE_AI_LOCAL_MODEL", "local-model")),
+    },
+    "fake": {"heavy": "fake-model", "light": "fake-model-light"},
+}
+
+# Prompt + completion tokens each model accepts; unknown (e.g. local) models get the conservative default
+CONTEXT_WINDOWS = {
+    "gpt-4-turbo": 128_000,
+    "gpt-4o": 128_000,
+    "gpt-4o-mini": 128_000,
+}
+DEFAULT_CONTEXT_WINDOW = int(os.environ.get("QBE_AI_LOCAL_CONTEXT_WINDOW", 8192))
+
+
+def context_window(model: str) -> int:
+    return CONTEXT_WINDOWS.get(model, DEFAULT_CONTEXT_WINDOW)
+
+
+# 1. Backends
+class LLMBackend:
+    """Base class: subclasses build the OpenAI-shaped client in _create_client()."""
+    name = None
+    supports_stream_usage = True # Accepts stream_options={"include_usage": True}
+
+    def __init__(self):
+        self._client = None
+        self._lock = threading.Lock()
+        self.breaker = CircuitBreaker() # One provider being down must not block the others
+
+    def _create_client(self):
+        raise NotImplementedError
+
+    def get_client(self):
+        """The backend's client, created on first use; None if the backend is not configured."""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._create_client()
+        return self._client
+
+    @property
+    def missing_config_message(self) -> str:
+        return f"The '{self.name}' AI backend is not configured."
+
+
+class OpenAIBackend(LLMBackend):
+    name = "openai"
+
+    def __init__(self, api_key: str = None):
+        super().__init__()
+        self.api_key = api_key
+
+    def _create_client(self):
+        from openai import OpenAI
+
+        api_key = self.api_key or os.environ.get("OPENAI_API_KEY")
+        if not api_key:
+            try:
+                import streamlit as st
+                api_key = st.secrets["OPENAI_API_KEY"]
+            except Exception:
+                return None # This will happen if the secret isn't set
+        return OpenAI(api_key=api_key, max_retries=0) # Retries are handled by ai_resilience
+
+    @property
+    def missing_config_message(self) -> str:
+        return "OpenAI API key is not set. Please add it to your Streamlit secrets."
+
+
+class LocalHTTPBackend(LLMBackend):
+    """An OpenAI-compatible server; most ignore the API key, but the SDK requires one."""
+    name = "local"
+    supports_stream_usage = False # Not universally implemented; completion tokens are counted locally
+
+    def __init__(self, base_url: str = None, api_key: str = None):
+        super().__init__()
+        self.base_url = base_url or os.environ.get("QBE_AI_BASE_URL", "http://localhost:8000/v1")
+        self.api_key = api_key or os.environ.get("QBE_AI_LOCAL_API_KEY", "not-needed")
+
+    def _create_client(self):
+        from openai import OpenAI
+        return OpenAI(base_url=self.base_url, api_key=self.api_key, max_retries=0)
+
+
+class FakeBackend(LLMBackend):
+    """Deterministic in-process stand-in for load tests; latency and length come from env or args."""
+    name = "fake"
+
+    def __init__(self, tokens: int = None, first_token_delay: float = None, per_token_delay: float = None):
+        super().__init__()
+        self.tokens = tokens if tokens is not None else int(os.environ.get("QBE_FAKE_AI_TOKENS", 120))
+        self.first_token_delay = (first_token_delay if first_token_delay is not None
+                                  else float(os.environ.get("QBE_FAKE_AI_FIRST_TOKEN_DELAY", 0.05)))
+        self.per_token_delay = (per_token_delay if per_token_delay is not None
+                                else float(os.environ.get("QBE_FAKE_AI_PER_TOKEN_DELAY", 0.005)))
+
+    def _create_client(self):
+        from fake_ai_client import FakeOpenAIClient
+        return FakeOpenAIClient(tokens=self.tokens, first_token_delay=self.first_token_delay,
+                                per_token_delay=self.per_token_delay)
+
+
+BACKEND_CLASSES = {cls.name: cls for cls in (OpenAIBackend, LocalHTTPBackend, FakeBackend)}
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def get_backend(name: str = None) -> LLMBackend:
+    """Shared backend instance by name (defaults to QBE_AI_BACKEND)."""
+    name = name or DEFAULT_BACKEND
+    if name not in BACKEND_CLASSES:
+        raise ValueError(f"Unknown AI backend '{name}'. Expected one of {sorted(BACKEND_CLASSES)}.")
+    with _backends_lock:
+        if name not in _backends:
+            _backends[name] = BACKEND_CLASSES[name]()
+        return _backends[name]
+
+
+def register_backend(name: str, backend: LLMBackend):
+    """Installs a pre-built backend instance (e.g. a FakeBackend with custom latency in a benchmark)."""
+    with _backends_lock:
+        _backends[name] = backend
+
+
+# 2. Per-Prompt Routing
+@dataclass(frozen=True)
+class Route:
+    tier: str = "heavy"
+    max_tokens: int = 1500
+    temperature: float = 0.7
+    backend: str = None # None = QBE_AI_BACKEND
+    model: str = None   # None = the backend's model for this tier
+
+
+def _load_routes() -> dict:
+    raw = os.environ.get("QBE_AI_ROUTES")
+    if not raw:
+        return {}
+    try:
+        return json.loads(raw)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"QBE_AI_ROUTES is not valid JSON: {e}") from e
+
+
+# Prompt name (e.g. "PROMPT_MANAGER_OARS") -> partial Route fields, applied over the code's table
+ROUTE_OVERRIDES = _load_routes()
+
+
+def resolve_route(prompt_name: str = None, routes: dict = None, default: Route = Route()):
+    """(backend, model, route) for a prompt: its table entry with any QBE_AI_ROUTES override applied."""
+    route = (routes or {}).get(prompt_name, default)
+    if prompt_name in ROUTE_OVERRIDES:
+        route = dataclasses.replace(route, **ROUTE_OVERRIDES[prompt_name])
+    backend = get_backend(route.backend)
+    return backend, route.model or MODEL_TIERS[backend.name][route.tier], route
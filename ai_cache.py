@@ -0,0 +1,139 @@
+# ai_cache.py
+import hashlib
+import os
+import threading
+import time
+
+import sqlalchemy
+
+# 1. Cache Configuration
+# The cache lives in its own SQLite file next to the main app DB so that
+# cache writes never contend with assessment inserts.
+CACHE_DATABASE_URL = os.environ.get("QBE_AI_CACHE_URL", "sqlite:///./qbe_ai_cache.db")
+DEFAULT_TTL_SECONDS = float(os.environ.get("QBE_AI_CACHE_TTL_SECONDS", 24 * 60 * 60))  # Regenerated briefs are reused for a day
+DEFAULT_MAX_ENTRIES = int(os.environ.get("QBE_AI_CACHE_MAX_ENTRIES", 500))            # Size bound before LRU eviction kicks in
+
+cache_metadata = sqlalchemy.MetaData()
+
+ai_response_cache_table = sqlalchemy.Table(
+    "ai_response_cache",
+    cache_metadata,
+    sqlalchemy.Column("cache_key", sqlalchemy.String, primary_key=True),  # sha256 of (model, system, prompt)
+    sqlalchemy.Column("model", sqlalchemy.String),
+    sqlalchemy.Column("response", sqlalchemy.Text),
+    sqlalchemy.Column("created_at", sqlalchemy.Float),      # Drives TTL expiry
+    sqlalchemy.Column("last_accessed", sqlalchemy.Float, index=True),  # Drives LRU eviction
+    sqlalchemy.Column("hit_count", sqlalchemy.Integer, default=0),
+)
+
+
+def make_cache_key(model: str, system_prompt: str, prompt: str) -> str:
+    """Content-addresses a request: identical model + prompts give the same key."""
+    digest = hashlib.sha256()
+    for part in (model, system_prompt, prompt):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")  # Separator so ("ab", "c") != ("a", "bc")
+    return digest.hexdigest()
+
+
+# 2. The Cache
+class AIResponseCache:
+    """Persistent response cache with TTL expiry and size-bounded LRU eviction."""
+
+    def __init__(self, database_url: str = CACHE_DATABASE_URL,
+                 ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.database_url = database_url
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._engine = None
+        self._engine_lock = threading.Lock()
+
+    @property
+    def engine(self):
+        if self._engine is None:
+            with self._engine_lock: # Pool threads can arrive together on a fresh database
+                if self._engine is None:
+                    from database import create_app_engine # WAL profile: concurrent sessions read while others write
+                    engine = create_app_engine(self.database_url)
+                    cache_metadata.create_all(engine)
+                    self._engine = engine # Published only once its tables exist
+        return self._engine
+
+    def get(self, key: str):
+        """Returns the cached response, or None on a miss or expired entry."""
+        table = ai_response_cache_table
+        now = time.time()
+        with self.engine.connect() as conn:
+            row = conn.execute(
+                sqlalchemy.select(table.c.response, table.c.created_at).where(table.c.cache_key == key)
+            ).fetchone()
+
+            if row is None or now - row.created_at > self.ttl_seconds:
+                if row is not None:
+                    conn.execute(sqlalchemy.delete(table).where(table.c.cache_key == key))
+                    conn.commit()
+                with self._lock:
+                    self.misses += 1
+                return None
+
+            conn.execute(
+                sqlalchemy.update(table)
+                .where(table.c.cache_key == key)
+                .values(last_accessed=now, hit_count=table.c.hit_count + 1)
+            )
+            conn.commit()
+
+        with self._lock:
+            self.hits += 1
+        return row.response
+
+    def put(self, key: str, model: str, response: str):
+        """Stores a response and evicts the least recently used entries over the size bound."""
+        table = ai_response_cache_table
+        now = time.time()
+        with self.engine.connect() as conn:
+            conn.execute(sqlalchemy.delete(table).where(table.c.cache_key == key))
+            conn.execute(sqlalchemy.insert(table).values(
+                cache_key=key, model=model, response=response,
+                created_at=now, last_accessed=now, hit_count=0
+            ))
+
+            total = conn.execute(sqlalchemy.select(sqlalchemy.func.count()).select_from(table)).scalar()
+            overflow = total - self.max_entries
+            if overflow > 0:
+                lru_keys = sqlalchemy.select(table.c.cache_key).order_by(table.c.last_accessed).limit(overflow)
+                conn.execute(sqlalchemy.delete(table).where(table.c.cache_key.in_(lru_keys)))
+                with self._lock:
+                    self.evictions += overflow
+            conn.commit()
+
+    def clear(self):
+        """Drops every cached response (e.g. after a prompt library change)."""
+        with self.engine.connect() as conn:
+            conn.execute(sqlalchemy.delete(ai_response_cache_table))
+            conn.commit()
+
+    def stats(self) -> dict:
+        """Returns hit/miss counters for this process plus the current entry count."""
+        with self.engine.connect() as conn:
+            entries = conn.execute(
+                sqlalchemy.select(sqlalchemy.func.count()).select_from(ai_response_cache_table)
+            ).scalar()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "entries": entries,
+            }
+
+
+# Shared process-wide instance used by ai_logic.call_ai_analysis
+response_cache = AIResponseCache()
@@ -0,0 +1,129 @@
+# ai_executor.py
+"""
+Concurrent executor for many AI generation jobs (e.g. a protocol per leader in a cohort).
+
+Jobs run on a bounded thread pool (the OpenAI client is thread-safe) and are admitted
+through two token buckets: one for requests/min and one for tokens/min. Results come back
+in job order, each carrying either the text or its own error.
+
+    results = run_ai_jobs([AIJob(template, payload, system_prompt), ...], max_concurrency=8)
+"""
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+import ai_logic
+
+# 1. Default Limits (per API key; tune to the account's rate-limit tier)
+DEFAULT_MAX_CONCURRENCY = 4
+DEFAULT_REQUESTS_PER_MINUTE = 60
+DEFAULT_TOKENS_PER_MINUTE = 150_000
+DEFAULT_EXPECTED_COMPLETION_TOKENS = 800  # Reserved per job before the real usage is known
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough prompt size (~4 characters per token) used only for rate-limit admission."""
+    return max(1, math.ceil(len(text) / 4))
+
+
+# 2. Rate Limiting
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at rate_per_minute."""
+
+    def __init__(self, rate_per_minute: float, capacity: float = None):
+        self.rate_per_second = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate_per_second)
+        self._updated = now
+
+    def acquire(self, amount: float = 1.0):
+        """Blocks until `amount` tokens are available, then takes them."""
+        amount = min(amount, self.capacity) # A single oversize job must still be admissible
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                wait = (amount - self._tokens) / self.rate_per_second
+            time.sleep(min(wait, 1.0))
+
+    def adjust(self, delta: float):
+        """Corrects an earlier reservation once the real cost is known (positive = charge more)."""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens - delta)
+
+
+# 3. Jobs & Results
+@dataclass
+class AIJob:
+    prompt_template: str
+    data_payload: dict
+    system_prompt: str
+    use_cache: bool = True
+    expected_completion_tokens: int = DEFAULT_EXPECTED_COMPLETION_TOKENS
+
+
+@dataclass
+class AIJobResult:
+    index: int
+    text: str = None
+    error: str = None
+    latency: float = 0.0 # Seconds in the provider call (excludes queued)
+    queued: float = 0.0  # Seconds spent waiting for the rate limiter
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+# 4. The Executor
+def run_ai_jobs(jobs: list, max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                requests_per_minute: float = DEFAULT_REQUESTS_PER_MINUTE,
+                tokens_per_minute: float = DEFAULT_TOKENS_PER_MINUTE,
+                api_client=None, on_result=None) -> list:
+    """
+    Runs AIJobs concurrently under the concurrency and rate limits.
+    Returns AIJobResults in the same order as `jobs`; a failing job never aborts the batch.
+    `on_result(result)` is called from worker threads as each job finishes (e.g. for progress).
+    """
+    request_bucket = TokenBucket(requests_per_minute, capacity=max(1, max_concurrency))
+    token_bucket = TokenBucket(tokens_per_minute)
+
+    def run_one(index: int, job: AIJob) -> AIJobResult:
+        start = time.perf_counter()
+        try:
+            prompt = job.prompt_template.format(**job.data_payload)
+        except (KeyError, IndexError) as e:
+            result = AIJobResult(index=index, error=f"Prompt formatting failed: {e!r}")
+        else:
+            reserved = estimate_tokens(job.system_prompt + prompt) + job.expected_completion_tokens
+            request_bucket.acquire(1)
+            token_bucket.acquire(reserved)
+            call_start = time.perf_counter()
+            queued = call_start - start
+            try:
+                text = ai_logic.generate_completion(job.prompt_template, job.data_payload, job.system_prompt,
+                                                    use_cache=job.use_cache, api_client=api_client)
+                # Charge the real completion size (~4 chars/token) against the reservation
+                token_bucket.adjust(estimate_tokens(text) - job.expected_completion_tokens)
+                result = AIJobResult(index=index, text=text, queued=queued)
+            except Exception as e:
+                result = AIJobResult(index=index, error=f"{type(e).__name__}: {e}", queued=queued)
+            result.latency = time.perf_counter() - call_start
+        if on_result is not None:
+            on_result(result)
+        return result
+
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrency), thread_name_prefix="ai-job") as pool:
+        futures = [pool.submit(run_one, i, job) for i, job in enumerate(jobs)]
+        return [f.result() for f in futures]
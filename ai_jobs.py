@@ -0,0 +1,266 @@
+# ai_jobs.py
+"""
+SQLite-backed queue for AI generations, run by a pool of worker threads.
+
+Pages submit a job and return immediately; workers claim queued jobs, stream the generation
+and save partial output as it arrives, then the final text or the error. A page polls
+(e.g. from an st.fragment with run_every) to show progress, so no Streamlit script thread
+is held during a generation and results survive page switches.
+
+    job_id = job_queue.submit("compliance_brief", {"region": ..., ...}, session_id=sid)
+    job_queue.get(job_id).status   # queued -> running -> succeeded | failed
+"""
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+import sqlalchemy
+
+import ai_logic
+
+logger = logging.getLogger(__name__)
+
+# 1. Configuration
+# Own SQLite file (like ai_cache / ai_telemetry) so job status writes never contend with
+# assessment inserts. Several server processes may share it; claims are atomic.
+JOBS_DATABASE_URL = os.environ.get("QBE_AI_JOBS_URL", "sqlite:///./qbe_ai_jobs.db")
+DEFAULT_WORKERS = int(os.environ.get("QBE_AI_JOB_WORKERS", 4))
+IDLE_POLL_SECONDS = 1.0        # How often idle workers look for jobs queued by other processes
+PROGRESS_FLUSH_SECONDS = 0.5   # How often partial output is saved while streaming
+STALE_RUNNING_SECONDS = 600    # A job "running" this long lost its worker (crash/restart); requeue it
+MAX_JOB_ATTEMPTS = 2           # Including requeues after a lost worker
+RETENTION_SECONDS = 7 * 24 * 60 * 60
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+# Job type -> generator. Each must accept stream=True and return an ai_logic.AIStream.
+JOB_TYPES = {
+    "compliance_brief": ai_logic.run_compliance_brief_generator,
+    "status_anchor_dialogue": ai_logic.run_status_anchor_dialogue,
+    "ldp_protocol": ai_logic.run_ldp_protocol_generator,
+}
+
+jobs_metadata = sqlalchemy.MetaData()
+
+ai_generation_jobs_table = sqlalchemy.Table(
+    "ai_generation_jobs",
+    jobs_metadata,
+    sqlalchemy.Column("id", sqlalchemy.Integer, primary_key=True),
+    sqlalchemy.Column("job_type", sqlalchemy.String),
+    sqlalchemy.Column("session_id", sqlalchemy.String, index=True), # Streamlit session that submitted it
+    sqlalchemy.Column("label", sqlalchemy.String),                  # Shown in the jobs panel
+    sqlalchemy.Column("params", sqlalchemy.Text),                   # JSON kwargs for the generator
+    sqlalchemy.Column("status", sqlalchemy.String, index=True),
+    sqlalchemy.Column("output", sqlalchemy.Text),                   # Partial while running, final on success
+    sqlalchemy.Column("error", sqlalchemy.String),
+    sqlalchemy.Column("error_class", sqlalchemy.String),
+    sqlalchemy.Column("attempts", sqlalchemy.Integer, default=0),
+    sqlalchemy.Column("created_at", sqlalchemy.Float),
+    sqlalchemy.Column("started_at", sqlalchemy.Float),
+    sqlalchemy.Column("finished_at", sqlalchemy.Float),
+)
+
+
+@dataclass
+class GenerationJob:
+    id: int
+    job_type: str
+    session_id: str
+    label: str
+    params: dict
+    status: str
+    output: str = None
+    error: str = None
+    error_class: str = None
+    attempts: int = 0
+    created_at: float = None
+    started_at: float = None
+    finished_at: float = None
+
+    @property
+    def done(self) -> bool:
+        return self.status not in ACTIVE_STATUSES
+
+    @property
+    def elapsed(self) -> float:
+        """Seconds since submission (or total time once finished)."""
+        return (self.finished_at or time.time()) - self.created_at
+
+    @classmethod
+    def from_row(cls, row) -> "GenerationJob":
+        values = dict(row._mapping)
+        values["params"] = json.loads(values["params"] or "{}")
+        return cls(**values)
+
+
+# 2. The Queue
+class AIJobQueue:
+    """Persistent job table plus a lazily started pool of daemon worker threads."""
+
+    def __init__(self, database_url: str = JOBS_DATABASE_URL, workers: int = DEFAULT_WORKERS):
+        self.database_url = database_url
+        self.workers = workers
+        self._engine = None
+        self._engine_lock = threading.Lock()
+        self._threads = []
+        self._wakeup = threading.Condition()
+        self._start_lock = threading.Lock()
+
+    @property
+    def engine(self):
+        if self._engine is None:
+            with self._engine_lock: # Pool threads can arrive together on a fresh database
+                if self._engine is None:
+                    from database import create_app_engine # WAL profile: pages poll while workers write
+                    engine = create_app_engine(self.database_url)
+                    jobs_metadata.create_all(engine)
+                    self._engine = engine # Published only once its tables exist
+        return self._engine
+
+    # --- Producer side (pages) ---
+    def submit(self, job_type: str, params: dict, session_id: str = None, label: str = None) -> int:
+        """Queues a generation and returns its id immediately."""
+        if job_type not in JOB_TYPES:
+            raise ValueError(f"Unknown job type '{job_type}'. Expected one of {sorted(JOB_TYPES)}.")
+        with self.engine.begin() as conn:
+            job_id = conn.execute(sqlalchemy.insert(ai_generation_jobs_table).values(
+                job_type=job_type, session_id=session_id, label=label or job_type, params=json.dumps(params),
+                status=QUEUED, attempts=0, created_at=time.time(),
+            )).inserted_primary_key[0]
+        self.start()
+        with self._wakeup:
+            self._wakeup.notify()
+        return job_id
+
+    def get(self, job_id: int):
+        table = ai_generation_jobs_table
+        with self.engine.connect() as conn:
+            row = conn.execute(sqlalchemy.select(table).where(table.c.id == job_id)).first()
+        return GenerationJob.from_row(row) if row is not None else None
+
+    def jobs_for_session(self, session_id: str, job_types: list = None, limit: int = 20) -> list:
+        """Newest first."""
+        table = ai_generation_jobs_table
+        query = sqlalchemy.select(table).where(table.c.session_id == session_id)
+        if job_types:
+            query = query.where(table.c.job_type.in_(job_types))
+        with self.engine.connect() as conn:
+            rows = conn.execute(query.order_by(table.c.id.desc()).limit(limit)).fetchall()
+        return [GenerationJob.from_row(row) for row in rows]
+
+    # --- Worker side ---
+    def start(self):
+        """Starts the worker pool once per process."""
+        if self._threads:
+            return
+        with self._start_lock:
+            if not self._threads:
+                self._threads = [threading.Thread(target=self._worker, name=f"ai-job-worker-{i}", daemon=True)
+                                 for i in range(self.workers)]
+                for thread in self._threads:
+                    thread.start()
+
+    @staticmethod
+    def _stale_running():
+        table = ai_generation_jobs_table
+        return (table.c.status == RUNNING) & (table.c.started_at < time.time() - STALE_RUNNING_SECONDS)
+
+    def _requeue_stale(self, conn):
+        """Jobs whose worker died mid-run go back to the queue (or fail after MAX_JOB_ATTEMPTS)."""
+        table = ai_generation_jobs_table
+        stale = self._stale_running()
+        conn.execute(sqlalchemy.update(table).where(stale & (table.c.attempts < MAX_JOB_ATTEMPTS))
+                     .values(status=QUEUED, output=None))
+        conn.execute(sqlalchemy.update(table).where(stale).values(
+            status=FAILED, output=None, error="The worker running this job stopped unexpectedly.",
+            error_class="WorkerLost", finished_at=time.time()))
+
+    def _claim(self):
+        """Atomically takes the oldest queued job (safe across threads and processes)."""
+        table = ai_generation_jobs_table
+        with self.engine.connect() as conn: # Plain read first: an idle poll never takes the write lock
+            pending = (table.c.status == QUEUED) | self._stale_running()
+            if conn.execute(sqlalchemy.select(table.c.id).where(pending).limit(1)).first() is None:
+                return None
+        with self.engine.begin() as conn:
+            self._requeue_stale(conn)
+            candidates = conn.execute(
+                sqlalchemy.select(table.c.id).where(table.c.status == QUEUED).order_by(table.c.id).limit(self.workers)
+            ).scalars().all()
+            for job_id in candidates:
+                claimed = conn.execute(
+                    sqlalchemy.update(table).where((table.c.id == job_id) & (table.c.status == QUEUED))
+                    .values(status=RUNNING, started_at=time.time(), attempts=table.c.attempts + 1)
+                ).rowcount
+                if claimed:
+                    return GenerationJob.from_row(conn.execute(sqlalchemy.select(table).where(table.c.id == job_id)).first())
+        return None
+
+    def _update(self, job_id: int, **values):
+        table = ai_generation_jobs_table
+        with self.engine.begin() as conn:
+            conn.execute(sqlalchemy.update(table).where(table.c.id == job_id).values(**values))
+
+    def _run(self, job: GenerationJob):
+        parts = []
+        last_flush = time.monotonic()
+        try:
+            stream = JOB_TYPES[job.job_type](**job.params, stream=True)
+            for piece in stream:
+                parts.append(piece)
+                if time.monotonic() - last_flush >= PROGRESS_FLUSH_SECONDS:
+                    self._update(job.id, output="".join(parts))
+                    last_flush = time.monotonic()
+            result = stream.result
+        except Exception as e: # e.g. bad params; the stream itself never raises
+            result = ai_logic.AIResult.failure(e)
+
+        if result.ok:
+            self._update(job.id, status=SUCCEEDED, output=result.text, finished_at=time.time())
+        else:
+            # The error text is never stored as output
+            self._update(job.id, status=FAILED, output=None, error=result.error,
+                         error_class=result.error_class, finished_at=time.time())
+
+    def _worker(self):
+        last_prune = 0.0
+        while True:
+            try:
+                job = self._claim()
+                if job is None:
+                    if time.monotonic() - last_prune > 3600:
+                        self.prune()
+                        last_prune = time.monotonic()
+                    with self._wakeup:
+                        self._wakeup.wait(IDLE_POLL_SECONDS)
+                    continue
+                self._run(job)
+            except Exception:
+                logger.exception("AI job worker error")
+                time.sleep(IDLE_POLL_SECONDS)
+
+    def prune(self, older_than: float = RETENTION_SECONDS) -> int:
+        """Deletes finished jobs older than the retention window."""
+        table = ai_generation_jobs_table
+        with self.engine.begin() as conn:
+            return conn.execute(sqlalchemy.delete(table).where(
+                table.c.status.in_([SUCCEEDED, FAILED]) & (table.c.finished_at < time.time() - older_than)
+            )).rowcount
+
+    def wait(self, job_id: int, timeout: float = 60.0, poll: float = 0.1):
+        """Blocks until the job finishes (for scripts and benchmarks; pages should poll instead)."""
+        expires = time.monotonic() + timeout
+        while time.monotonic() < expires:
+            job = self.get(job_id)
+            if job is None or job.done:
+                return job
+            time.sleep(poll)
+        return self.get(job_id)
+
+
+# Shared process-wide instance
+job_queue = AIJobQueue()
@@ -1,16 +1,23 @@
 # ai_logic.py
+import logging
+import time
+
 import streamlit as st
-from openai import OpenAI
 import pandas as pd
+from ai_backends import MODEL_TIERS, Route, context_window, resolve_route
+from ai_cache import response_cache, make_cache_key
+from ai_resilience import AIResult, call_with_retries
+from ai_telemetry import track_call
+from text_processing import count_tokens, collapse_near_duplicates, chunk_by_tokens
+
+# 1. The API Client
+# Built lazily by ai_backends for whichever backend a prompt is routed to
+# (QBE_AI_BACKEND / QBE_AI_ROUTES), so importing this module needs no API key.
+_client_override = None
+
+AI_MODEL = MODEL_TIERS["openai"]["heavy"] # Using a strong model
 
-# 1. Initialize the API Client
-# It automatically reads the API key from st.secrets
-try:
-    client = OpenAI(api_key=st.secrets["OPENAI_API_KEY"])
-    API_IS_CONFIGURED = True
-except Exception as e:
-    # This will happen if the secret isn't set
-    API_IS_CONFIGURED = False
+logger = logging.getLogger(__name__)
 
 # 2. Prompt Library
 # Storing prompts here makes them easy to edit
@@ -48,6 +55,51 @@ Here are the survey comments:
 {survey_comments}
 """
 
+# --- NEW PROMPTS FOR MAP-REDUCE ANALYSIS (large friction logs / surveys) ---
+# Map: each batch of comments yields a compact partial theme report.
+PROMPT_THEME_MAP = """
+You are analysing ONE BATCH of a larger set of {source_label}. Other batches are analysed separately and merged later.
+
+For this batch only, list every distinct theme you find. For each theme give:
+- **Theme:** a short name
+- **Sentiment:** Positive, Negative or Mixed
+- **Prevalence:** roughly how many of the comments in this batch raise it
+- **Quotes:** 2 short verbatim quotes
+
+Be terse. No introduction or conclusion.
+
+Here are the comments in this batch:
+{batch_comments}
+"""
+
+# Reduce: merges partial reports; {report_requirements} carries the original report spec.
+PROMPT_THEME_REDUCE = """
+You are merging {partial_count} partial theme reports, each produced from a separate batch of {source_label} ({comment_count} comments in total).
+Combine themes that describe the same issue, weigh them by their prevalence across batches, and keep the strongest quotes.
+
+Then write the final report. {report_requirements}
+
+Here are the partial reports:
+{partial_reports}
+"""
+
+FRICTION_REPORT_REQUIREMENTS = """Your report must:
+1.  Identify 3-5 major, recurring themes (e.g., "Login & IT Issues," "Confusing Communications," "Process Bottlenecks").
+2.  For each theme, provide a 1-2 sentence summary of the core problem.
+3.  For each theme, pull 2-3 representative quotes from the notes to use as evidence.
+4.  Conclude with a 1-paragraph "Executive Summary" that prioritzes the #1 most urgent theme to address.
+
+Format your entire response in clear, professional Markdown."""
+
+SURVEY_REPORT_REQUIREMENTS = """Your report must:
+1.  Provide an overall "Executive Summary" of the general sentiment (e.g., "Overwhelmingly positive," "Mixed but hopeful," "Significant resistance").
+2.  Identify 3-4 "Positive Themes" (what staff liked or are excited about). For each, provide 2 representative quotes.
+3.  Identify 3-4 "Negative Themes" (key risks, points of confusion, or areas of resistance). For each, provide 2 representative quotes.
+4.  Conclude with 3 "Actionable Recommendations" for the Change Manager based on your analysis.
+
+Format your entire response in clear, professional Markdown."""
+# --- END NEW PROMPTS ---
+
 # --- NEW PROMPTS FOR CHAMPION CO-PILOT ---
 
 PROMPT_CHAMPION_KICKOFF = """
@@ -223,65 +275,390 @@ The output MUST contain:
 Format the output clearly using Markdown sections. Do not use generic coach-speak.
 """
 
+# 2b. Prompt Routing
+# Model tier, output cap and temperature per prompt. Short drafts go to the light tier;
+# QBE_AI_ROUTES can override any field (see ai_backends). Unlisted prompts get DEFAULT_ROUTE.
+DEFAULT_ROUTE = Route(tier="heavy", max_tokens=1500, temperature=0.7)
+PROMPT_ROUTES = {
+    "PROMPT_FRICTION_ANALYSIS": Route(tier="heavy", max_tokens=2000, temperature=0.4),
+    "PROMPT_SURVEY_ANALYSIS": Route(tier="heavy", max_tokens=2000, temperature=0.4),
+    "PROMPT_THEME_MAP": Route(tier="light", max_tokens=1200, temperature=0.3),
+    "PROMPT_THEME_REDUCE": Route(tier="heavy", max_tokens=2000, temperature=0.4),
+    "PROMPT_CHAMPION_KICKOFF": Route(tier="light", max_tokens=500, temperature=0.7),
+    "PROMPT_CHAMPION_TALKING_POINTS": Route(tier="light", max_tokens=700, temperature=0.6),
+    "PROMPT_READINESS_PLAN": Route(tier="heavy", max_tokens=1500, temperature=0.5),
+    "PROMPT_COMMS_CAMPAIGN": Route(tier="heavy", max_tokens=2000, temperature=0.7),
+    "PROMPT_MANAGER_BURNOUT": Route(tier="light", max_tokens=700, temperature=0.6),
+    "PROMPT_MANAGER_CRUCIAL_CONVO": Route(tier="light", max_tokens=700, temperature=0.6),
+    "PROMPT_MANAGER_OARS": Route(tier="light", max_tokens=700, temperature=0.6),
+    "PROMPT_COMPLIANCE_BRIEF": Route(tier="heavy", max_tokens=1200, temperature=0.2),
+    "PROMPT_INDIVIDUAL_PROTOCOL": Route(tier="heavy", max_tokens=2500, temperature=0.5),
+    "PROMPT_STATUS_ANCHOR_DIALOGUE": Route(tier="light", max_tokens=800, temperature=0.6),
+}
+MESSAGE_OVERHEAD_TOKENS = 12 # Chat formatting tokens around the system + user messages
+
+
+class PromptTooLargeError(ValueError):
+    """The rendered prompt plus the route's max_tokens would not fit the model's context window."""
+
+
 # 3. API-Calling Functions
-def get_api_client():
-    """Checks for API key and returns client or None."""
-    if not API_IS_CONFIGURED:
-        st.error("OpenAI API key is not set. Please add it to your Streamlit secrets.")
-        return None
-    return client
+_PROMPT_NAMES = None
+
+
+def prompt_name_for(prompt_template: str):
+    """Name of the PROMPT_* constant holding this template (the routing key), or None."""
+    global _PROMPT_NAMES
+    if _PROMPT_NAMES is None:
+        _PROMPT_NAMES = {value: name for name, value in globals().items()
+                         if name.startswith("PROMPT_") and isinstance(value, str)}
+    return _PROMPT_NAMES.get(prompt_template)
 
-def call_ai_analysis(prompt_template: str, data_payload: dict, system_prompt: str) -> str:
-    """A generic function to call the OpenAI API with a dynamic system prompt."""
-    client = get_api_client()
+
+def resolve_prompt_route(prompt_name: str = None):
+    """(backend, model, route) for a prompt."""
+    return resolve_route(prompt_name, PROMPT_ROUTES, DEFAULT_ROUTE)
+
+
+def check_prompt_budget(system_prompt: str, prompt: str, model: str, route: Route) -> int:
+    """Counts the prompt's tokens before sending; raises PromptTooLargeError if the call can't fit."""
+    prompt_tokens = count_tokens(system_prompt, model) + count_tokens(prompt, model) + MESSAGE_OVERHEAD_TOKENS
+    if prompt_tokens + route.max_tokens > context_window(model):
+        raise PromptTooLargeError(
+            f"Prompt is {prompt_tokens:,} tokens; with max_tokens={route.max_tokens:,} it exceeds "
+            f"{model}'s {context_window(model):,}-token context window."
+        )
+    return prompt_tokens
+
+
+def get_api_client(prompt_name: str = None):
+    """Checks the prompt's backend is configured and returns its client or None."""
+    if _client_override is not None:
+        return _client_override
+    backend, _, _ = resolve_prompt_route(prompt_name)
+    client = backend.get_client()
     if client is None:
-        return "AI analysis could not be performed. API key is missing."
+        st.error(backend.missing_config_message)
+    return client
+
+
+def set_api_client(new_client):
+    """
+    Overrides every route with one client (e.g. fake_ai_client.FakeOpenAIClient); None restores routing.
+    While set, the response cache is bypassed (see _cache_enabled).
+    """
+    global _client_override
+    _client_override = new_client
+
+
+def _cache_enabled(api_client=None) -> bool:
+    """
+    Completions from an overriding client are never read from or written to the response cache:
+    they would be stored under the routed model's key and served to real callers.
+    """
+    return api_client is None and _client_override is None
+
+def _cache_scope(model: str, route: Route) -> str:
+    """Cache namespace: a different output cap or temperature must not serve old completions."""
+    return f"{model}|max_tokens={route.max_tokens}|temperature={route.temperature}"
+
 
+def generate_completion(prompt_template: str, data_payload: dict, system_prompt: str,
+                        use_cache: bool = True, api_client=None) -> str:
+    """
+    Renders the prompt and returns the model's completion, raising on any failure.
+    Identical (model, system prompt, rendered prompt) requests are served from
+    the response cache; pass use_cache=False to force a fresh generation.
+    Passing api_client (or set_api_client) bypasses the cache entirely.
+    Transient provider errors are retried within the call's deadline (see ai_resilience).
+    """
+    prompt_name = prompt_name_for(prompt_template)
+    backend, model, route = resolve_prompt_route(prompt_name)
+    cacheable = _cache_enabled(api_client)
+    use_cache = use_cache and cacheable
+    api_client = api_client or get_api_client(prompt_name)
+    if api_client is None:
+        raise RuntimeError("AI analysis could not be performed. API key is missing.")
+
+    # Format the user-facing prompt
+    prompt = prompt_template.format(**data_payload)
+
+    with track_call(prompt_name, backend.name, model) as record:
+        cache_key = make_cache_key(_cache_scope(model, route), system_prompt, prompt)
+        if use_cache:
+            cached = response_cache.get(cache_key)
+            if cached is not None:
+                record.cached = True
+                return cached
+
+        record.prompt_tokens = check_prompt_budget(system_prompt, prompt, model, route)
+
+        def attempt(timeout):
+            return api_client.chat.completions.create(
+                messages=[
+                    {"role": "system", "content": system_prompt}, # <-- Use the new argument
+                    {"role": "user", "content": prompt}
+                ],
+                model=model,
+                max_tokens=route.max_tokens,
+                temperature=route.temperature,
+                timeout=timeout,
+            )
+
+        chat_completion, _ = call_with_retries(attempt, breaker=backend.breaker)
+        choice = chat_completion.choices[0]
+        content = choice.message.content
+        if not content:
+            raise ValueError("The AI service returned an empty completion.")
+
+        usage = getattr(chat_completion, "usage", None)
+        if usage is not None:
+            record.prompt_tokens = usage.prompt_tokens
+            record.completion_tokens = usage.completion_tokens
+        else:
+            record.completion_tokens = count_tokens(content, model)
+        if getattr(choice, "finish_reason", None) == "length":
+            record.truncated = True
+            logger.warning("%s hit its max_tokens=%d route limit; output is truncated", prompt_name, route.max_tokens)
+
+    # Only successful completions are cached (a bypassed call still refreshes the entry)
+    if cacheable:
+        response_cache.put(cache_key, model, content)
+    return content
+
+
+def call_ai_analysis(prompt_template: str, data_payload: dict, system_prompt: str, use_cache: bool = True) -> AIResult:
+    """
+    A generic function to call the OpenAI API with a dynamic system prompt.
+    Never raises: failures come back as an AIResult with ok=False, so callers can keep
+    error text out of anything they persist.
+    """
+    start = time.perf_counter()
+    if get_api_client(prompt_name_for(prompt_template)) is None:
+        return AIResult(error="AI analysis could not be performed. API key is missing.", error_class="MissingAPIKey")
+    try:
+        text = generate_completion(prompt_template, data_payload, system_prompt, use_cache=use_cache)
+    except Exception as e:
+        logger.warning("AI analysis failed: %s: %s", type(e).__name__, e)
+        return AIResult.failure(e, latency=time.perf_counter() - start)
+    return AIResult(text=text, latency=time.perf_counter() - start)
+
+
+class AIStream:
+    """
+    Iterable of text chunks for st.write_stream. Once fully consumed, .result holds the
+    AIResult (the complete text, or the error if the call failed).
+    """
+
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self.result = None
+
+    def __iter__(self):
+        self.result = yield from self._chunks
+
+
+def _stream_chunks(prompt_template: str, data_payload: dict, system_prompt: str, use_cache: bool):
+    """Generator behind AIStream: yields text chunks and returns an AIResult."""
+    prompt_name = prompt_name_for(prompt_template)
+    backend, model, route = resolve_prompt_route(prompt_name)
+    client = get_api_client(prompt_name)
+    if client is None:
+        result = AIResult(error="AI analysis could not be performed. API key is missing.", error_class="MissingAPIKey")
+        yield str(result)
+        return result
+    cacheable = _cache_enabled()
+    use_cache = use_cache and cacheable
+
+    start = time.perf_counter()
+    parts = []
+    attempts = 0
     try:
-        # Format the user-facing prompt
         prompt = prompt_template.format(**data_payload)
-        
-        chat_completion = client.chat.completions.create(
-            messages=[
-                {"role": "system", "content": system_prompt}, # <-- Use the new argument
-                {"role": "user", "content": prompt}
-            ],
-            model="gpt-4-turbo", # Using a strong model
-        )
-        return chat_completion.choices[0].message.content
+
+        with track_call(prompt_name, backend.name, model) as record:
+            cache_key = make_cache_key(_cache_scope(model, route), system_prompt, prompt)
+            if use_cache:
+                cached = response_cache.get(cache_key)
+                if cached is not None:
+                    record.cached = True
+                    yield cached
+                    return AIResult(text=cached, cached=True, latency=time.perf_counter() - start)
+
+            record.prompt_tokens = check_prompt_budget(system_prompt, prompt, model, route)
+            extra = {"stream_options": {"include_usage": True}} if backend.supports_stream_usage else {}
+
+            def attempt(timeout):
+                return client.chat.completions.create(
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": prompt}
+                    ],
+                    model=model,
+                    max_tokens=route.max_tokens,
+                    temperature=route.temperature,
+                    stream=True,
+                    timeout=timeout,
+                    **extra,
+                )
+
+            # Only opening the stream is retried; once text has been shown a failure is final
+            stream, attempts = call_with_retries(attempt, breaker=backend.breaker)
+            usage = finish_reason = None
+            for chunk in stream:
+                usage = getattr(chunk, "usage", None) or usage
+                if not chunk.choices:
+                    continue
+                finish_reason = chunk.choices[0].finish_reason or finish_reason
+                piece = chunk.choices[0].delta.content
+                if not piece:
+                    continue
+                if not parts:
+                    record.ttft = time.perf_counter() - start
+                    logger.info("AI stream time-to-first-token: %.0f ms", record.ttft * 1000)
+                parts.append(piece)
+                yield piece
+
+            content = "".join(parts)
+            if not content:
+                raise ValueError("The AI service returned an empty completion.")
+            if usage is not None:
+                record.prompt_tokens = usage.prompt_tokens
+                record.completion_tokens = usage.completion_tokens
+            else:
+                record.completion_tokens = count_tokens(content, model)
+            if finish_reason == "length":
+                record.truncated = True
+                logger.warning("%s hit its max_tokens=%d route limit; output is truncated", prompt_name, route.max_tokens)
+
+        logger.info("AI stream complete: %d chars in %.0f ms", len(content), (time.perf_counter() - start) * 1000)
+        if cacheable:
+            response_cache.put(cache_key, model, content)
+        return AIResult(text=content, attempts=attempts, latency=time.perf_counter() - start)
     except Exception as e:
-        return f"An error occurred during AI analysis: {e}"
-        
+        logger.warning("AI stream failed after %d chars: %s: %s", len("".join(parts)), type(e).__name__, e)
+        result = AIResult.failure(e, attempts=attempts, latency=time.perf_counter() - start)
+        yield ("\n\n" if parts else "") + str(result)
+        return result
+
 
-def run_friction_analysis(df_friction: pd.DataFrame) -> str:
-    """Analyzes friction notes."""
+def call_ai_analysis_stream(prompt_template: str, data_payload: dict, system_prompt: str, use_cache: bool = True) -> AIStream:
+    """
+    Streaming twin of call_ai_analysis: an AIStream yielding text chunks as the model
+    produces them. Check stream.result.ok after st.write_stream before persisting anything;
+    on failure the error message is shown in place but is not part of a successful result.
+    """
+    return AIStream(_stream_chunks(prompt_template, data_payload, system_prompt, use_cache))
+
+
+def _generate(prompt_template: str, payload: dict, system_prompt: str, use_cache: bool = True, stream: bool = False):
+    """Routes a run_* generator to the blocking call (AIResult) or the streaming call (AIStream)."""
+    if stream:
+        return call_ai_analysis_stream(prompt_template, payload, system_prompt, use_cache=use_cache)
+    return call_ai_analysis(prompt_template, payload, system_prompt, use_cache=use_cache)
+
+
+# --- Map-Reduce Settings for Large Comment Sets ---
+SINGLE_PROMPT_TOKEN_LIMIT = 12_000 # Above this, "auto" mode switches to map-reduce
+MAP_CHUNK_TOKENS = 6_000           # Comment tokens per map call
+REDUCE_INPUT_TOKENS = 12_000       # Partial-report tokens per reduce call (reduces recursively above this)
+MAP_REDUCE_CONCURRENCY = 4
+
+
+def _run_map_reduce(comments: list, total_comments: int, source_label: str, report_requirements: str, system_prompt: str) -> AIResult:
+    """Analyses token-budgeted chunks concurrently, then merges the partial reports."""
+    from ai_executor import AIJob, run_ai_jobs # Local import: ai_executor imports this module
+
+    chunks = chunk_by_tokens(comments, MAP_CHUNK_TOKENS, model=AI_MODEL)
+    if not chunks:
+        return AIResult(error=f"There are no {source_label} to analyse (the column is empty or blank).", error_class="NoComments")
+    map_jobs = [
+        AIJob(PROMPT_THEME_MAP, {"source_label": source_label, "batch_comments": "\n- ".join(chunk)}, system_prompt)
+        for chunk in chunks
+    ]
+    results = run_ai_jobs(map_jobs, max_concurrency=MAP_REDUCE_CONCURRENCY)
+    partials = [r.text for r in results if r.ok]
+    failed = len(results) - len(partials)
+    if not partials:
+        return AIResult(error=f"every batch failed ({results[0].error})", error_class="MapReduceFailed")
+
+    # Reduce in rounds until the partial reports fit into one final call
+    while True:
+        groups = chunk_by_tokens(partials, REDUCE_INPUT_TOKENS, model=AI_MODEL, prefix="", separator="\n\n---\n\n")
+        if len(groups) == 1:
+            break
+        round_jobs = [
+            AIJob(PROMPT_THEME_REDUCE, {
+                "partial_count": len(group), "source_label": source_label, "comment_count": total_comments,
+                "report_requirements": "Output a merged partial theme report in the same terse format as the inputs.",
+                "partial_reports": "\n\n---\n\n".join(group),
+            }, system_prompt)
+            for group in groups
+        ]
+        round_results = run_ai_jobs(round_jobs, max_concurrency=MAP_REDUCE_CONCURRENCY)
+        merged = [r.text for r in round_results if r.ok]
+        if not merged or len(merged) >= len(partials):
+            break # No progress possible; send what we have to the final merge
+        partials = merged
+
+    report = call_ai_analysis(PROMPT_THEME_REDUCE, {
+        "partial_count": len(partials), "source_label": source_label, "comment_count": total_comments,
+        "report_requirements": report_requirements,
+        "partial_reports": "\n\n---\n\n".join(partials),
+    }, system_prompt)
+    if failed and report.ok:
+        report.text += f"\n\n_Note: {failed} of {len(results)} comment batches could not be analysed and are not reflected above._"
+    return report
+
+
+def _analyse_comments(comments: list, prompt_template: str, payload_key: str, source_label: str,
+                      report_requirements: str, system_prompt: str, mode: str) -> AIResult:
+    """
+    Collapses near-duplicate comments (one representative plus a frequency count each),
+    then dispatches to a single prompt or map-reduce ("auto" picks by prompt token count).
+    """
+    collapsed = collapse_near_duplicates(comments)
+    logger.info("Collapsed %d %s into %d representatives (%.1f%% reduction)", collapsed.input_count,
+                source_label, len(collapsed.representatives), collapsed.reduction_ratio * 100)
+
+    bullets = collapsed.as_bullets()
+    comments_string = "\n- ".join(bullets)
+    if mode == "auto":
+        prompt_tokens = count_tokens(prompt_template.format(**{payload_key: comments_string}), AI_MODEL)
+        mode = "map_reduce" if prompt_tokens > SINGLE_PROMPT_TOKEN_LIMIT else "single"
+
+    if mode == "map_reduce":
+        return _run_map_reduce(bullets, collapsed.input_count, source_label, report_requirements, system_prompt)
+    return call_ai_analysis(prompt_template, {payload_key: comments_string}, system_prompt)
+
+
+def run_friction_analysis(df_friction: pd.DataFrame, mode: str = "auto") -> AIResult:
+    """Analyzes friction notes (mode: "auto", "single" or "map_reduce")."""
     system_prompt = 'You are an expert Change Management consultant specializing in "Friction & Sludge Audits."'
-    notes_string = "\n- ".join(df_friction['friction_note'].tolist())
-    payload = {"friction_notes": notes_string}
-    
-    return call_ai_analysis(PROMPT_FRICTION_ANALYSIS, payload, system_prompt)
+    notes = df_friction['friction_note'].dropna().astype(str).tolist()
+    return _analyse_comments(notes, PROMPT_FRICTION_ANALYSIS, "friction_notes", "staff friction notes",
+                             FRICTION_REPORT_REQUIREMENTS, system_prompt, mode)
 
 
-def run_survey_analysis(df_survey: pd.DataFrame, column_name: str) -> str:
-    """Analyzes survey comments from a specific column."""
+def run_survey_analysis(df_survey: pd.DataFrame, column_name: str, mode: str = "auto") -> AIResult:
+    """Analyzes survey comments from a specific column (mode: "auto", "single" or "map_reduce")."""
     system_prompt = "You are a senior analyst on a People & Culture team."
     if column_name not in df_survey.columns:
-        return f"Error: The column '{column_name}' was not found in the uploaded file."
+        return AIResult(error=f"The column '{column_name}' was not found in the uploaded file.", error_class="KeyError")
 
-    comments_string = "\n- ".join(df_survey[column_name].dropna().astype(str).tolist())
-    payload = {"survey_comments": comments_string}
-    
-    return call_ai_analysis(PROMPT_SURVEY_ANALYSIS, payload, system_prompt)
+    comments = df_survey[column_name].dropna().astype(str).tolist()
+    return _analyse_comments(comments, PROMPT_SURVEY_ANALYSIS, "survey_comments", "open-ended staff survey comments",
+                             SURVEY_REPORT_REQUIREMENTS, system_prompt, mode)
 
 
-def run_champion_kickoff_email(project_name: str) -> str:
+def run_champion_kickoff_email(project_name: str) -> AIResult:
     """Generates a champion kick-off email for a project."""
     system_prompt = "You are an expert change manager drafting an inspiring and clear communication."
     payload = {"project_name": project_name}
     return call_ai_analysis(PROMPT_CHAMPION_KICKOFF, payload, system_prompt)
 
 
-def run_champion_talking_points(project_name: str, change_tier: str, behavioural_barrier: str) -> str:
+def run_champion_talking_points(project_name: str, change_tier: str, behavioural_barrier: str) -> AIResult:
     """Generates champion talking points based on project context."""
     system_prompt = "You are an expert change manager creating a strategic brief for your Change Champions."
     payload = {
@@ -291,7 +668,7 @@ def run_champion_talking_points(project_name: str, change_tier: str, behavioural
     }
     return call_ai_analysis(PROMPT_CHAMPION_TALKING_POINTS, payload, system_prompt)
 
-def run_readiness_diagnostic(project_name: str, low_readiness_groups: list, barrier: str, rumor: str) -> str:
+def run_readiness_diagnostic(project_name: str, low_readiness_groups: list, barrier: str, rumor: str) -> AIResult:
     """GenerTATES a change readiness intervention plan."""
     system_prompt = "You are a PhD in Applied Behavioural Science, specializing in change management and the COM-B model."
     payload = {
@@ -304,7 +681,7 @@ def run_readiness_diagnostic(project_name: str, low_readiness_groups: list, barr
 
 
 # --- NEW FUNCTION FOR COMMS CAMPAIGN ---
-def run_comms_campaign_generator(project_name: str, audience_segments: list, narrative: str, tough_question: str) -> str:
+def run_comms_campaign_generator(project_name: str, audience_segments: list, narrative: str, tough_question: str) -> AIResult:
     """Generates a full behavioral communications campaign plan."""
     system_prompt = "You are a comms expert grounded in behavioral science."
     payload = {
@@ -318,7 +695,7 @@ def run_comms_campaign_generator(project_name: str, audience_segments: list, nar
 
 
 # --- NEW FUNCTION FOR MANAGER CO-PILOT ---
-def run_manager_copilot(tool_choice: str, context: dict) -> str:
+def run_manager_copilot(tool_choice: str, context: dict) -> AIResult:
     """
     Routes the manager's request to the correct AI prompt.
     """
@@ -345,7 +722,7 @@ def run_manager_copilot(tool_choice: str, context: dict) -> str:
             "resistance_statement": context.get("resistance_statement", "I don't think this is a good idea.")
         }
     else:
-        return "Error: Invalid tool choice selected."
+        return AIResult(error="Invalid tool choice selected.", error_class="ValueError")
 
     return call_ai_analysis(prompt_template, payload, system_prompt)
 # --- END NEW FUNCTION ---
@@ -356,8 +733,8 @@ def run_manager_copilot(tool_choice: str, context: dict) -> str:
 # ai_logic.py
 
 
-def run_compliance_brief_generator(region: str, department: str, program_focus: str, vendor_name: str) -> str:
-    """Generates the 1-page compliance and risk brief."""
+def run_compliance_brief_generator(region: str, department: str, program_focus: str, vendor_name: str, use_cache: bool = True, stream: bool = False):
+    """Generates the 1-page compliance and risk brief (an AIStream if stream=True, else an AIResult)."""
     system_prompt = "You are a Group Legal and Risk consultant at QBE, specializing in AI governance."
     payload = {
         "region": region,
@@ -365,13 +742,15 @@ def run_compliance_brief_generator(region: str, department: str, program_focus:
         "program_focus": program_focus,
         "vendor_name": vendor_name
     }
-    return call_ai_analysis(PROMPT_COMPLIANCE_BRIEF, payload, system_prompt)
+    return _generate(PROMPT_COMPLIANCE_BRIEF, payload, system_prompt, use_cache=use_cache, stream=stream)
+
 
+LDP_PROTOCOL_SYSTEM_PROMPT = "You are a PhD in Organizational Psychology and certified Executive Coach, specializing in AI governance."
 
 # Update the function signature and body to handle all 13 inputs
-def run_ldp_protocol_generator(leader_role: str, primary_barrier: str, theme: str, loc_score: int, ambidextrous_score: int, ethical_a: int, ethical_b: str, safety_a: int, safety_b: int, collab_a: int, collab_b: int, growth_a: int, growth_b: int) -> str:
-    """Generates the individualized 90-Day Leadership Development Protocol."""
-    system_prompt = "You are a PhD in Organizational Psychology and certified Executive Coach, specializing in AI governance."
+def run_ldp_protocol_generator(leader_role: str, primary_barrier: str, theme: str, loc_score: int, ambidextrous_score: int, ethical_a: int, ethical_b: str, safety_a: int, safety_b: int, collab_a: int, collab_b: int, growth_a: int, growth_b: int, stream: bool = False):
+    """Generates the individualized 90-Day Leadership Development Protocol (an AIStream if stream=True, else an AIResult)."""
+    system_prompt = LDP_PROTOCOL_SYSTEM_PROMPT
     payload = {
         "leader_role": leader_role,
         "primary_barrier": primary_barrier,
@@ -387,12 +766,12 @@ def run_ldp_protocol_generator(leader_role: str, primary_barrier: str, theme: st
         "growth_a": growth_a,
         "growth_b": growth_b
     }
-    return call_ai_analysis(PROMPT_INDIVIDUAL_PROTOCOL, payload, system_prompt)
+    return _generate(PROMPT_INDIVIDUAL_PROTOCOL, payload, system_prompt, stream=stream)
     
 
 # --- NEW FUNCTION FOR STATUS ANCHOR DIALOGUE ---
-def run_status_anchor_dialogue(leader_role: str, primary_barrier: str, loc_score: int, growth_a: int) -> str:
-    """Generates the personalized Status Anchor Dialogue script."""
+def run_status_anchor_dialogue(leader_role: str, primary_barrier: str, loc_score: int, growth_a: int, use_cache: bool = True, stream: bool = False):
+    """Generates the personalized Status Anchor Dialogue script (an AIStream if stream=True, else an AIResult)."""
     system_prompt = "You are a specialized Executive Coach focused on psychological safety and strategic identity shift."
     payload = {
         "leader_role": leader_role,
@@ -400,7 +779,7 @@ def run_status_anchor_dialogue(leader_role: str, primary_barrier: str, loc_score
         "loc_score": loc_score,
         "growth_a": growth_a
     }
-    return call_ai_analysis(PROMPT_STATUS_ANCHOR_DIALOGUE, payload, system_prompt)
+    return _generate(PROMPT_STATUS_ANCHOR_DIALOGUE, payload, system_prompt, use_cache=use_cache, stream=stream)
     
 
 
@@ -0,0 +1,210 @@
+# ai_resilience.py
+"""
+Deadlines, retries and a circuit breaker around calls to the AI provider.
+
+Every attempt gets a timeout bounded by the call's overall deadline. Transient failures
+(429, 5xx, timeouts, dropped connections) are retried with jittered exponential backoff,
+waiting at least as long as the provider's Retry-After header asks. A circuit breaker
+(one per backend, see ai_backends) stops sending requests for a cool-down period once
+the provider keeps failing, so Streamlit workers fail fast instead of hanging during an
+outage.
+"""
+import email.utils
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass
+
+import openai
+
+logger = logging.getLogger(__name__)
+
+# 1. Default Policy
+AI_CALL_DEADLINE_SECONDS = 120.0   # Total budget per call, across all attempts and waits
+AI_ATTEMPT_TIMEOUT_SECONDS = 60.0  # Upper bound for a single attempt
+AI_MAX_ATTEMPTS = 4
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 20.0
+BREAKER_FAILURE_THRESHOLD = 5      # Consecutive transient failures before the breaker opens
+BREAKER_RESET_SECONDS = 30.0       # How long it stays open before a trial request
+
+RETRYABLE_STATUS_CODES = {408, 409, 429}
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised without contacting the provider while the circuit breaker is open."""
+
+
+class DeadlineExceededError(TimeoutError):
+    """Raised when the call's deadline leaves no time for another attempt."""
+
+
+# 2. Structured Results
+@dataclass
+class AIResult:
+    text: str = None
+    error: str = None
+    error_class: str = None # Exception class name, e.g. "RateLimitError" or "CircuitOpenError"
+    attempts: int = 0
+    latency: float = 0.0
+    cached: bool = False
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    @classmethod
+    def failure(cls, exc: BaseException, attempts: int = 0, latency: float = 0.0) -> "AIResult":
+        return cls(error=str(exc) or type(exc).__name__, error_class=type(exc).__name__,
+                   attempts=attempts, latency=latency)
+
+    def __str__(self) -> str:
+        """Display text: the completion, or a readable error message (never persist the latter)."""
+        if self.ok:
+            return self.text
+        return f"An error occurred during AI analysis: {self.error}"
+
+
+# 3. Error Classification
+def is_retryable(exc: BaseException) -> bool:
+    """True for failures worth another attempt (rate limits, server errors, timeouts, dropped connections)."""
+    if isinstance(exc, (openai.APIConnectionError, TimeoutError, ConnectionError)): # APITimeoutError included
+        return True
+    status = getattr(exc, "status_code", None)
+    return status is not None and (status in RETRYABLE_STATUS_CODES or status >= 500)
+
+
+def retry_after_seconds(exc: BaseException):
+    """Seconds requested by the Retry-After / retry-after-ms headers, or None."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms") is not None:
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if value is None:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            retry_at = email.utils.parsedate_to_datetime(value) # HTTP-date form
+            return max(0.0, retry_at.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, base: float = BACKOFF_BASE_SECONDS, cap: float = BACKOFF_MAX_SECONDS) -> float:
+    """Full-jitter exponential backoff for the given (1-based) failed attempt."""
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+# 4. Circuit Breaker
+class CircuitBreaker:
+    """
+    Thread-safe closed -> open -> half-open breaker. While open, allow() is False until
+    reset_seconds have passed; then one trial request is let through, and its outcome
+    either closes the breaker or re-opens it for another cool-down.
+    """
+
+    def __init__(self, failure_threshold: int = BREAKER_FAILURE_THRESHOLD, reset_seconds: float = BREAKER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            return "half-open" if time.monotonic() - self._opened_at >= self.reset_seconds else "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_seconds or self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or self._failures >= self.failure_threshold:
+                if self._opened_at is None or self._trial_in_flight:
+                    logger.warning("AI circuit breaker opened after %d consecutive failures", self._failures)
+                self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+    def release_trial(self):
+        """Gives back a half-open trial that ended without an outcome (e.g. interrupted), so another can run."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def reset(self):
+        self.record_success()
+
+
+# Fallback for callers that don't bring their own breaker
+circuit_breaker = CircuitBreaker()
+
+
+# 5. The Retry Loop
+def call_with_retries(attempt_fn, deadline: float = AI_CALL_DEADLINE_SECONDS,
+                      attempt_timeout: float = AI_ATTEMPT_TIMEOUT_SECONDS, max_attempts: int = AI_MAX_ATTEMPTS,
+                      breaker: CircuitBreaker = None, sleep=time.sleep):
+    """
+    Calls attempt_fn(timeout) until it succeeds, returning (value, attempts).
+    `timeout` is the seconds this attempt may take (never past the deadline). Non-retryable
+    errors are raised immediately; the last error is raised once attempts, deadline or the
+    breaker run out.
+    """
+    breaker = breaker if breaker is not None else circuit_breaker
+    expires = time.monotonic() + deadline
+    attempt = 0
+    while True:
+        # Deadline first: allow() may claim the half-open trial, which must end in a recorded outcome
+        remaining = expires - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceededError(f"AI call exceeded its {deadline:.0f}s deadline.")
+        if not breaker.allow():
+            raise CircuitOpenError("The AI service is temporarily unavailable (circuit breaker open); try again shortly.")
+
+        attempt += 1
+        try:
+            value = attempt_fn(min(attempt_timeout, remaining))
+        except BaseException as e:
+            if not isinstance(e, Exception): # KeyboardInterrupt, SystemExit, ...
+                breaker.release_trial()
+                raise
+            if not is_retryable(e):
+                breaker.record_success() # The provider answered; a bad request says nothing about its health
+                raise
+            breaker.record_failure()
+            if attempt >= max_attempts:
+                raise
+
+            delay = backoff_delay(attempt)
+            requested = retry_after_seconds(e)
+            if requested is not None:
+                delay = requested + random.uniform(0, BACKOFF_BASE_SECONDS)
+            if delay >= expires - time.monotonic():
+                raise # Waiting would blow the deadline; surface the real error now
+            logger.info("AI attempt %d failed (%s); retrying in %.1fs", attempt, type(e).__name__, delay)
+            sleep(delay)
+            continue
+
+        breaker.record_success()
+        return value, attempt
@@ -0,0 +1,312 @@
+# ai_telemetry.py
+"""
+Per-call latency, token and cost records for AI generations, used to tune ai_logic.PROMPT_ROUTES.
+
+    with track_call("PROMPT_MANAGER_OARS", "openai", "gpt-4o-mini") as record:
+        ...                      # fill record.prompt_tokens / completion_tokens / ttft
+    call_stats.summary()         # p50/p95 latency, tokens and cost per prompt and model
+
+Every record is also appended to the ai_call_log table by a background writer thread, so
+the calling request never waits on the insert; the admin page reads it back for trends.
+"""
+import atexit
+import datetime
+import logging
+import os
+import queue
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+import pandas as pd
+import sqlalchemy
+
+logger = logging.getLogger(__name__)
+
+# USD per 1M tokens (input, output); models not listed (local, fake) are costed at zero
+MODEL_PRICING = {
+    "gpt-4-turbo": (10.00, 30.00),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+}
+STATS_WINDOW = 500 # Recent calls kept per (prompt, model)
+
+# The log lives in its own SQLite file (like ai_cache) so telemetry writes never contend
+# with assessment inserts.
+TELEMETRY_DATABASE_URL = os.environ.get("QBE_AI_TELEMETRY_URL", "sqlite:///./qbe_ai_telemetry.db")
+RETENTION_DAYS = 30
+WRITER_BATCH_SIZE = 200
+WRITER_FLUSH_SECONDS = 1.0
+WRITER_MAX_QUEUE = 10_000 # Records beyond this are dropped (and counted) rather than blocking callers
+
+telemetry_metadata = sqlalchemy.MetaData()
+
+ai_call_log_table = sqlalchemy.Table(
+    "ai_call_log",
+    telemetry_metadata,
+    sqlalchemy.Column("id", sqlalchemy.Integer, primary_key=True),
+    sqlalchemy.Column("called_at", sqlalchemy.DateTime, index=True),  # UTC
+    sqlalchemy.Column("prompt_name", sqlalchemy.String, index=True),
+    sqlalchemy.Column("backend", sqlalchemy.String),
+    sqlalchemy.Column("model", sqlalchemy.String),
+    sqlalchemy.Column("prompt_tokens", sqlalchemy.Integer),
+    sqlalchemy.Column("completion_tokens", sqlalchemy.Integer),
+    sqlalchemy.Column("latency_ms", sqlalchemy.Float),
+    sqlalchemy.Column("ttft_ms", sqlalchemy.Float),       # Time to first byte; streamed calls only
+    sqlalchemy.Column("cached", sqlalchemy.Boolean),
+    sqlalchemy.Column("truncated", sqlalchemy.Boolean),
+    sqlalchemy.Column("error_class", sqlalchemy.String),
+    sqlalchemy.Column("cost_usd", sqlalchemy.Float),
+)
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    input_price, output_price = MODEL_PRICING.get(model, (0.0, 0.0))
+    return ((prompt_tokens or 0) * input_price + (completion_tokens or 0) * output_price) / 1_000_000
+
+
+@dataclass
+class CallRecord:
+    prompt_name: str
+    backend: str
+    model: str
+    started_at: float = field(default_factory=time.time)
+    prompt_tokens: int = None
+    completion_tokens: int = None
+    latency: float = None
+    ttft: float = None         # Time to first streamed token (None for blocking calls)
+    cached: bool = False
+    truncated: bool = False    # Completion stopped at the route's max_tokens
+    error_class: str = None
+    cost: float = 0.0
+
+
+# 1. In-Memory Stats
+class CallStats:
+    """Thread-safe rolling window of CallRecords per (prompt, model)."""
+
+    def __init__(self, window: int = STATS_WINDOW):
+        self._records = defaultdict(lambda: deque(maxlen=window))
+        self._lock = threading.Lock()
+
+    def record(self, record: CallRecord):
+        with self._lock:
+            self._records[(record.prompt_name, record.model)].append(record)
+
+    def records(self) -> list:
+        with self._lock:
+            return [r for window in self._records.values() for r in window]
+
+    def summary(self) -> pd.DataFrame:
+        """One row per (prompt, model): call counts, latency percentiles (ms), mean tokens and total cost."""
+        df = pd.DataFrame([vars(r) for r in self.records()])
+        if df.empty:
+            return df
+        live = df[~df["cached"] & df["error_class"].isna()]
+        summary = df.groupby(["prompt_name", "model"], dropna=False).agg(
+            calls=("latency", "size"),
+            cache_hits=("cached", "sum"),
+            errors=("error_class", "count"),
+            cost_usd=("cost", "sum"),
+        )
+        if not live.empty:
+            latency = live.groupby(["prompt_name", "model"], dropna=False)["latency"]
+            summary["p50_ms"] = latency.quantile(0.50) * 1000
+            summary["p95_ms"] = latency.quantile(0.95) * 1000
+            summary["mean_prompt_tokens"] = live.groupby(["prompt_name", "model"], dropna=False)["prompt_tokens"].mean()
+            summary["mean_completion_tokens"] = live.groupby(["prompt_name", "model"], dropna=False)["completion_tokens"].mean()
+        return summary.reset_index()
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+
+
+# Shared process-wide instance
+call_stats = CallStats()
+
+
+def _utcnow() -> datetime.datetime:
+    """Naive UTC, matching how called_at is stored."""
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+
+def _to_row(record: CallRecord) -> dict:
+    return {
+        "called_at": datetime.datetime.fromtimestamp(record.started_at, datetime.timezone.utc).replace(tzinfo=None),
+        "prompt_name": record.prompt_name,
+        "backend": record.backend,
+        "model": record.model,
+        "prompt_tokens": record.prompt_tokens,
+        "completion_tokens": record.completion_tokens,
+        "latency_ms": record.latency * 1000 if record.latency is not None else None,
+        "ttft_ms": record.ttft * 1000 if record.ttft is not None else None,
+        "cached": record.cached,
+        "truncated": record.truncated,
+        "error_class": record.error_class,
+        "cost_usd": record.cost,
+    }
+
+
+# 2. Background Writer
+class TelemetryWriter:
+    """
+    Daemon thread that drains a bounded queue into ai_call_log in batched inserts.
+    submit() never blocks: when the queue is full the record is dropped and counted.
+    """
+
+    def __init__(self, database_url: str = TELEMETRY_DATABASE_URL, batch_size: int = WRITER_BATCH_SIZE,
+                 flush_seconds: float = WRITER_FLUSH_SECONDS, max_queue: int = WRITER_MAX_QUEUE):
+        self.database_url = database_url
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.dropped = 0
+        self.written = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._engine = None
+        self._engine_lock = threading.Lock()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    @property
+    def engine(self):
+        if self._engine is None:
+            with self._engine_lock: # Pool threads can arrive together on a fresh database
+                if self._engine is None:
+                    from database import create_app_engine # WAL profile: the admin page reads while we write
+                    engine = create_app_engine(self.database_url)
+                    telemetry_metadata.create_all(engine)
+                    self._engine = engine # Published only once its tables exist
+        return self._engine
+
+    def submit(self, record: CallRecord):
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait(_to_row(record))
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="ai-telemetry-writer", daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+
+    def _run(self):
+        last_prune = 0.0
+        while True:
+            rows = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_seconds
+            while len(rows) < self.batch_size:
+                try:
+                    rows.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            try:
+                with self.engine.begin() as conn:
+                    conn.execute(sqlalchemy.insert(ai_call_log_table), rows)
+                    if time.monotonic() - last_prune > 3600:
+                        cutoff = _utcnow() - datetime.timedelta(days=RETENTION_DAYS)
+                        conn.execute(sqlalchemy.delete(ai_call_log_table).where(ai_call_log_table.c.called_at < cutoff))
+                        last_prune = time.monotonic()
+                self.written += len(rows)
+            except Exception:
+                logger.exception("Dropping %d AI telemetry records after a write failure", len(rows))
+                self.dropped += len(rows)
+            finally:
+                for _ in rows:
+                    self._queue.task_done()
+
+    def flush(self, timeout: float = 5.0):
+        """Waits (up to timeout) until every submitted record has been written or dropped."""
+        expires = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < expires:
+            time.sleep(0.01)
+
+
+# Shared process-wide instance
+telemetry_writer = TelemetryWriter()
+
+
+def record_call(record: CallRecord):
+    record.cost = estimate_cost(record.model, record.prompt_tokens, record.completion_tokens) if not record.cached else 0.0
+    call_stats.record(record)
+    telemetry_writer.submit(record)
+    logger.info("AI call %s model=%s latency=%.0fms tokens=%s/%s cost=$%.5f%s%s", record.prompt_name, record.model,
+                (record.latency or 0) * 1000, record.prompt_tokens, record.completion_tokens, record.cost,
+                " (cached)" if record.cached else "", f" error={record.error_class}" if record.error_class else "")
+
+
+@contextmanager
+def track_call(prompt_name: str, backend: str, model: str):
+    """Times the block and records its CallRecord, including the error class if it raises."""
+    record = CallRecord(prompt_name=prompt_name or "unrouted", backend=backend, model=model)
+    start = time.perf_counter()
+    try:
+        yield record
+    except Exception as e:
+        record.error_class = type(e).__name__
+        raise
+    finally:
+        record.latency = time.perf_counter() - start
+        record_call(record)
+
+
+# 3. Reading the Log (admin page)
+def load_call_log(hours: float = 24, engine=None) -> pd.DataFrame:
+    """ai_call_log rows from the last `hours` hours."""
+    engine = engine or telemetry_writer.engine
+    since = _utcnow() - datetime.timedelta(hours=hours)
+    query = sqlalchemy.select(ai_call_log_table).where(ai_call_log_table.c.called_at >= since)
+    with engine.connect() as conn:
+        df = pd.read_sql(query, conn, parse_dates=["called_at"])
+    return df
+
+
+def _percentiles(series: pd.Series, prefix: str) -> dict:
+    values = series.dropna()
+    return {f"{prefix}_p{p}": values.quantile(p / 100) if len(values) else None for p in (50, 95, 99)}
+
+
+def summarize_call_log(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    One row per prompt: call/error/cache counts, latency and TTFT percentiles (ms), tokens
+    and cost. Latency percentiles cover live, successful calls only, so cache hits and
+    fast failures don't flatter them.
+    """
+    rows = []
+    for prompt_name, group in df.groupby("prompt_name"):
+        live = group[~group["cached"].astype(bool) & group["error_class"].isna()]
+        rows.append({
+            "prompt_name": prompt_name,
+            "models": ", ".join(sorted(group["model"].dropna().unique())),
+            "calls": len(group),
+            "errors": int(group["error_class"].notna().sum()),
+            "cache_hit_rate": group["cached"].astype(bool).mean(),
+            **_percentiles(live["latency_ms"], "latency_ms"),
+            "ttft_ms_p50": live["ttft_ms"].dropna().median() if live["ttft_ms"].notna().any() else None,
+            "mean_prompt_tokens": live["prompt_tokens"].mean(),
+            "mean_completion_tokens": live["completion_tokens"].mean(),
+            "total_tokens": int(group["prompt_tokens"].fillna(0).sum() + group["completion_tokens"].fillna(0).sum()),
+            "cost_usd": group["cost_usd"].sum(),
+        })
+    return pd.DataFrame(rows)
+
+
+def call_log_timeseries(df: pd.DataFrame, freq: str = "1h") -> pd.DataFrame:
+    """Per time bucket and prompt: calls, latency p50/p95/p99 (live calls) and total tokens."""
+    if df.empty:
+        return df
+    df = df.assign(bucket=df["called_at"].dt.floor(freq),
+                   tokens=df["prompt_tokens"].fillna(0) + df["completion_tokens"].fillna(0))
+    keys = ["bucket", "prompt_name"]
+    series = df.groupby(keys).agg(calls=("id", "size"), tokens=("tokens", "sum"))
+    live = df[~df["cached"].astype(bool) & df["error_class"].isna()]
+    latency = live.groupby(keys)["latency_ms"]
+    for p in (50, 95, 99):
+        series[f"latency_ms_p{p}"] = latency.quantile(p / 100)
+    return series.reset_index()
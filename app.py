@@ -1,17 +1,26 @@
 # app.py
 
+import uuid
+
 import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from sqlalchemy.sql import insert, select
+from sqlalchemy.sql import insert
 import logic
 import database 
 
 # Import setup
 from database import engine, capability_assessments_table, vendor_registry_table, individual_diagnostics_table
-from logic import curate_pathway, calculate_behavioural_gap, check_compliance_risk, SWP_WORKSTREAMS, EXECUTION_STATUSES, calculate_execution_score
-from ai_logic import run_compliance_brief_generator, run_ldp_protocol_generator, run_status_anchor_dialogue # NEW IMPORT
+from logic import curate_pathway, calculate_behavioural_gap, check_compliance_risk, SWP_WORKSTREAMS, EXECUTION_STATUSES
+from ai_logic import run_ldp_protocol_generator # NEW IMPORT
+from dashboard_data import dashboard_store, fetch_registry_page, REGISTRY_FILTER_COLUMNS, REGISTRY_PAGE_SIZE
+from vendor_registry import vendor_registry
+import ai_telemetry
+import bulk_import
+import pulse_tracking
+import dashboard_aggregates
+from ai_jobs import job_queue, ACTIVE_STATUSES, FAILED
 
 # --- App Configuration ---
 st.set_page_config(
@@ -33,9 +42,9 @@ QBE_AI_PRINCIPLES = [
 
 # --- Helper: Seed Vendors if Empty ---
 def seed_vendors():
-    with engine.connect() as conn:
-        existing = conn.execute(select(vendor_registry_table)).fetchall()
-        if not existing:
+    # The registry is process-wide and only reloads when the table changes, so reruns don't query
+    if not vendor_registry.vendor_names():
+        with engine.connect() as conn:
             conn.execute(insert(vendor_registry_table), logic.DEFAULT_VENDORS)
             conn.commit()
 
@@ -43,6 +52,55 @@ def seed_vendors():
 seed_vendors()
 
 
+# --- Helper: Background AI Jobs ---
+# Generations run on ai_jobs worker threads, so the session's script thread is never held
+# and results survive switching pages. Panels poll the job table while work is in flight.
+JOB_STATUS_ICONS = {"queued": "⏳", "running": "✍️", "succeeded": "✅", "failed": "❌"}
+
+
+def job_session_id():
+    if 'ai_job_session' not in st.session_state:
+        st.session_state['ai_job_session'] = uuid.uuid4().hex
+    return st.session_state['ai_job_session']
+
+
+def _render_jobs(job_type: str, title: str):
+    jobs = job_queue.jobs_for_session(job_session_id(), [job_type], limit=5)
+    if not jobs:
+        return False
+    st.subheader(title)
+    for i, job in enumerate(jobs):
+        header = f"{JOB_STATUS_ICONS.get(job.status, '')} {job.label} · {job.status} ({job.elapsed:.0f}s)"
+        with st.expander(header, expanded=(i == 0)):
+            if job.status == FAILED:
+                st.error(f"Generation failed ({job.error_class}): {job.error}")
+            elif job.output:
+                st.markdown(job.output)
+            else:
+                st.caption("Waiting for a worker…")
+    return any(job.status in ACTIVE_STATUSES for job in jobs)
+
+
+@st.fragment(run_every=2)
+def _live_jobs_panel(job_type: str, title: str):
+    if not _render_jobs(job_type, title):
+        st.rerun() # Everything finished: redraw once with the static panel to stop polling
+
+
+@st.fragment
+def _static_jobs_panel(job_type: str, title: str):
+    _render_jobs(job_type, title)
+
+
+def ai_jobs_panel(job_type: str, title: str):
+    """This session's recent jobs of one type; polls every 2s only while any are in flight."""
+    jobs = job_queue.jobs_for_session(job_session_id(), [job_type], limit=5)
+    if any(job.status in ACTIVE_STATUSES for job in jobs):
+        _live_jobs_panel(job_type, title)
+    else:
+        _static_jobs_panel(job_type, title)
+
+
 # --- NEW PAGE: Individual Coach Architect (LDP Engine) ---
 def ldp_engine_page():
     st.title("👤 Individual Coach Architect (LDP Engine)")
@@ -121,6 +179,7 @@ def ldp_engine_page():
 
 
     # NEW: Status Anchor Dialogue button handler (Moved outside the form to fix StreamlitAPIException)
+    fresh_dialogue = st.checkbox("Force fresh dialogue (skip AI response cache)", key="dialogue_skip_cache")
     if st.button("Generate Status Anchor Dialogue (AI Coach)"):
         # Retrieve context from the last submission/interaction
         context = st.session_state.get('ldp_context', {})
@@ -130,19 +189,16 @@ def ldp_engine_page():
         primary_barrier_context = context.get('primary_barrier', 'Status Threat')
         
         if leader_name or context.get('leader_name'):
-            with st.spinner("Generating personalized coaching dialogue..."):
-                # Call the NEW Status Anchor Dialogue function
-                dialogue_text = run_status_anchor_dialogue(
-                    leader_role=leader_role_context, 
-                    primary_barrier=primary_barrier_context,
-                    # Pass default values if the context dict is empty
-                    loc_score=context.get('loc_score', 6),  
-                    growth_a=context.get('growth_a', 4)
-                )
-                
-                st.session_state['dialogue_output'] = dialogue_text
-                st.session_state['dialogue_run_status'] = 'ready'
-                st.rerun() 
+            # Queue the NEW Status Anchor Dialogue (generated in the background; see the panel below)
+            job_id = job_queue.submit("status_anchor_dialogue", {
+                "leader_role": leader_role_context, 
+                "primary_barrier": primary_barrier_context,
+                # Pass default values if the context dict is empty
+                "loc_score": context.get('loc_score', 6),  
+                "growth_a": context.get('growth_a', 4),
+                "use_cache": not fresh_dialogue,
+            }, session_id=job_session_id(), label=f"Dialogue for {leader_name or context.get('leader_name')}")
+            st.toast(f"Status Anchor Dialogue queued (job #{job_id}). You can keep working or switch pages.")
         else:
             st.warning("Please enter a Leader Name and submit the 90-Day Protocol first.")
             
@@ -150,24 +206,32 @@ def ldp_engine_page():
     if submitted and leader_name:
         context = st.session_state['ldp_context'] # Use latest context dictionary
         
-        with st.spinner("Generating individualized coaching protocol..."):
-            # Call the updated AI function with all 13 inputs
-            protocol = run_ldp_protocol_generator(
-                leader_role=leader_role,
-                primary_barrier=primary_barrier,
-                theme=theme,
-                loc_score=loc_score,
-                ambidextrous_score=ambidextrous_score,
-                ethical_a=ethical_a_score,
-                ethical_b=ethical_b_input, 
-                safety_a=safety_a_score,
-                safety_b=safety_b_score,
-                collab_a=collab_a_score,
-                collab_b=collab_b_score,
-                growth_a=growth_a_score,
-                growth_b=growth_b_score
-            )
-            
+        st.markdown("---")
+        st.subheader("3. 90-Day Development Protocol (AI Coach Output)")
+        # Call the updated AI function with all 13 inputs (streamed; the stream's result carries the full text)
+        protocol_stream = run_ldp_protocol_generator(
+            leader_role=leader_role,
+            primary_barrier=primary_barrier,
+            theme=theme,
+            loc_score=loc_score,
+            ambidextrous_score=ambidextrous_score,
+            ethical_a=ethical_a_score,
+            ethical_b=ethical_b_input, 
+            safety_a=safety_a_score,
+            safety_b=safety_b_score,
+            collab_a=collab_a_score,
+            collab_b=collab_b_score,
+            growth_a=growth_a_score,
+            growth_b=growth_b_score,
+            stream=True
+        )
+        st.write_stream(protocol_stream)
+        protocol_result = protocol_stream.result
+        
+        if not protocol_result.ok:
+            # Never persist an error message as a protocol; the leader can simply be resubmitted
+            st.error(f"Protocol generation failed ({protocol_result.error_class}). Nothing was saved for {leader_name}; please try again.")
+        else:
             # Save the diagnostic result to the DB
             db_record = {
                 "leader_name": leader_name, # Use directly from input
@@ -177,8 +241,8 @@ def ldp_engine_page():
                 "com_b_score": context['com_b_score'],
                 "primary_barrier": context['primary_barrier'],
                 "core_development_theme": context['theme'],
-                "protocol_generated": protocol,
-                
+                "protocol_generated": protocol_result.text,
+            
                 # Saving the 8 New Diagnostic Fields:
                 "ethical_a_score": context['ethical_a'],
                 "ethical_b_score": context['ethical_b'], 
@@ -194,32 +258,13 @@ def ldp_engine_page():
                 conn.commit()
 
 
-        st.success(f"Protocol Generated for {leader_name}. Ready for deployment via AI Coach App.")
-        st.markdown("---")
-        st.subheader("3. 90-Day Development Protocol (AI Coach Output)")
-        st.markdown(protocol)
+            st.success(f"Protocol Generated for {leader_name}. Ready for deployment via AI Coach App.")
         
-        # Display static Coaching Dialogue prompt concept (Optional visual aid)
-        st.caption("Conceptual Model: This protocol forms the core of the personalized AI Coach dialogue prompts (e.g., Conversation Design).")
+            # Display static Coaching Dialogue prompt concept (Optional visual aid)
+            st.caption("Conceptual Model: This protocol forms the core of the personalized AI Coach dialogue prompts (e.g., Conversation Design).")
 
-    # --- Display Logic for the new button (Placed after the main form) ---
-    if st.session_state.get('dialogue_run_status') == 'ready':
-        st.markdown("---")
-        st.subheader("🗣️ Status Anchor Dialogue (Just-in-Time Coaching)")
-        st.markdown(st.session_state['dialogue_output'])
-        # Reset status after displaying
-        st.session_state['dialogue_run_status'] = 'displayed'
-        st.session_state['dialogue_output'] = st.session_state['dialogue_output'] # Keep output for rerun stability
-
-    
-    # --- Display Generated Brief (Below the main form logic) ---
-    if st.session_state.get('brief_run_status') == 'ready':
-         st.subheader("📄 Ethical Risk Brief Output")
-         st.markdown(st.session_state['brief_output'])
-         
-         # Reset run status after displaying
-         st.session_state['brief_run_status'] = 'displayed'
-         st.session_state['brief_output'] = st.session_state['brief_output'] # Keep output for rerun stability
+    # --- Background Dialogue Jobs (Placed after the main form) ---
+    ai_jobs_panel("status_anchor_dialogue", "🗣️ Status Anchor Dialogue (Just-in-Time Coaching)")
 
 # --- 1. The Capability Needs Assessment (Intake) ---
 def intake_form_page():
@@ -263,11 +308,10 @@ def intake_form_page():
         
         learning_need_focus = st.selectbox("Primary Learning Focus", ["Strategic Leadership", "Technical Hard Skills", "Soft Skills & Resilience", "Operational Efficiency"])
         
-        # NEW: Vendor Selection from DB
+        # NEW: Vendor Selection from DB (shared registry snapshot, reloaded only when vendor_registry changes)
         try:
-            vendor_df = pd.read_sql_table("vendor_registry", engine)
-            vendor_list = vendor_df['vendor_name'].tolist()
-        except:
+            vendor_list = vendor_registry.vendor_names()
+        except Exception:
             vendor_list = ["Gartner", "Microsoft"] # Fallback
             
         selected_vendor = st.selectbox("Preferred Vendor (Optional)", ["Auto-Assign"] + vendor_list)
@@ -333,19 +377,19 @@ def intake_form_page():
         
     # --- Handler for the independent AI Brief Button (OUTSIDE THE FORM) ---
     # This button uses the saved state to run the AI without forcing a form submit.
+    fresh_brief = st.checkbox("Force fresh brief (skip AI response cache)", key="brief_skip_cache")
     if st.button("Generate Ethical Risk Brief (AI Tool)"):
         inputs = st.session_state.get('current_form_inputs', {})
         if inputs:
-            with st.spinner("Generating brief for Legal & Risk..."):
-                brief = run_compliance_brief_generator(
-                    region=inputs['region'], 
-                    department=inputs['department'], 
-                    program_focus=inputs['learning_need_focus'], 
-                    vendor_name=inputs['selected_vendor']
-                )
-                st.session_state['brief_output'] = brief
-                st.session_state['brief_run_status'] = 'ready'
-                st.rerun() 
+            # Generated in the background for Legal & Risk; results appear in the panel below
+            job_id = job_queue.submit("compliance_brief", {
+                "region": inputs['region'], 
+                "department": inputs['department'], 
+                "program_focus": inputs['learning_need_focus'], 
+                "vendor_name": inputs['selected_vendor'],
+                "use_cache": not fresh_brief,
+            }, session_id=job_session_id(), label=f"Brief: {inputs['department']} / {inputs['region']}")
+            st.toast(f"Ethical Risk Brief queued (job #{job_id}). You can keep working or switch pages.")
         else:
             st.error("Please fill out the form before generating the brief.")
 
@@ -397,10 +441,12 @@ def intake_form_page():
                 "swp_workstream": swp_workstream # NEW FIELD
             }
 
-            # 3. Save
+            # 3. Save (the dashboard aggregates move in the same transaction)
             with engine.connect() as conn:
                 conn.execute(insert(capability_assessments_table).values(db_record))
+                dashboard_aggregates.record_inserted(conn, [db_record])
                 conn.commit()
+            dashboard_store.invalidate() # New cohort -> cached frame refreshes on next read
 
             # 4. Display Output
             st.success("Assessment Complete. Strategic Pathway Generated.")
@@ -415,14 +461,46 @@ def intake_form_page():
             st.info(f"**Gap Analysis:** {target-baseline} point delta. **{gap_tag}**")
             st.progress(baseline/10)
 
-    # --- Display Generated Brief (Below the main form logic) ---
-    if st.session_state.get('brief_run_status') == 'ready':
-         st.subheader("📄 Ethical Risk Brief Output")
-         st.markdown(st.session_state['brief_output'])
-         
-         # Reset run status after displaying
-         st.session_state['brief_run_status'] = 'displayed'
-         st.session_state['brief_output'] = st.session_state['brief_output'] # Keep output for rerun stability
+    # --- Background Brief Jobs (Below the main form logic) ---
+    ai_jobs_panel("compliance_brief", "📄 Ethical Risk Brief Output")
+
+    bulk_import_panel()
+
+
+def bulk_import_panel():
+    """Spreadsheet upload for many cohorts at once (same validation/curation as bulk_import.py)."""
+    with st.expander("📥 Bulk Import Cohorts (CSV / Parquet)"):
+        st.caption("Columns use the registry field names. Required: " + ", ".join(bulk_import.REQUIRED_COLUMNS)
+                   + ". Leave selected_vendor blank or 'Auto-Assign' to use the curated vendor.")
+        upload = st.file_uploader("Cohort file", type=["csv", "parquet"], key="bulk_import_file")
+        dry_run = st.checkbox("Validate only (don't insert)", key="bulk_import_dry_run")
+        if upload is None or not st.button("Import Cohorts", key="bulk_import_run"):
+            return
+
+        progress = st.progress(0.0, text="Importing…")
+        def on_chunk(summary):
+            progress.progress(min(1.0, upload.tell() / max(upload.size, 1)),
+                              text=f"{summary['read']:,} rows read · {summary['rows_per_sec']:,} rows/s")
+        try:
+            summary = bulk_import.import_file(upload, dry_run=dry_run, on_chunk=on_chunk)
+        except Exception as e:
+            st.error(f"Import failed: {e}")
+            return
+        progress.progress(1.0, text=f"Done in {summary['seconds']}s")
+        if summary["inserted"]:
+            dashboard_store.invalidate() # New cohorts -> cached frame refreshes on next read
+
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Rows Read", f"{summary['read']:,}")
+        col2.metric("Validated" if dry_run else "Inserted", f"{summary['read'] - summary['rejected']:,}")
+        col3.metric("Rejected", f"{summary['rejected']:,}")
+        col4.metric("Throughput", f"{summary['rows_per_sec']:,} rows/s")
+        if summary["rejected_rows"]:
+            st.warning("Rejected rows (not imported):")
+            st.dataframe(pd.DataFrame(summary["rejected_rows"]), use_container_width=True, hide_index=True)
+        if summary["flagged_rows"]:
+            st.error(f"GOVERNANCE RISK WARNING: {summary['flagged']:,} imported cohorts have compliance risks.")
+            st.dataframe(pd.DataFrame(summary["flagged_rows"]), use_container_width=True, hide_index=True)
 
 
 # --- 2. The Global Strategy Dashboard (Enterprise Talent Command Centre) ---
@@ -431,8 +509,8 @@ def strategy_dashboard_page():
     st.markdown("Tracking maturity, investment, and behavioural shifts across the enterprise.")
 
     try:
-        df = pd.read_sql_table("capability_assessments", engine)
-        if df.empty:
+        agg = dashboard_aggregates.load_aggregates() # One row per group, maintained on write
+        if agg.empty:
             st.info("No data yet. Please submit assessments via the 'Capability Assessment' tab.")
             return
     except Exception as e:
@@ -440,12 +518,14 @@ def strategy_dashboard_page():
         return
 
     # Recalculate metrics
-    readiness_data = calculate_execution_score(df)
+    total_cohorts = int(agg['cohort_count'].sum())
+    status_counts = dashboard_aggregates.status_counts(agg)
+    readiness_data = logic.execution_score_from_counts(status_counts.to_dict(), total_cohorts)
     
     # --- Row 1: Metrics ---
     col1, col2, col3, col4 = st.columns(4) 
-    col1.metric("Total Cohorts Assessed", len(df))
-    col2.metric("Total Projected Investment", f"${df['estimated_budget'].sum():,.0f}")
+    col1.metric("Total Cohorts Assessed", total_cohorts)
+    col2.metric("Total Projected Investment", f"${agg['budget_sum'].sum():,.0f}")
     
     # NEW METRIC: Execution Score (Module 3)
     col3.metric("Strategic Execution Score", f"{readiness_data['readiness_score']}%", 
@@ -457,29 +537,16 @@ def strategy_dashboard_page():
     # --- Row 2: Global Heatmap (Tier 1 Feature) ---
     st.subheader("🌍 Global AI Maturity Heatmap")
     
-    # Prepare map data
-    map_data = []
-    maturity_map = {"Skeptic": 1, "Observer": 2, "Experimenter": 3, "Adopter": 4, "Leader": 5}
+    # Prepare map data (per-region score totals -> countries)
+    df_map_agg = dashboard_aggregates.maturity_by_country(agg)
     
-    for index, row in df.iterrows():
-        region = row['region']
-        # Extract first word of maturity string safely
-        mat_str = row['current_maturity'].split(" ")[0] if row['current_maturity'] else "Observer"
-        score = maturity_map.get(mat_str, 2)
-        
-        if region in logic.REGION_ISO_MAP:
-            for iso in logic.REGION_ISO_MAP[region]:
-                map_data.append({"iso_alpha": iso, "maturity": score, "cohort": row['cohort_name']})
-    
-    if map_data:
-        df_map = pd.DataFrame(map_data)
-        df_map_agg = df_map.groupby("iso_alpha")['maturity'].mean().reset_index()
-        
+    if not df_map_agg.empty:
         fig_map = px.choropleth(
             df_map_agg,
             locations="iso_alpha",
             color="maturity",
             hover_name="iso_alpha",
+            hover_data={"cohort_count": True},
             color_continuous_scale="RdYlGn",
             range_color=[1, 5],
             title="Maturity Intensity by Operating Region"
@@ -494,46 +561,214 @@ def strategy_dashboard_page():
     col1, col2 = st.columns(2)
     
     # Chart 3: Program Execution Status (New Donut Chart)
-    fig_exec = px.pie(df, names='execution_status', title='Global Program Execution Status')
+    fig_exec = px.pie(status_counts.reset_index(), names='execution_status', values='cohort_count',
+                      title='Global Program Execution Status')
     col1.plotly_chart(fig_exec, use_container_width=True)
     
     # Chart 4: SWP Workstream Coordination (New Bar Chart)
-    fig_swp = px.histogram(df, x='swp_workstream', title='Coordination: Programs by SWP Workstream')
+    swp_counts = agg.groupby('swp_workstream')['cohort_count'].sum().reset_index()
+    fig_swp = px.bar(swp_counts, x='swp_workstream', y='cohort_count', title='Coordination: Programs by SWP Workstream')
     col2.plotly_chart(fig_swp, use_container_width=True)
     
+    # --- Row 3b: Behavioural Trajectories (from the materialized pulse summary) ---
+    st.markdown("---")
+    behavioural_trajectory_panel()
+
     # --- Row 4: Data ---
+    # Filter choices come from the aggregate groups; the rows themselves are paged from SQL
+    filter_options = {name: sorted(agg[name].dropna().unique().tolist()) for name in REGISTRY_FILTER_COLUMNS}
+    cohort_registry_panel(filter_options)
+    program_status_panel()
+
+
+def behavioural_trajectory_panel():
+    """Progress toward target behaviour scores; reads only behaviour_trajectory_summary, never raw pulses."""
+    st.subheader("📈 Behavioural Shift Trajectories")
+    try:
+        overview = pulse_tracking.trajectory_overview()
+    except Exception as e:
+        st.error(f"Database Error: {e}")
+        return
+
+    if overview.empty:
+        st.info("No pulse check-ins yet. Record one below to start tracking progress against target scores.")
+    else:
+        counts = overview.set_index("trajectory_status")["cohorts"]
+        tracked = int(counts.sum())
+        weighted_progress = (overview["avg_progress_pct"].fillna(0) * overview["cohorts"]).sum() / tracked
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Cohorts Tracked", f"{tracked:,}")
+        col2.metric("Achieved / On Track", f"{int(counts.get('Achieved', 0) + counts.get('On Track', 0)):,}")
+        col3.metric("At Risk / Stalled", f"{int(counts.get('At Risk', 0) + counts.get('Stalled', 0)):,}")
+        col4.metric("Avg Progress to Target", f"{weighted_progress:.0f}%")
+
+        fig_traj = px.bar(overview, x="trajectory_status", y="cohorts", color="trajectory_status",
+                          category_orders={"trajectory_status": pulse_tracking.TRAJECTORY_STATUSES},
+                          title="Cohorts by Trajectory Status")
+        st.plotly_chart(fig_traj, use_container_width=True)
+
+        attention = pulse_tracking.cohorts_needing_attention(limit=20)
+        if not attention.empty:
+            st.caption("Cohorts needing attention (least progress first)")
+            st.dataframe(attention, use_container_width=True, hide_index=True)
+
+    pulse_checkin_panel()
+
+
+def pulse_checkin_panel():
+    with st.expander("📝 Record Pulse Check-ins"):
+        with st.form(key="pulse_checkin_form"):
+            col1, col2, col3 = st.columns(3)
+            assessment_id = col1.number_input("Cohort ID (see Cohort Registry)", min_value=1, step=1)
+            new_score = col2.slider("Observed Behaviour Score (1-10)", 1, 10, 5)
+            check_date = col3.date_input("Check-in Date")
+            notes = st.text_input("Notes (optional)")
+            submitted = st.form_submit_button("Record Check-in")
+        if submitted:
+            try:
+                summary = pulse_tracking.record_pulse(int(assessment_id), new_score, check_date.isoformat(), notes or None)
+            except ValueError as e:
+                st.error(str(e))
+            else:
+                st.success(f"Check-in recorded. Trajectory: {summary['trajectory_status']} · "
+                           f"{summary['progress_pct'] or 0:.0f}% of target · "
+                           f"projected completion {summary['projected_completion_date'] or 'n/a'}")
+
+        st.caption("Bulk check-ins: CSV with assessment_id, check_date (YYYY-MM-DD), new_score and optional notes.")
+        upload = st.file_uploader("Check-in file", type=["csv"], key="pulse_import_file")
+        if upload is not None and st.button("Import Check-ins", key="pulse_import_run"):
+            try:
+                result = pulse_tracking.import_pulses(upload)
+            except Exception as e:
+                st.error(f"Import failed: {e}")
+                return
+            st.success(f"Imported {result['inserted']:,} check-ins ({result.get('rows_per_sec', 0):,} rows/s); "
+                       f"rejected {result['rejected']:,}.")
+            if result["rejected_rows"]:
+                st.dataframe(pd.DataFrame(result["rejected_rows"]), use_container_width=True, hide_index=True)
+
+
+@st.fragment
+def cohort_registry_panel(filter_options: dict):
+    """One page of the registry at a time; filtering and paging rerun only this fragment."""
     st.subheader("Cohort Registry")
-    display_cols = ['cohort_name', 'region', 'audience_level', 'recommended_pathway', 
-                    'execution_status', 'swp_workstream', 'governance_checklist_status']
-    st.dataframe(df[display_cols], use_container_width=True)
+    filter_cols = st.columns(len(REGISTRY_FILTER_COLUMNS))
+    filters = {
+        name: col.multiselect(name.replace("_", " ").title(), filter_options[name], key=f"registry_filter_{name}")
+        for col, name in zip(filter_cols, REGISTRY_FILTER_COLUMNS)
+    }
+
+    # Keyset cursors: the before_id of each page visited so far (None = newest page)
+    filter_key = repr(sorted(filters.items()))
+    if st.session_state.get('registry_filter_key') != filter_key:
+        st.session_state['registry_filter_key'] = filter_key
+        st.session_state['registry_cursors'] = [None]
+    cursors = st.session_state['registry_cursors']
+
+    try:
+        page = fetch_registry_page(filters, before_id=cursors[-1])
+    except Exception as e:
+        st.error(f"Database Error: {e}")
+        return
+    st.dataframe(page.rows.set_index("id"), use_container_width=True) # id = the Cohort ID used for check-ins
+
+    page_count = max(1, -(-page.total // REGISTRY_PAGE_SIZE))
+    col_prev, col_info, col_next = st.columns([1, 3, 1])
+    # Callbacks move the cursor before the fragment reruns, so the new page renders in one pass
+    col_prev.button("← Previous", key="registry_prev", disabled=len(cursors) == 1, on_click=cursors.pop)
+    col_info.caption(f"Page {len(cursors)} of {page_count} · {page.total:,} matching cohorts")
+    col_next.button("Next →", key="registry_next", disabled=page.next_cursor is None,
+                    on_click=cursors.append, args=(page.next_cursor,))
+
+def _apply_program_status():
+    """Form callback: runs before the page reruns, so the dashboard above already shows the new totals."""
+    assessment_id, new_status = int(st.session_state['status_cohort_id']), st.session_state['status_new_status']
+    try:
+        updated = dashboard_aggregates.update_execution_status([assessment_id], new_status)
+    except Exception as e:
+        st.session_state['status_result'] = ("error", f"Database Error: {e}")
+        return
+    if updated:
+        dashboard_store.invalidate(full=True) # An UPDATE doesn't move the incremental watermark
+        st.session_state['status_result'] = ("success", f"Cohort {assessment_id} is now '{new_status}'.")
+    else:
+        st.session_state['status_result'] = ("info", f"No change: cohort {assessment_id} doesn't exist or is already '{new_status}'.")
+
+
+def program_status_panel():
+    """Status changes go through dashboard_aggregates so the dashboard totals move in the same transaction."""
+    with st.expander("🔄 Update Program Status"):
+        with st.form(key="program_status_form"):
+            col1, col2 = st.columns(2)
+            col1.number_input("Cohort ID (see Cohort Registry)", min_value=1, step=1, key="status_cohort_id")
+            col2.selectbox("New Execution Status", EXECUTION_STATUSES, key="status_new_status")
+            st.form_submit_button("Update Status", on_click=_apply_program_status)
+        if 'status_result' in st.session_state:
+            kind, message = st.session_state.pop('status_result')
+            getattr(st, kind)(message)
+
+# --- 3. AI Telemetry (Admin) ---
+def ai_telemetry_page():
+    st.title("📈 AI Call Telemetry (Admin)")
+    st.markdown("Latency, token usage and estimated spend per prompt type, from the `ai_call_log`.")
+
+    window = st.selectbox("Window", ["Last 24 hours", "Last 7 days", "Last 30 days"])
+    hours, freq = {"Last 24 hours": (24, "1h"), "Last 7 days": (24 * 7, "6h"), "Last 30 days": (24 * 30, "1D")}[window]
+
+    try:
+        df = ai_telemetry.load_call_log(hours=hours)
+    except Exception as e:
+        st.error(f"Database Error: {e}")
+        return
+    if df.empty:
+        st.info("No AI calls recorded in this window yet.")
+        return
+
+    # --- Row 1: Metrics ---
+    live = df[~df["cached"].astype(bool) & df["error_class"].isna()]
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("AI Calls", f"{len(df):,}")
+    col2.metric("p95 Latency", f"{live['latency_ms'].quantile(0.95) / 1000:,.1f}s" if not live.empty else "n/a")
+    col3.metric("Tokens", f"{int(df['prompt_tokens'].fillna(0).sum() + df['completion_tokens'].fillna(0).sum()):,}")
+    col4.metric("Est. Spend", f"${df['cost_usd'].sum():,.2f}")
+
+    # --- Row 2: Per-Prompt Summary ---
+    st.subheader("Per Prompt Type")
+    st.dataframe(ai_telemetry.summarize_call_log(df).round(1), use_container_width=True)
+
+    # --- Row 3: Trends ---
+    series = ai_telemetry.call_log_timeseries(df, freq=freq)
+    percentile = st.radio("Latency percentile", ["latency_ms_p50", "latency_ms_p95", "latency_ms_p99"], index=1, horizontal=True)
+    col1, col2 = st.columns(2)
+    fig_latency = px.line(series, x="bucket", y=percentile, color="prompt_name", markers=True,
+                          title="Latency over Time (ms, live calls)")
+    col1.plotly_chart(fig_latency, use_container_width=True)
+    fig_tokens = px.bar(series, x="bucket", y="tokens", color="prompt_name", title="Tokens over Time")
+    col2.plotly_chart(fig_tokens, use_container_width=True)
+
+    errors = df[df["error_class"].notna()]
+    if not errors.empty:
+        st.subheader("Errors by Class")
+        st.dataframe(errors.groupby(["prompt_name", "error_class"]).size().rename("calls").reset_index(),
+                     use_container_width=True)
+
+    if ai_telemetry.telemetry_writer.dropped:
+        st.caption(f"{ai_telemetry.telemetry_writer.dropped:,} records were dropped by this server's telemetry writer.")
+
 
 # --- Main App Router ---
 st.sidebar.title("Navigation")
-page = st.sidebar.radio("Go to:", ["Capability Assessment", "Strategy Dashboard", "Individual Coach Architect"])
+page = st.sidebar.radio("Go to:", ["Capability Assessment", "Strategy Dashboard", "Individual Coach Architect", "AI Telemetry (Admin)"])
 
 if page == "Capability Assessment":
-    # Initialize session state for brief output control
-    if 'brief_output' not in st.session_state:
-        st.session_state['brief_output'] = None
-    if 'brief_run_status' not in st.session_state:
-        st.session_state['brief_run_status'] = 'initial'
+    # Generated briefs/dialogues live in the ai_jobs table, so nothing is cleared when switching tabs
     if 'current_form_inputs' not in st.session_state:
         st.session_state['current_form_inputs'] = {}
         
     intake_form_page()
 elif page == "Strategy Dashboard":
-    # Clear brief state when switching tabs
-    st.session_state['brief_output'] = None
-    st.session_state['brief_run_status'] = 'initial'
     strategy_dashboard_page()
 elif page == "Individual Coach Architect":
-    # Initialize session state variables for the new dialogue output
-    if 'dialogue_output' not in st.session_state:
-        st.session_state['dialogue_output'] = None
-    if 'dialogue_run_status' not in st.session_state:
-        st.session_state['dialogue_run_status'] = 'initial'
-        
-    # Clear brief state when switching tabs (Optional, but safe)
-    st.session_state['brief_output'] = None
-    st.session_state['brief_run_status'] = 'initial'
     ldp_engine_page()
+elif page == "AI Telemetry (Admin)":
+    ai_telemetry_page()
@@ -0,0 +1,121 @@
+# backfill_curation.py
+"""
+Re-curates every row in capability_assessments after a change to the rules in logic.py.
+
+    python backfill_curation.py --dry-run
+    python backfill_curation.py --chunk-size 5000
+"""
+import argparse
+import time
+
+import pandas as pd
+from sqlalchemy import bindparam, select, update
+
+import dashboard_aggregates
+import logic
+from database import engine, begin_write, capability_assessments_table
+
+# Fields owned by the curation engine (recommended_vendor follows the pathway)
+CURATED_FIELDS = ["recommended_pathway", "recommended_vendor", "urgency_score", "estimated_budget"]
+INPUT_FIELDS = ["audience_level", "current_maturity", "cohort_size"]
+# Also read so changed budgets can be moved in the dashboard aggregates
+AGGREGATE_FIELDS = [c for c in dashboard_aggregates.SOURCE_COLUMNS if c not in INPUT_FIELDS + CURATED_FIELDS]
+DEFAULT_CHUNK_SIZE = 2000
+
+
+def _read_chunk(conn, after_id: int, chunk_size: int) -> pd.DataFrame:
+    """Keyset-paginates on the primary key so each chunk is an index range scan."""
+    table = capability_assessments_table
+    names = ["id"] + INPUT_FIELDS + CURATED_FIELDS + AGGREGATE_FIELDS
+    rows = conn.execute(
+        select(*[table.c[name] for name in names]).where(table.c.id > after_id).order_by(table.c.id).limit(chunk_size)
+    ).fetchall()
+    return pd.DataFrame(rows, columns=names)
+
+
+def _changed_rows(chunk: pd.DataFrame):
+    """
+    Runs the batch curation engine and returns (UPDATE params, old rows, new rows) for rows
+    whose outputs moved; the row frames feed the dashboard aggregates' delta.
+    """
+    fresh = logic.curate_pathways(chunk)
+    changed = pd.Series(False, index=chunk.index)
+    for field in CURATED_FIELDS:
+        changed |= chunk[field].astype(object).to_numpy() != fresh[field].astype(object).to_numpy()
+
+    updates = fresh.loc[changed, CURATED_FIELDS].astype(object)
+    updates["b_id"] = chunk.loc[changed, "id"]
+    params = [
+        {key: (value.item() if hasattr(value, "item") else value) for key, value in record.items()}
+        for record in updates.to_dict("records")
+    ]
+    before = chunk.loc[changed]
+    after = before.assign(**{field: fresh.loc[changed, field].astype(object) for field in CURATED_FIELDS})
+    return params, before, after
+
+
+def backfill(chunk_size: int = DEFAULT_CHUNK_SIZE, dry_run: bool = False, progress: bool = True,
+             db_engine=None) -> dict:
+    """
+    Streams the table in id order and rewrites stale curated fields.
+    Each chunk is read, recomputed and written with one executemany UPDATE in its own write
+    transaction, so a concurrent writer can't change the chunk between the read and the UPDATE.
+    """
+    table = capability_assessments_table
+    stmt = (
+        update(table)
+        .where(table.c.id == bindparam("b_id"))
+        .values({field: bindparam(field) for field in CURATED_FIELDS})
+    )
+
+    scanned = changed = 0
+    last_id = 0
+    start = time.perf_counter()
+
+    while True:
+        with (db_engine or engine).connect() as conn:  # One transaction per chunk
+            if not dry_run:
+                begin_write(conn) # The rows read are the rows updated (and their aggregate deltas)
+            chunk = _read_chunk(conn, last_id, chunk_size)
+            if chunk.empty:
+                break
+            params, before, after = _changed_rows(chunk)
+            if params and not dry_run:
+                conn.execute(stmt, params)  # executemany
+                dashboard_aggregates.record_changed(conn, before, after) # Budget moves with the pathway
+            conn.commit()
+
+        scanned += len(chunk)
+        changed += len(params)
+        last_id = int(chunk["id"].iloc[-1])
+
+        if progress:
+            elapsed = time.perf_counter() - start
+            print(f"  scanned {scanned:,} rows | {'would change' if dry_run else 'updated'} {changed:,} "
+                  f"| {scanned / elapsed:,.0f} rows/s")
+
+    elapsed = time.perf_counter() - start
+    return {
+        "scanned": scanned,
+        "changed": changed,
+        "dry_run": dry_run,
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(scanned / elapsed) if elapsed else 0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompute curated fields in capability_assessments.")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--dry-run", action="store_true", help="Only report how many rows would change.")
+    parser.add_argument("--quiet", action="store_true", help="Suppress per-chunk progress lines.")
+    args = parser.parse_args()
+
+    summary = backfill(chunk_size=args.chunk_size, dry_run=args.dry_run, progress=not args.quiet)
+    verb = "would change" if summary["dry_run"] else "updated"
+    print(f"Done: scanned {summary['scanned']:,} rows, {verb} {summary['changed']:,} "
+          f"in {summary['seconds']}s ({summary['rows_per_sec']:,} rows/s).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,629 @@
+# benchmarks.py
+"""
+Micro-benchmarks for the hot paths of the app.
+
+Run from the repo root, e.g.:
+    python benchmarks.py curation --rows 50000
+    python benchmarks.py heatmap --sizes 10000 100000 1000000
+    python benchmarks.py concurrency --readers 8 --writers 2 --seconds 10
+    python benchmarks.py compliance --rows 100000
+    python benchmarks.py dedupe --sizes 10000 100000
+    python benchmarks.py pages --runs 20 --first-token-delay 0.3
+    python benchmarks.py intake --reruns 30
+    python benchmarks.py registry --sizes 10000 100000 300000
+    python benchmarks.py import --rows 50000
+    python benchmarks.py dashboard --sizes 10000 100000 300000
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+import logic
+
+MATURITY_LEVELS = ["Skeptic", "Observer", "Experimenter", "Adopter", "Leader"]
+AUDIENCE_LEVELS = list(logic.COST_PER_HEAD.keys())
+COHORT_SIZES = ["1-20 (Pilot)", "20-100 (Unit)", "100+ (Division)"]
+REGIONS = ["AUSPAC", "North America", "Europe", "EO (Equal Opportunities)", "Group Shared Services", "Global"]
+
+
+# --- Synthetic Data ---
+def make_cohorts(rows: int, seed: int = 7) -> pd.DataFrame:
+    """Builds a synthetic capability_assessments-shaped frame."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "cohort_name": [f"Cohort {i}" for i in range(rows)],
+        "region": rng.choice(REGIONS, rows),
+        "audience_level": rng.choice(AUDIENCE_LEVELS, rows),
+        "current_maturity": rng.choice(MATURITY_LEVELS, rows),
+        "cohort_size": rng.choice(COHORT_SIZES, rows),
+    })
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def _report(name: str, rows: int, baseline_s: float, candidate_s: float):
+    print(f"{name} @ {rows:,} rows")
+    print(f"  baseline:   {baseline_s * 1000:10.1f} ms  ({rows / baseline_s:,.0f} rows/s)")
+    print(f"  vectorized: {candidate_s * 1000:10.1f} ms  ({rows / candidate_s:,.0f} rows/s)")
+    print(f"  speed-up:   {baseline_s / candidate_s:10.1f}x")
+
+
+# --- 1. Curation Engine ---
+def bench_curation(rows: int):
+    """Row-by-row curate_pathway() vs. vectorized curate_pathways()."""
+    df = make_cohorts(rows)
+    records = df.to_dict("records")
+
+    uncached = logic._curate_pathway_cached.__wrapped__ # The row-by-row rules without memoization
+    scalar, scalar_s = _timed(lambda: [uncached(r["audience_level"], r["current_maturity"], r["cohort_size"])
+                                       for r in records])
+    batch, batch_s = _timed(logic.curate_pathways, df)
+
+    # Parity check: the batch engine must return exactly what the scalar one does
+    assert batch.to_dict("records") == scalar, "curate_pathways() diverged from curate_pathway()"
+    _report("curate_pathway", rows, scalar_s, batch_s)
+
+
+# --- 2. Heatmap Aggregation ---
+def _heatmap_iterrows(df: pd.DataFrame) -> pd.DataFrame:
+    """The original row-loop heatmap preparation from strategy_dashboard_page()."""
+    map_data = []
+    maturity_map = {"Skeptic": 1, "Observer": 2, "Experimenter": 3, "Adopter": 4, "Leader": 5}
+    for index, row in df.iterrows():
+        region = row['region']
+        mat_str = row['current_maturity'].split(" ")[0] if row['current_maturity'] else "Observer"
+        score = maturity_map.get(mat_str, 2)
+        if region in logic.REGION_ISO_MAP:
+            for iso in logic.REGION_ISO_MAP[region]:
+                map_data.append({"iso_alpha": iso, "maturity": score, "cohort": row['cohort_name']})
+    return pd.DataFrame(map_data).groupby("iso_alpha")['maturity'].mean().reset_index()
+
+
+def _heatmap_grouped(df: pd.DataFrame) -> pd.DataFrame:
+    """The dashboard's path: group measures (as recompute() builds them) -> per-region totals -> countries."""
+    import dashboard_aggregates
+    groups = dashboard_aggregates.group_rows(df.reindex(columns=dashboard_aggregates.SOURCE_COLUMNS))
+    return dashboard_aggregates.maturity_by_country(groups)
+
+
+def bench_heatmap(sizes: list, baseline_limit: int):
+    """iterrows() fan-out vs. logic.aggregate_maturity_by_country(), checked against the dashboard's grouped path."""
+    _use_scratch_database()
+    import dashboard_aggregates # Imported before timing (it opens the database)
+    for rows in sizes:
+        df = make_cohorts(rows)
+        agg, agg_s = _timed(logic.aggregate_maturity_by_country, df)
+        grouped = _heatmap_grouped(df)
+        assert list(agg["iso_alpha"]) == list(grouped["iso_alpha"]), "dashboard_aggregates path diverged"
+        assert np.allclose(agg["maturity"], grouped["maturity"]), "dashboard_aggregates path diverged"
+        if rows > baseline_limit:
+            print(f"heatmap @ {rows:,} rows")
+            print(f"  vectorized: {agg_s * 1000:10.1f} ms  ({rows / agg_s:,.0f} rows/s)  (baseline skipped)")
+            continue
+
+        loop, loop_s = _timed(_heatmap_iterrows, df)
+        assert list(agg["iso_alpha"]) == list(loop["iso_alpha"]), "country sets diverged"
+        assert np.allclose(agg["maturity"], loop["maturity"]), "mean maturity diverged"
+        _report("heatmap", rows, loop_s, agg_s)
+
+
+def _use_scratch_database():
+    """Points database.py at a throwaway SQLite file (must run before database is imported)."""
+    import sys
+    if "database" not in sys.modules:
+        scratch = os.path.join(tempfile.mkdtemp(prefix="qbe_bench_"), "scratch.db")
+        os.environ["QBE_DATABASE_URL"] = f"sqlite:///{scratch}"
+
+
+# --- 3. SQLite Concurrency (engine profile + indexes) ---
+def _percentile(samples: list, pct: float) -> float:
+    return float(np.percentile(samples, pct)) * 1000 if samples else float("nan")
+
+
+def _run_concurrency(profile: str, with_indexes: bool, rows: int, readers: int, writers: int, seconds: float) -> dict:
+    _use_scratch_database()
+    import database
+    from sqlalchemy import func, insert, select
+
+    tmp_dir = tempfile.mkdtemp(prefix="qbe_bench_")
+    bench_engine = database.create_app_engine(f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}", profile)
+    database.metadata.create_all(bench_engine)
+    if with_indexes:
+        for index in database.SECONDARY_INDEXES:
+            index.create(bench_engine, checkfirst=True)
+
+    table = database.capability_assessments_table
+    seed = make_cohorts(rows)
+    seed["execution_status"] = np.random.default_rng(1).choice(logic.EXECUTION_STATUSES, rows)
+    seed["swp_workstream"] = np.random.default_rng(2).choice(logic.SWP_WORKSTREAMS, rows)
+    with bench_engine.begin() as conn:
+        conn.execute(insert(table), seed.to_dict("records"))
+
+    stop = threading.Event()
+    lock = threading.Lock()
+    read_lat, write_lat, errors = [], [], []
+
+    def reader(worker: int):
+        statuses = logic.EXECUTION_STATUSES
+        i = worker
+        while not stop.is_set():
+            status = statuses[i % len(statuses)]
+            i += 1
+            start = time.perf_counter()
+            try:
+                with bench_engine.connect() as conn:
+                    conn.execute(
+                        select(table.c.region, func.count(), func.sum(table.c.estimated_budget))
+                        .where(table.c.execution_status == status)
+                        .group_by(table.c.region)
+                    ).fetchall()
+                with lock:
+                    read_lat.append(time.perf_counter() - start)
+            except Exception as e:
+                with lock:
+                    errors.append(type(e).__name__)
+
+    def writer(worker: int):
+        record = seed.iloc[worker].to_dict()
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                with bench_engine.connect() as conn:  # One insert + commit, like the intake form
+                    conn.execute(insert(table).values(record))
+                    conn.commit()
+                with lock:
+                    write_lat.append(time.perf_counter() - start)
+            except Exception as e:
+                with lock:
+                    errors.append(type(e).__name__)
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    threads += [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    bench_engine.dispose()
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    return {
+        "reads/s": len(read_lat) / seconds,
+        "writes/s": len(write_lat) / seconds,
+        "read p50 ms": _percentile(read_lat, 50),
+        "read p95 ms": _percentile(read_lat, 95),
+        "write p50 ms": _percentile(write_lat, 50),
+        "write p95 ms": _percentile(write_lat, 95),
+        "errors": len(errors),
+    }
+
+
+def bench_concurrency(rows: int, readers: int, writers: int, seconds: float):
+    """Dashboard-style readers vs. intake-style writers, before and after the SQLite profile."""
+    before = _run_concurrency("default", False, rows, readers, writers, seconds)
+    after = _run_concurrency("performance", True, rows, readers, writers, seconds)
+
+    print(f"concurrency @ {rows:,} rows, {readers} readers / {writers} writers, {seconds}s each")
+    print(f"  {'metric':<14}{'before':>12}{'after':>12}")
+    for key in before:
+        print(f"  {key:<14}{before[key]:>12,.1f}{after[key]:>12,.1f}")
+
+
+# --- 4. Compliance Rule Engine ---
+def _legacy_check_compliance_risk(region: str, vendor_name: str, db_engine=None):
+    """The original hard-coded check_compliance_risk() (full table read per call)."""
+    from database import engine
+    try:
+        vendor_df = pd.read_sql_table("vendor_registry", db_engine or engine)
+        vendor_row = vendor_df[vendor_df['vendor_name'] == vendor_name].iloc[0]
+        vendor_cert = vendor_row['data_residency_cert']
+        compliance_rating = vendor_row['compliance_rating']
+        if compliance_rating == "Red":
+            return "Major Risk: Vendor is flagged as high-risk."
+        if region == "Europe" and "GDPR" not in vendor_cert:
+            return "RISK: European program using non-GDPR certified vendor."
+        if region == "AUSPAC" and "Privacy" not in vendor_cert and vendor_cert != "Internal":
+            return "RISK: AUSPAC program using vendor without local privacy certification."
+        return None
+    except:
+        return None
+
+
+def bench_compliance(rows: int, baseline_rows: int):
+    """Parity of the compiled rule matrix with the legacy function, then legacy vs. vectorized audit."""
+    _use_scratch_database()
+    import database
+    from sqlalchemy import insert
+
+    edge_vendors = [
+        {"vendor_name": "Flagged Co", "compliance_rating": "Red", "data_residency_cert": None},
+        {"vendor_name": "Uncertified Co", "compliance_rating": "Green", "data_residency_cert": None},
+        {"vendor_name": "Yellow GDPR Co", "compliance_rating": "Yellow", "data_residency_cert": "EU-GDPR, AUS-Privacy"},
+    ]
+    with database.engine.begin() as conn:
+        conn.execute(insert(database.vendor_registry_table), logic.DEFAULT_VENDORS)
+        conn.execute(insert(database.vendor_registry_table), edge_vendors)
+
+    # Parity: every region x vendor (plus unknown vendor) must match the legacy function
+    vendor_names = [v["vendor_name"] for v in logic.DEFAULT_VENDORS + edge_vendors] + ["Unregistered"]
+    pairs = [(region, name) for region in REGIONS + ["Nowhere"] for name in vendor_names]
+    legacy = [_legacy_check_compliance_risk(r, v) for r, v in pairs]
+    assert logic.check_compliance_risk_many(pairs) == legacy, "compiled rules diverged from legacy check"
+    print(f"compliance parity: {len(pairs)} region x vendor pairs match the legacy check")
+
+    cohorts = make_cohorts(rows)
+    cohorts["selected_vendor"] = np.random.default_rng(3).choice(vendor_names, rows)
+    sample = cohorts.head(baseline_rows)
+
+    _, legacy_s = _timed(lambda: [_legacy_check_compliance_risk(r, v)
+                                  for r, v in zip(sample["region"], sample["selected_vendor"])])
+    _, audit_s = _timed(logic.audit_compliance, cohorts)
+    legacy_rate = len(sample) / legacy_s
+    print(f"compliance audit")
+    print(f"  legacy:     {legacy_rate:,.0f} rows/s  (measured on {len(sample):,} rows)")
+    print(f"  vectorized: {rows / audit_s:,.0f} rows/s  ({audit_s * 1000:.1f} ms for {rows:,} rows)")
+    print(f"  speed-up:   {(rows / audit_s) / legacy_rate:,.0f}x")
+
+
+# --- 5. Near-Duplicate Comment Collapsing ---
+COMMENT_TEMPLATES = [
+    "The new claims portal keeps logging me out and I lose my work",
+    "Training on the AI tool was too short and rushed",
+    "I don't understand how the AI decision is made for my customers",
+    "Managers haven't explained why the process changed",
+    "Really excited that the copilot drafts the first email for me",
+    "The approval workflow now takes twice as long as before",
+]
+
+
+def make_comments(rows: int, seed: int = 11) -> list:
+    """Survey-style comments: templates with punctuation/casing noise, copy-paste repeats and unique text."""
+    rng = np.random.default_rng(seed)
+    noise = ["", "!", "!!", ".", " :(", " - again"]
+    comments = []
+    for i in range(rows):
+        roll = rng.random()
+        if roll < 0.6:
+            text = COMMENT_TEMPLATES[rng.integers(len(COMMENT_TEMPLATES))] + noise[rng.integers(len(noise))]
+            comments.append(text.upper() if rng.random() < 0.1 else text)
+        else:
+            comments.append(f"Comment {i}: team {rng.integers(1000)} raised issue {rng.integers(100000)} about rollout")
+    return comments
+
+
+def bench_dedupe(sizes: list):
+    """Throughput and reduction ratio of text_processing.collapse_near_duplicates()."""
+    from text_processing import collapse_near_duplicates
+
+    for rows in sizes:
+        comments = make_comments(rows)
+        collapsed, seconds = _timed(collapse_near_duplicates, comments)
+        print(f"dedupe @ {rows:,} comments: {seconds * 1000:,.0f} ms ({rows / seconds:,.0f} comments/s), "
+              f"{len(collapsed.representatives):,} representatives, {collapsed.reduction_ratio:.1%} reduction")
+
+
+# --- 6. End-to-End Page Throughput (offline, fake AI backend) ---
+def bench_pages(runs: int, tokens: int, first_token_delay: float, per_token_delay: float):
+    """Drives the LDP page and the Ethical Risk Brief through Streamlit's AppTest against the fake backend."""
+    _use_scratch_database()
+    os.environ["QBE_AI_BACKEND"] = "fake"
+    os.environ["QBE_FAKE_AI_TOKENS"] = str(tokens)
+    os.environ["QBE_FAKE_AI_FIRST_TOKEN_DELAY"] = str(first_token_delay)
+    os.environ["QBE_FAKE_AI_PER_TOKEN_DELAY"] = str(per_token_delay)
+    from streamlit.testing.v1 import AppTest
+    from ai_cache import response_cache
+
+    app_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+    timings = {"protocol": [], "brief": []}
+    for i in range(runs):
+        response_cache.clear() # Measure generation, not cache hits
+        at = AppTest.from_file(app_path, default_timeout=120)
+        at.run()
+
+        at.sidebar.radio[0].set_value("Individual Coach Architect").run()
+        at.text_input[0].set_value(f"Bench Leader {i}")
+        start = time.perf_counter()
+        at.button(key="FormSubmitter:ldp_form-Generate 90-Day Protocol").click().run()
+        timings["protocol"].append(time.perf_counter() - start)
+        assert not at.exception, at.exception
+
+        at.sidebar.radio[0].set_value("Capability Assessment").run()
+        start = time.perf_counter()
+        next(b for b in at.button if b.label.startswith("Generate Ethical Risk Brief")).click().run()
+        timings["brief"].append(time.perf_counter() - start)
+        assert not at.exception, at.exception
+
+    print(f"pages @ {runs} runs, fake backend ({tokens} tokens, TTFT {first_token_delay * 1000:.0f} ms, "
+          f"{per_token_delay * 1000:.1f} ms/token)")
+    for name, samples in timings.items():
+        print(f"  {name:9s} p50 {_percentile(samples, 50):8.1f} ms | p95 {_percentile(samples, 95):8.1f} ms "
+              f"| {len(samples) / sum(samples):6.2f} page runs/s")
+
+    from ai_telemetry import call_stats
+    print("  per-prompt AI calls:")
+    print(call_stats.summary().round(1).to_string(index=False))
+
+
+# --- 7. Intake Page Reruns (cross-session memoization) ---
+def bench_intake(reruns: int, lookups: int):
+    """Per-lookup and per-rerun cost of the intake page with warm shared caches vs. caches cleared every rerun."""
+    _use_scratch_database()
+    os.environ.setdefault("QBE_AI_BACKEND", "fake")
+    from streamlit.testing.v1 import AppTest
+    import database
+    from vendor_registry import vendor_registry
+
+    database.engine.dispose()
+    with database.engine.begin() as conn:
+        if not conn.execute(database.vendor_registry_table.select().limit(1)).first():
+            conn.execute(database.vendor_registry_table.insert(), logic.DEFAULT_VENDORS)
+
+    # 1. The individual lookups the page makes on every rerun
+    form = {"audience_level": "Senior Leader", "current_maturity": "Skeptic", "cohort_size": "20-100 (Unit)"}
+    uncached_curate = logic._curate_pathway_cached.__wrapped__
+    uncached_gap = logic.calculate_behavioural_gap.__wrapped__
+    cases = [
+        ("vendor list", lambda: pd.read_sql_table("vendor_registry", database.engine)["vendor_name"].tolist(),
+         vendor_registry.vendor_names),
+        ("curate_pathway", lambda: uncached_curate(form["audience_level"], form["current_maturity"], form["cohort_size"]),
+         lambda: logic.curate_pathway(form)),
+        ("behavioural gap", lambda: uncached_gap(4, 8), lambda: logic.calculate_behavioural_gap(4, 8)),
+    ]
+    for name, before, after in cases:
+        after() # Warm the shared cache
+        _, before_s = _timed(lambda: [before() for _ in range(lookups)])
+        _, after_s = _timed(lambda: [after() for _ in range(lookups)])
+        print(f"{name:16s} uncached {before_s / lookups * 1e6:9.1f} us | memoized {after_s / lookups * 1e6:7.1f} us "
+              f"| {before_s / after_s:7.1f}x")
+
+    # 2. Whole-page reruns (form submit) through AppTest
+    app_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+
+    def rerun_times(clear_each_time: bool) -> list:
+        at = AppTest.from_file(app_path, default_timeout=60)
+        at.run()
+        at.text_input[0].set_value("Bench Cohort")
+        samples = []
+        for _ in range(reruns):
+            if clear_each_time:
+                logic.clear_caches()
+                vendor_registry.invalidate()
+            start = time.perf_counter()
+            at.button(key="FormSubmitter:assessment_form-Analyze & Generate Pathway").click().run()
+            samples.append(time.perf_counter() - start)
+            assert not at.exception, at.exception
+        return samples
+
+    cold = rerun_times(clear_each_time=True)
+    warm = rerun_times(clear_each_time=False)
+    print(f"intake rerun @ {reruns} submits: caches cleared p50 {_percentile(cold, 50):6.1f} ms "
+          f"| shared caches p50 {_percentile(warm, 50):6.1f} ms")
+
+
+# --- 8. Cohort Registry (full frame vs. keyset pages) ---
+def bench_registry(sizes: list, page_size: int):
+    """Payload bytes and query time of the full registry vs. one SQL page, as the table grows."""
+    _use_scratch_database()
+    from sqlalchemy import insert, select
+    from streamlit.dataframe_util import convert_pandas_df_to_arrow_bytes
+    import database
+    import dashboard_data
+
+    table = database.capability_assessments_table
+    display_cols = [c for c in dashboard_data.REGISTRY_COLUMNS if c != "id"]
+    filters = {"region": ["Europe"], "execution_status": ["Pilot", "Scaling"]}
+    loaded = 0
+    for rows in sizes:
+        seed = make_cohorts(rows - loaded, seed=rows)
+        seed["execution_status"] = np.random.default_rng(rows + 1).choice(logic.EXECUTION_STATUSES, len(seed))
+        seed["swp_workstream"] = np.random.default_rng(rows + 2).choice(logic.SWP_WORKSTREAMS, len(seed))
+        seed["recommended_pathway"] = "QBE AI Core Skills"
+        seed["governance_checklist_status"] = "Complete"
+        with database.engine.begin() as conn:
+            conn.execute(insert(table), seed.to_dict("records"))
+        loaded = rows
+
+        full, full_s = _timed(pd.read_sql, select(*[table.c[c] for c in display_cols]), database.engine)
+        full_bytes = len(convert_pandas_df_to_arrow_bytes(full))
+
+        first, first_s = _timed(dashboard_data.fetch_registry_page, None, None, page_size)
+        cursor, deep_s = first.next_cursor, 0.0
+        for _ in range(20): # Walk 20 pages in, timing the last
+            page, deep_s = _timed(dashboard_data.fetch_registry_page, None, cursor, page_size)
+            cursor = page.next_cursor
+        filtered, filtered_s = _timed(dashboard_data.fetch_registry_page, filters, None, page_size)
+        page_bytes = len(convert_pandas_df_to_arrow_bytes(first.rows.drop(columns="id")))
+
+        print(f"registry @ {rows:,} rows")
+        print(f"  full frame:     {full_s * 1000:8.1f} ms  {full_bytes / 1024:10,.0f} KiB to the browser")
+        print(f"  first page:     {first_s * 1000:8.1f} ms  {page_bytes / 1024:10,.0f} KiB  ({first.total:,} total)")
+        print(f"  page 21:        {deep_s * 1000:8.1f} ms")
+        print(f"  filtered page:  {filtered_s * 1000:8.1f} ms  ({filtered.total:,} matching)")
+
+
+# --- 9. Bulk Import (per-row form inserts vs. chunked import) ---
+def bench_import(rows: int, baseline_rows: int, chunk_size: int):
+    """The intake form's one-insert-per-cohort path vs. bulk_import over a CSV, in rows/sec."""
+    _use_scratch_database()
+    from sqlalchemy import insert
+    import bulk_import
+    import database
+
+    with database.engine.begin() as conn:
+        if not conn.execute(database.vendor_registry_table.select().limit(1)).first():
+            conn.execute(database.vendor_registry_table.insert(), logic.DEFAULT_VENDORS)
+
+    cohorts = make_cohorts(rows)
+    vendor_choices = ["Auto-Assign"] + [v["vendor_name"] for v in logic.DEFAULT_VENDORS]
+    cohorts["selected_vendor"] = np.random.default_rng(3).choice(vendor_choices, rows)
+    cohorts["execution_status"] = np.random.default_rng(4).choice(logic.EXECUTION_STATUSES, rows)
+    tmp_dir = tempfile.mkdtemp(prefix="qbe_bench_")
+    csv_path = os.path.join(tmp_dir, "cohorts.csv")
+    cohorts.to_csv(csv_path, index=False)
+
+    def form_inserts():
+        for form_data in cohorts.head(baseline_rows).to_dict("records"):
+            result = logic.curate_pathway(form_data)
+            vendor = result["recommended_vendor"] if form_data["selected_vendor"] == "Auto-Assign" else form_data["selected_vendor"]
+            logic.check_compliance_risk(form_data["region"], vendor)
+            record = {**form_data, "selected_vendor": vendor,
+                      **{k: result[k] for k in bulk_import.CURATED_FIELDS}}
+            with database.engine.connect() as conn:
+                conn.execute(insert(database.capability_assessments_table).values(record))
+                conn.commit()
+
+    _, form_s = _timed(form_inserts)
+    summary = bulk_import.import_file(csv_path, chunk_size=chunk_size)
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    print(f"import @ {rows:,} rows (chunks of {chunk_size:,})")
+    print(f"  form inserts: {baseline_rows / form_s:10,.0f} rows/s  ({baseline_rows:,} rows)")
+    print(f"  bulk import:  {summary['rows_per_sec']:10,.0f} rows/s  ({summary['inserted']:,} inserted, "
+          f"{summary['flagged']:,} flagged, {summary['seconds']}s)")
+    print(f"  speed-up:     {summary['rows_per_sec'] / (baseline_rows / form_s):10.1f}x")
+
+
+# --- 10. Dashboard Aggregates (full recompute vs. materialized groups) ---
+def bench_dashboard(sizes: list, inserts: int):
+    """Dashboard headline numbers from a full recompute vs. the stored dashboard_aggregates, plus the write overhead."""
+    _use_scratch_database()
+    from sqlalchemy import insert
+    import database
+    import dashboard_aggregates
+
+    table = database.capability_assessments_table
+
+    def headline(agg):
+        total = int(agg["cohort_count"].sum())
+        return (total, agg["budget_sum"].sum(),
+                logic.execution_score_from_counts(dashboard_aggregates.status_counts(agg).to_dict(), total),
+                dashboard_aggregates.maturity_by_country(agg))
+
+    def from_recompute(): # What every dashboard view would pay without the materialized table
+        with database.engine.connect() as conn:
+            return headline(dashboard_aggregates.recompute(conn))
+
+    def from_aggregates():
+        return headline(dashboard_aggregates.load_aggregates())
+
+    loaded = 0
+    for rows in sizes:
+        seed = make_cohorts(rows - loaded, seed=rows)
+        seed["execution_status"] = np.random.default_rng(rows + 1).choice(logic.EXECUTION_STATUSES, len(seed))
+        seed["swp_workstream"] = np.random.default_rng(rows + 2).choice(logic.SWP_WORKSTREAMS, len(seed))
+        seed = seed.assign(**logic.curate_pathways(seed)[["recommended_pathway", "estimated_budget"]])
+        with database.engine.begin() as conn:
+            conn.execute(insert(table), seed.to_dict("records"))
+        loaded = rows
+        _, rebuild_s = _timed(dashboard_aggregates.rebuild) # Seeded behind its back
+
+        frame, frame_s = _timed(from_recompute)
+        agg, agg_s = _timed(from_aggregates)
+        assert frame[0] == agg[0] and frame[1] == agg[1] and frame[2] == agg[2], "headline numbers diverged"
+        assert np.allclose(frame[3]["maturity"], agg[3]["maturity"]), "heatmap diverged"
+
+        records = seed.head(inserts).to_dict("records")
+        def insert_each(maintain: bool):
+            for record in records:
+                with database.engine.begin() as conn:
+                    conn.execute(insert(table).values(record))
+                    if maintain:
+                        dashboard_aggregates.record_inserted(conn, [record])
+        _, plain_s = _timed(insert_each, False)
+        _, maintained_s = _timed(insert_each, True)
+        dashboard_aggregates.rebuild() # The unmaintained inserts above
+        loaded += 2 * inserts
+        drift = dashboard_aggregates.check_consistency()
+
+        print(f"dashboard @ {rows:,} rows")
+        print(f"  recompute:    {frame_s * 1000:10.1f} ms")
+        print(f"  aggregates:   {agg_s * 1000:10.1f} ms  ({len(dashboard_aggregates.load_aggregates()):,} groups)")
+        print(f"  speed-up:     {frame_s / agg_s:10.1f}x")
+        print(f"  insert:       {plain_s / inserts * 1000:10.2f} ms -> {maintained_s / inserts * 1000:.2f} ms with aggregates")
+        print(f"  rebuild:      {rebuild_s * 1000:10.1f} ms   consistency check: {'ok' if drift.empty else 'DRIFT'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="QBE app micro-benchmarks")
+    sub = parser.add_subparsers(dest="bench", required=True)
+
+    p_cur = sub.add_parser("curation", help="Scalar vs. batch pathway curation")
+    p_cur.add_argument("--rows", type=int, default=50_000)
+
+    p_map = sub.add_parser("heatmap", help="Row-loop vs. vectorized heatmap aggregation")
+    p_map.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    p_map.add_argument("--baseline-limit", type=int, default=100_000,
+                       help="Skip the slow iterrows() baseline above this many rows.")
+
+    p_con = sub.add_parser("concurrency", help="Readers/writers with default vs. performance SQLite profile")
+    p_con.add_argument("--rows", type=int, default=20_000)
+    p_con.add_argument("--readers", type=int, default=8)
+    p_con.add_argument("--writers", type=int, default=2)
+    p_con.add_argument("--seconds", type=float, default=10.0)
+
+    p_cmp = sub.add_parser("compliance", help="Legacy vs. compiled compliance rule checks")
+    p_cmp.add_argument("--rows", type=int, default=100_000)
+    p_cmp.add_argument("--baseline-rows", type=int, default=500)
+
+    p_dup = sub.add_parser("dedupe", help="Near-duplicate comment collapsing throughput")
+    p_dup.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+
+    p_pag = sub.add_parser("pages", help="End-to-end AI page runs against the in-process fake backend")
+    p_pag.add_argument("--runs", type=int, default=20)
+    p_pag.add_argument("--tokens", type=int, default=120)
+    p_pag.add_argument("--first-token-delay", type=float, default=0.3)
+    p_pag.add_argument("--per-token-delay", type=float, default=0.01)
+
+    p_int = sub.add_parser("intake", help="Intake page lookups and reruns with vs. without shared caches")
+    p_int.add_argument("--reruns", type=int, default=30)
+    p_int.add_argument("--lookups", type=int, default=2_000)
+
+    p_reg = sub.add_parser("registry", help="Full Cohort Registry frame vs. keyset-paginated SQL pages")
+    p_reg.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 300_000])
+    p_reg.add_argument("--page-size", type=int, default=50)
+
+    p_imp = sub.add_parser("import", help="Per-row form inserts vs. chunked bulk import")
+    p_imp.add_argument("--rows", type=int, default=50_000)
+    p_imp.add_argument("--baseline-rows", type=int, default=500)
+    p_imp.add_argument("--chunk-size", type=int, default=2000)
+
+    p_dash = sub.add_parser("dashboard", help="Full recompute vs. materialized dashboard aggregates")
+    p_dash.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 300_000])
+    p_dash.add_argument("--inserts", type=int, default=200)
+
+    args = parser.parse_args()
+    if args.bench == "curation":
+        bench_curation(args.rows)
+    elif args.bench == "heatmap":
+        bench_heatmap(args.sizes, args.baseline_limit)
+    elif args.bench == "concurrency":
+        bench_concurrency(args.rows, args.readers, args.writers, args.seconds)
+    elif args.bench == "compliance":
+        bench_compliance(args.rows, args.baseline_rows)
+    elif args.bench == "dedupe":
+        bench_dedupe(args.sizes)
+    elif args.bench == "pages":
+        bench_pages(args.runs, args.tokens, args.first_token_delay, args.per_token_delay)
+    elif args.bench == "intake":
+        bench_intake(args.reruns, args.lookups)
+    elif args.bench == "registry":
+        bench_registry(args.sizes, args.page_size)
+    elif args.bench == "import":
+        bench_import(args.rows, args.baseline_rows, args.chunk_size)
+    elif args.bench == "dashboard":
+        bench_dashboard(args.sizes, args.inserts)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+# bulk_import.py
+"""
+Bulk import of capability assessments from a CSV or Parquet file (e.g. a regional lead's
+spreadsheet of cohorts). The file is streamed in chunks; each chunk is validated, curated
+with the batch engine, audited for compliance and inserted with one executemany INSERT in its
+own transaction. Rejected rows are reported, not written.
+
+Columns use the capability_assessments names. Required: cohort_name, region, audience_level,
+cohort_size, current_maturity. Optional: department, primary_behavioural_gap,
+learning_need_focus, selected_vendor (blank/"Auto-Assign" = curated vendor),
+baseline_behavior_score, target_behavior_score, execution_status, swp_workstream,
+governance_checklist_status.
+
+    python bulk_import.py cohorts.csv
+    python bulk_import.py cohorts.parquet --chunk-size 5000 --dry-run
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import insert
+
+import dashboard_aggregates
+import logic
+from database import engine, capability_assessments_table
+
+# 1. Configuration
+REQUIRED_COLUMNS = ["cohort_name", "region", "audience_level", "cohort_size", "current_maturity"]
+OPTIONAL_COLUMNS = {
+    "department": None,
+    "primary_behavioural_gap": None,
+    "learning_need_focus": None,
+    "selected_vendor": "Auto-Assign",
+    "baseline_behavior_score": None,
+    "target_behavior_score": None,
+    "execution_status": logic.EXECUTION_STATUSES[0],
+    "swp_workstream": None,
+    "governance_checklist_status": "Incomplete",
+}
+CURATED_FIELDS = ["urgency_score", "recommended_pathway", "recommended_vendor", "estimated_budget"]
+
+# The intake form's choices; imported rows must use the same labels
+REGIONS = ["AUSPAC", "North America", "Europe", "EO (Equal Opportunities)", "Group Shared Services", "Global"]
+COHORT_SIZES = ["1-20 (Pilot)", "20-100 (Unit)", "100+ (Division)"]
+GOVERNANCE_STATUSES = ["Complete", "Incomplete"]
+CHOICES = {
+    "region": REGIONS,
+    "audience_level": list(logic.COST_PER_HEAD),
+    "cohort_size": COHORT_SIZES,
+    "current_maturity": list(logic.MATURITY_SCORES),
+    "execution_status": logic.EXECUTION_STATUSES,
+    "swp_workstream": logic.SWP_WORKSTREAMS,
+    "governance_checklist_status": GOVERNANCE_STATUSES,
+}
+
+DEFAULT_CHUNK_SIZE = 2000
+MAX_REPORTED_ROWS = 100    # Rejected / flagged rows kept in the summary
+
+
+# 2. Reading
+def read_chunks(source, chunk_size: int = DEFAULT_CHUNK_SIZE, file_format: str = None):
+    """
+    Yields DataFrames of at most chunk_size rows from a path or file-like object, never
+    holding the whole file. The format comes from the file name unless given.
+    """
+    if file_format is None:
+        name = source if isinstance(source, str) else getattr(source, "name", "")
+        file_format = "parquet" if os.path.splitext(name)[1].lower() in (".parquet", ".pq") else "csv"
+
+    if file_format == "csv":
+        yield from pd.read_csv(source, chunksize=chunk_size, dtype=str, keep_default_na=False)
+    elif file_format == "parquet":
+        import pyarrow.parquet as pq # Ships with streamlit
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        raise ValueError(f"Unsupported file format '{file_format}'. Expected 'csv' or 'parquet'.")
+
+
+# 3. Validation
+def _blank(values: pd.Series) -> pd.Series:
+    return values.isna() | (values.astype(str).str.strip() == "")
+
+
+def validate_chunk(chunk: pd.DataFrame):
+    """
+    Normalises a raw chunk and splits it into (valid rows, rejected rows with a 'reason').
+    Maturity accepts the form's "Skeptic (Resistant)" labels; scores must be integers 1-10.
+    """
+    missing = [c for c in REQUIRED_COLUMNS if c not in chunk.columns]
+    if missing:
+        raise ValueError(f"File is missing required columns: {missing}")
+
+    rows = chunk.copy()
+    for column, default in OPTIONAL_COLUMNS.items():
+        if column not in rows.columns:
+            rows[column] = default
+    rows = rows[REQUIRED_COLUMNS + list(OPTIONAL_COLUMNS)]
+
+    for column in rows.columns:
+        if not column.endswith("_score"):
+            rows[column] = rows[column].astype(str).str.strip().where(~_blank(rows[column]), None)
+    rows["current_maturity"] = rows["current_maturity"].str.split(" ", n=1).str[0]
+    for column, default in OPTIONAL_COLUMNS.items():
+        if default is not None:
+            rows[column] = rows[column].fillna(default)
+
+    reasons = pd.Series("", index=rows.index, dtype=object)
+
+    def reject(mask, message):
+        reasons[mask & (reasons == "")] = message
+
+    for column in REQUIRED_COLUMNS:
+        reject(rows[column].isna(), f"{column} is required")
+    for column, choices in CHOICES.items():
+        reject(rows[column].notna() & ~rows[column].isin(choices), f"unknown {column}")
+    for column in ("baseline_behavior_score", "target_behavior_score"):
+        scores = pd.to_numeric(rows[column].where(~_blank(rows[column]), None), errors="coerce")
+        given = ~_blank(rows[column])
+        bad = given & (scores.isna() | (scores % 1 != 0) | (scores < 1) | (scores > 10))
+        reject(bad, f"{column} must be 1-10")
+        rows[column] = scores.where(~bad).astype("Int64")
+
+    valid = reasons == ""
+    rejected = chunk.loc[~valid].assign(reason=reasons[~valid])
+    return rows.loc[valid], rejected
+
+
+# 4. Curation + Compliance
+def curate_chunk(rows: pd.DataFrame):
+    """Adds the curated fields and the final vendor; returns (records, compliance risks)."""
+    curated = logic.curate_pathways(rows)
+    rows = rows.assign(**{field: curated[field].astype(object) for field in CURATED_FIELDS})
+    auto_assign = rows["selected_vendor"].isin(["Auto-Assign"])
+    rows["selected_vendor"] = rows["selected_vendor"].where(~auto_assign, rows["recommended_vendor"])
+    risks = logic.audit_compliance(rows, "region", "selected_vendor")
+
+    records = rows.astype(object).where(rows.notna(), None).to_dict("records")
+    for record in records: # numpy scalars -> Python for the DB driver
+        for key, value in record.items():
+            if isinstance(value, np.generic):
+                record[key] = value.item()
+    return records, risks
+
+
+# 5. The Import
+def import_file(source, chunk_size: int = DEFAULT_CHUNK_SIZE, file_format: str = None, dry_run: bool = False,
+                on_chunk=None, db_engine=None) -> dict:
+    """
+    Streams, validates, curates and inserts a file; returns a summary with rows/sec.
+    on_chunk(summary) is called after each chunk (progress output / UI updates).
+    """
+    summary = {"read": 0, "inserted": 0, "rejected": 0, "flagged": 0, "dry_run": dry_run,
+               "rejected_rows": [], "flagged_rows": []}
+    start = time.perf_counter()
+    row_offset = 0
+
+    for chunk in read_chunks(source, chunk_size, file_format):
+        chunk.index = pd.RangeIndex(row_offset + 1, row_offset + 1 + len(chunk)) # 1-based file row numbers
+        row_offset += len(chunk)
+
+        valid, rejected = validate_chunk(chunk)
+        records, risks = curate_chunk(valid) if not valid.empty else ([], pd.Series(dtype=object))
+
+        if records and not dry_run:
+            with (db_engine or engine).begin() as conn: # One transaction per chunk
+                conn.execute(insert(capability_assessments_table), records)  # executemany: one prepared statement for the chunk
+                dashboard_aggregates.record_inserted(conn, records)
+
+        flagged = risks[risks.notna()]
+        summary["read"] += len(chunk)
+        summary["inserted"] += 0 if dry_run else len(records)
+        summary["rejected"] += len(rejected)
+        summary["flagged"] += len(flagged)
+        room = MAX_REPORTED_ROWS - len(summary["rejected_rows"])
+        summary["rejected_rows"] += [{"row": row, "cohort_name": r.get("cohort_name"), "reason": r["reason"]}
+                                     for row, r in rejected.head(max(room, 0)).iterrows()]
+        room = MAX_REPORTED_ROWS - len(summary["flagged_rows"])
+        summary["flagged_rows"] += [{"row": row, "cohort_name": valid.at[row, "cohort_name"], "risk": risk}
+                                    for row, risk in flagged.head(max(room, 0)).items()]
+
+        elapsed = time.perf_counter() - start
+        summary["seconds"] = round(elapsed, 3)
+        summary["rows_per_sec"] = round(summary["read"] / elapsed) if elapsed else 0
+        if on_chunk is not None:
+            on_chunk(summary)
+
+    summary.setdefault("seconds", 0.0)
+    summary.setdefault("rows_per_sec", 0)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import capability assessments from CSV or Parquet.")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=["csv", "parquet"], help="Defaults to the file extension.")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--dry-run", action="store_true", help="Validate and curate without inserting.")
+    parser.add_argument("--quiet", action="store_true", help="Suppress per-chunk progress lines.")
+    args = parser.parse_args()
+
+    def progress(summary):
+        print(f"  read {summary['read']:,} | {'valid' if summary['dry_run'] else 'inserted'} "
+              f"{summary['read'] - summary['rejected']:,} | rejected {summary['rejected']:,} "
+              f"| flagged {summary['flagged']:,} | {summary['rows_per_sec']:,} rows/s")
+
+    summary = import_file(args.path, chunk_size=args.chunk_size, file_format=args.format, dry_run=args.dry_run,
+                          on_chunk=None if args.quiet else progress)
+    for row in summary["rejected_rows"]:
+        print(f"  rejected row {row['row']} ({row['cohort_name']}): {row['reason']}")
+    for row in summary["flagged_rows"]:
+        print(f"  compliance risk row {row['row']} ({row['cohort_name']}): {row['risk']}")
+    verb = "validated" if summary["dry_run"] else "inserted"
+    print(f"Done: read {summary['read']:,} rows, {verb} {summary['read'] - summary['rejected']:,}, "
+          f"rejected {summary['rejected']:,}, {summary['flagged']:,} with compliance risks "
+          f"in {summary['seconds']}s ({summary['rows_per_sec']:,} rows/s).")
+
+
+if __name__ == "__main__":
+    main()
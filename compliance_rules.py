@@ -0,0 +1,81 @@
+# compliance_rules.py
+import numpy as np
+import pandas as pd
+
+# Axis slot for any region/rating not named by a rule (they all behave identically)
+OTHER = "__other__"
+
+
+def _rule_fires(rule: dict, region, cert, rating) -> bool:
+    """Evaluates one declarative rule against a (region, certification, rating) triple."""
+    if rule.get("regions", "*") != "*" and region not in rule["regions"]:
+        return False
+    if "ratings" in rule and rating not in rule["ratings"]:
+        return False
+    if "cert_must_contain_any" in rule:
+        if not isinstance(cert, str):
+            return False # No certification recorded: residency can't be evaluated
+        if cert in rule.get("cert_exempt", []):
+            return False
+        if any(token in cert for token in rule["cert_must_contain_any"]):
+            return False
+    return True
+
+
+def evaluate_rules(rules: list, region, cert, rating):
+    """Returns the risk message of the first rule that fires, or None."""
+    for rule in rules:
+        if _rule_fires(rule, region, cert, rating):
+            return rule["risk"]
+    return None
+
+
+# 1. The Compiled Matrix
+class CompiledRules:
+    """
+    Compliance rules compiled into a region x certification x rating lookup matrix.
+    Regions and ratings not named by any rule share the OTHER slot; certifications are
+    compiled per distinct value (slot 0 holds a missing certification).
+    """
+
+    def __init__(self, rules: list, certifications):
+        self.rules = rules
+        self.regions = [OTHER] + sorted({r for rule in rules if rule.get("regions", "*") != "*" for r in rule["regions"]})
+        self.ratings = [OTHER] + sorted({r for rule in rules for r in rule.get("ratings", [])})
+        self.certs = [None] + sorted({c for c in certifications if isinstance(c, str)})
+
+        self._region_index = {label: i for i, label in enumerate(self.regions)}
+        self._rating_index = {label: i for i, label in enumerate(self.ratings)}
+        self._cert_index = {label: i for i, label in enumerate(self.certs) if label is not None}
+
+        self.matrix = np.empty((len(self.regions), len(self.certs), len(self.ratings)), dtype=object)
+        for i, region in enumerate(self.regions):
+            for j, cert in enumerate(self.certs):
+                for k, rating in enumerate(self.ratings):
+                    self.matrix[i, j, k] = evaluate_rules(rules, region, cert, rating)
+
+    def lookup(self, region, cert, rating):
+        """O(1) risk lookup for one triple."""
+        j = self._cert_index.get(cert, 0) if isinstance(cert, str) else 0
+        if isinstance(cert, str) and cert not in self._cert_index:
+            return evaluate_rules(self.rules, region, cert, rating) # Certification not seen at compile time
+        return self.matrix[self._region_index.get(region, 0), j, self._rating_index.get(rating, 0)]
+
+    def lookup_many(self, regions, certs, ratings) -> np.ndarray:
+        """Vectorized lookup over aligned arrays of regions, certifications and ratings."""
+        regions = pd.Series(regions, dtype=object)
+        certs = pd.Series(certs, dtype=object)
+        ratings = pd.Series(ratings, dtype=object)
+
+        i = regions.map(self._region_index).fillna(0).to_numpy(dtype=np.intp)
+        k = ratings.map(self._rating_index).fillna(0).to_numpy(dtype=np.intp)
+        cert_codes = certs.map(self._cert_index)
+        j = cert_codes.fillna(0).to_numpy(dtype=np.intp)
+
+        result = self.matrix[i, j, k]
+
+        # Certifications unknown at compile time fall back to direct evaluation
+        unknown = (cert_codes.isna() & certs.notna()).to_numpy()
+        for row in np.flatnonzero(unknown):
+            result[row] = evaluate_rules(self.rules, regions.iat[row], certs.iat[row], ratings.iat[row])
+        return result
@@ -0,0 +1,252 @@
+# dashboard_aggregates.py
+"""
+Materialized Strategy Dashboard aggregates, maintained on write.
+
+dashboard_aggregates holds cohort count, budget sum and maturity score sum per
+(region, execution_status, swp_workstream, audience_level). Every writer of
+capability_assessments applies its delta in the same transaction as its own write
+(record_inserted / record_changed / update_execution_status), so the dashboard reads
+O(#groups) rows instead of re-aggregating every cohort.
+
+    python dashboard_aggregates.py check     # compare with a full recompute (exit 1 on drift)
+    python dashboard_aggregates.py rebuild   # repair drift, e.g. after a manual SQL edit
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import and_, delete, insert, select, update
+
+import logic
+from database import engine, begin_read_snapshot, begin_write, capability_assessments_table, dashboard_aggregates_table
+
+# 1. Configuration
+DIMENSIONS = ["region", "execution_status", "swp_workstream", "audience_level"]
+MEASURES = ["cohort_count", "budget_sum", "maturity_score_sum"]
+SOURCE_COLUMNS = DIMENSIONS + ["estimated_budget", "current_maturity"]
+NULL_KEY = "" # Stored in place of a NULL dimension (primary key columns can't be NULL)
+DEFAULT_CHUNK_SIZE = 50_000
+
+
+# 2. Deltas
+def _key(value):
+    return NULL_KEY if pd.isna(value) else value
+
+
+def _budget(value) -> int:
+    return 0 if pd.isna(value) else int(value)
+
+
+def group_records(records, sign: int = 1) -> dict:
+    """
+    {group key: [cohort_count, budget_sum, maturity_score_sum]} for cohort row dicts, times sign
+    (-1 to remove them). Plain Python: writers pass one row to a chunk, where pandas' overhead dominates.
+    """
+    deltas = {}
+    for record in records:
+        measures = deltas.setdefault(tuple(_key(record.get(d)) for d in DIMENSIONS), [0, 0, 0.0])
+        measures[0] += sign
+        measures[1] += sign * _budget(record.get("estimated_budget"))
+        measures[2] += sign * logic.maturity_score(record.get("current_maturity"))
+    return deltas
+
+
+def group_rows(rows: pd.DataFrame) -> pd.DataFrame:
+    """Vectorized group measures for a frame of cohort rows (SOURCE_COLUMNS), for full recomputes."""
+    if rows.empty:
+        return pd.DataFrame(columns=DIMENSIONS + MEASURES)
+    keys = rows[DIMENSIONS].astype(object).where(rows[DIMENSIONS].notna(), NULL_KEY)
+    measures = keys.assign(
+        cohort_count=1,
+        budget_sum=pd.to_numeric(rows["estimated_budget"], errors="coerce").fillna(0).to_numpy(dtype=np.int64),
+        maturity_score_sum=logic.maturity_scores(rows["current_maturity"]),
+    )
+    return measures.groupby(DIMENSIONS, sort=False)[MEASURES].sum().reset_index()
+
+
+def apply_deltas(conn, deltas: dict):
+    """Adds group_records() deltas to the table inside the caller's transaction (update, else insert)."""
+    table = dashboard_aggregates_table
+    if conn.execute(select(table.c.cohort_count).limit(1)).first() is None:
+        _replace_with_recompute(conn) # Not built yet (see is_built()): build it, this write included
+        return
+    emptied = False
+    for key, (count, budget, score) in deltas.items():
+        if not (count or budget or score):
+            continue
+        match = and_(*[table.c[d] == value for d, value in zip(DIMENSIONS, key)])
+        updated = conn.execute(update(table).where(match).values(
+            cohort_count=table.c.cohort_count + count, budget_sum=table.c.budget_sum + budget,
+            maturity_score_sum=table.c.maturity_score_sum + score)).rowcount
+        if not updated:
+            conn.execute(insert(table).values({**dict(zip(DIMENSIONS, key)), "cohort_count": count,
+                                               "budget_sum": budget, "maturity_score_sum": score}))
+        emptied |= count < 0
+    if emptied:
+        conn.execute(delete(table).where(table.c.cohort_count <= 0)) # Groups emptied by a status change
+
+
+def _as_records(rows) -> list:
+    return rows.to_dict("records") if isinstance(rows, pd.DataFrame) else list(rows)
+
+
+def record_inserted(conn, records):
+    """Call in the same transaction as an INSERT into capability_assessments (row dicts or a DataFrame)."""
+    apply_deltas(conn, group_records(_as_records(records)))
+
+
+def record_changed(conn, before, after):
+    """Call in the same transaction as an UPDATE: moves rows' measures from their old groups to the new ones."""
+    deltas = group_records(_as_records(before), -1)
+    for key, measures in group_records(_as_records(after)).items():
+        deltas[key] = [old + new for old, new in zip(deltas.get(key, [0, 0, 0.0]), measures)]
+    apply_deltas(conn, deltas)
+
+
+def update_execution_status(assessment_ids, new_status: str, db_engine=None) -> int:
+    """Changes cohorts' execution_status and their aggregates in one transaction; returns rows updated."""
+    if new_status not in logic.EXECUTION_STATUSES:
+        raise ValueError(f"Unknown execution status '{new_status}'. Expected one of {logic.EXECUTION_STATUSES}.")
+    ids = [int(i) for i in assessment_ids]
+    table = capability_assessments_table
+    changing = table.c.id.in_(ids) & table.c.execution_status.is_distinct_from(new_status)
+    with (db_engine or engine).connect() as conn:
+        begin_write(conn) # No other writer can change these rows between the read and the UPDATE
+        before = pd.read_sql(select(*[table.c[c] for c in SOURCE_COLUMNS]).where(changing), conn)
+        if before.empty:
+            conn.rollback()
+            return 0
+        updated = conn.execute(update(table).where(changing).values(execution_status=new_status)).rowcount
+        record_changed(conn, before, before.assign(execution_status=new_status))
+        conn.commit()
+    return updated
+
+
+# 3. Reading
+def is_built(conn) -> bool:
+    """
+    False while the table is empty but cohorts exist: migration 6 creates it empty and it is
+    filled on first use (load_aggregates, the next write, or `rebuild`).
+    """
+    if conn.execute(select(dashboard_aggregates_table.c.cohort_count).limit(1)).first() is not None:
+        return True
+    return conn.execute(select(capability_assessments_table.c.id).limit(1)).first() is None
+
+
+def load_aggregates(db_engine=None) -> pd.DataFrame:
+    """All groups, with stored "" dimensions returned as None. Builds the table on first use."""
+    with (db_engine or engine).connect() as conn:
+        built = is_built(conn)
+        frame = pd.read_sql(select(dashboard_aggregates_table), conn)
+    if not built:
+        rebuild(db_engine)
+        return load_aggregates(db_engine)
+    frame[DIMENSIONS] = frame[DIMENSIONS].astype(object).where(frame[DIMENSIONS] != NULL_KEY, None)
+    return frame
+
+
+def status_counts(agg: pd.DataFrame) -> pd.Series:
+    """Cohort count per execution_status, from load_aggregates() groups."""
+    return agg.groupby("execution_status")["cohort_count"].sum()
+
+
+def maturity_by_country(agg: pd.DataFrame) -> pd.DataFrame:
+    """Heatmap frame (logic.maturity_by_country_from_regions) from load_aggregates() groups."""
+    per_region = (agg.groupby("region")[["maturity_score_sum", "cohort_count"]].sum()
+                  .rename(columns={"maturity_score_sum": "sum", "cohort_count": "count"}).reset_index())
+    return logic.maturity_by_country_from_regions(per_region)
+
+
+# 4. Full Recompute, Rebuild and Consistency Check
+def recompute(conn, chunk_size: int = DEFAULT_CHUNK_SIZE) -> pd.DataFrame:
+    """Aggregates straight from capability_assessments, streamed in id-keyset chunks."""
+    table = capability_assessments_table
+    partials, last_id = [], 0
+    while True:
+        chunk = pd.read_sql(select(table.c.id, *[table.c[c] for c in SOURCE_COLUMNS])
+                            .where(table.c.id > last_id).order_by(table.c.id).limit(chunk_size), conn)
+        if chunk.empty:
+            break
+        partials.append(group_rows(chunk))
+        last_id = int(chunk["id"].iloc[-1])
+    if not partials:
+        return pd.DataFrame(columns=DIMENSIONS + MEASURES)
+    return pd.concat(partials, ignore_index=True).groupby(DIMENSIONS, sort=False)[MEASURES].sum().reset_index()
+
+
+def rebuild(db_engine=None) -> int:
+    """Replaces the table with a full recompute (repairs drift); returns the number of groups."""
+    with (db_engine or engine).connect() as conn:
+        begin_write(conn) # Writers wait, so no delta lands between the recompute and the replace
+        try:
+            groups = _replace_with_recompute(conn)
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+    return groups
+
+
+def _replace_with_recompute(conn) -> int:
+    fresh = recompute(conn)
+    conn.execute(delete(dashboard_aggregates_table))
+    if not fresh.empty:
+        records = fresh.astype(object).to_dict("records")
+        conn.execute(insert(dashboard_aggregates_table), [
+            {k: (v.item() if hasattr(v, "item") else v) for k, v in r.items()} for r in records])
+    return len(fresh)
+
+
+def check_consistency(db_engine=None) -> pd.DataFrame:
+    """
+    Groups whose stored measures differ from a full recompute (empty = consistent).
+    Both sides are read from the same snapshot, so concurrent inserts can't cause false drift.
+    A table that is not built yet (is_built()) has nothing to drift and is reported consistent.
+    """
+    with (db_engine or engine).connect() as conn:
+        begin_read_snapshot(conn)
+        try:
+            if not is_built(conn):
+                return pd.DataFrame(columns=DIMENSIONS + [f"{m}_{side}" for m in MEASURES for side in ("stored", "recomputed")])
+            stored = pd.read_sql(select(dashboard_aggregates_table), conn)
+            fresh = recompute(conn)
+        finally:
+            conn.rollback()
+
+    merged = stored.merge(fresh, on=DIMENSIONS, how="outer", suffixes=("_stored", "_recomputed"))
+    merged = merged.fillna({f"{m}_{side}": 0 for m in MEASURES for side in ("stored", "recomputed")})
+    drift = np.zeros(len(merged), dtype=bool)
+    for m in MEASURES:
+        drift |= ~np.isclose(merged[f"{m}_stored"].astype(float), merged[f"{m}_recomputed"].astype(float))
+    return merged.loc[drift].reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the materialized dashboard aggregates.")
+    parser.add_argument("command", choices=["check", "rebuild"])
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.command == "rebuild":
+        groups = rebuild()
+        print(f"Done: rebuilt {groups:,} groups in {time.perf_counter() - start:.2f}s.")
+        return
+    with engine.connect() as conn:
+        built = is_built(conn)
+    if not built:
+        print("Not built yet: the table is filled on the first dashboard view or cohort write "
+              "(or run `python dashboard_aggregates.py rebuild` now).")
+        return
+    drift = check_consistency()
+    if drift.empty:
+        print(f"Consistent: aggregates match a full recompute ({time.perf_counter() - start:.2f}s).")
+        return
+    print(f"Drift in {len(drift):,} groups (run `python dashboard_aggregates.py rebuild` to repair):")
+    print(drift.to_string(index=False))
+    sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
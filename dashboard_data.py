@@ -0,0 +1,163 @@
+# dashboard_data.py
+import threading
+import time
+from dataclasses import dataclass
+
+import pandas as pd
+from sqlalchemy import func, or_, select
+
+from database import engine, capability_assessments_table
+
+# 1. Configuration
+# Only the columns the Strategy Dashboard actually renders (plus the watermark keys)
+DASHBOARD_COLUMNS = [
+    "id", "submission_date",
+    "cohort_name", "region", "audience_level", "current_maturity",
+    "recommended_pathway", "estimated_budget",
+    "execution_status", "swp_workstream", "governance_checklist_status",
+]
+
+# Cohort Registry: served a page at a time straight from SQL, newest first
+REGISTRY_COLUMNS = [
+    "id", "cohort_name", "region", "audience_level", "recommended_pathway",
+    "execution_status", "swp_workstream", "governance_checklist_status",
+]
+REGISTRY_FILTER_COLUMNS = ["region", "audience_level", "execution_status", "swp_workstream"] # All indexed
+REGISTRY_PAGE_SIZE = 50
+
+REFRESH_INTERVAL_SECONDS = 5     # Pick up other sessions' inserts at most this stale
+FULL_RELOAD_SECONDS = 10 * 60    # Periodic full reload catches out-of-band UPDATEs (e.g. backfills)
+
+
+# 2. The Store
+class DashboardDataStore:
+    """
+    Process-wide, in-memory copy of capability_assessments for the dashboard.
+    Refreshes incrementally: only rows with an id or submission_date past the
+    last watermark are fetched and merged in.
+    """
+
+    def __init__(self, columns: list = None):
+        self.columns = columns or DASHBOARD_COLUMNS
+        self._frame = pd.DataFrame(columns=self.columns)
+        self._last_id = 0
+        self._last_submission = None
+        self._last_refresh = 0.0
+        self._last_full_reload = 0.0
+        self._stale = True
+        self._full_reload_pending = True
+        self._lock = threading.Lock()
+        self.version = 0  # Bumped whenever the frame changes; usable as a cache key for charts
+
+    def invalidate(self, full: bool = False):
+        """Marks the cache stale; the next get_frame() refreshes (fully if full=True)."""
+        with self._lock:
+            self._stale = True
+            if full:
+                self._full_reload_pending = True
+
+    def get_frame(self) -> pd.DataFrame:
+        """Returns the current DataFrame (treat as read-only), refreshing it if due."""
+        with self._lock:
+            now = time.monotonic()
+            if self._full_reload_pending or now - self._last_full_reload > FULL_RELOAD_SECONDS:
+                self._reload(now)
+            elif self._stale or now - self._last_refresh > REFRESH_INTERVAL_SECONDS:
+                self._refresh(now)
+            return self._frame
+
+    def _select(self):
+        table = capability_assessments_table
+        return select(*[table.c[name] for name in self.columns])
+
+    def _reload(self, now: float):
+        with engine.connect() as conn:
+            frame = pd.read_sql(self._select().order_by(capability_assessments_table.c.id), conn)
+        self._frame = frame
+        self._advance_watermark(frame)
+        self._last_full_reload = now
+        self._last_refresh = now
+        self._stale = False
+        self._full_reload_pending = False
+        self.version += 1
+
+    def _refresh(self, now: float):
+        table = capability_assessments_table
+        newer = table.c.id > self._last_id
+        if self._last_submission is not None:
+            newer = or_(newer, table.c.submission_date > self._last_submission)
+
+        with engine.connect() as conn:
+            delta = pd.read_sql(self._select().where(newer).order_by(table.c.id), conn)
+
+        if not delta.empty:
+            kept = self._frame[~self._frame["id"].isin(delta["id"])]
+            self._frame = pd.concat([kept, delta], ignore_index=True) if not kept.empty else delta
+            self._frame = self._frame.sort_values("id", ignore_index=True)
+            self._advance_watermark(delta)
+            self.version += 1
+
+        self._last_refresh = now
+        self._stale = False
+
+    def _advance_watermark(self, rows: pd.DataFrame):
+        if rows.empty:
+            return
+        self._last_id = max(self._last_id, int(rows["id"].max()))
+        latest = rows["submission_date"].max()
+        if pd.notna(latest) and (self._last_submission is None or latest > self._last_submission):
+            self._last_submission = latest.to_pydatetime() if hasattr(latest, "to_pydatetime") else latest
+
+
+# 3. Cohort Registry Pages (keyset pagination)
+@dataclass
+class RegistryPage:
+    rows: pd.DataFrame
+    total: int           # Rows matching the filters (drives the pager)
+    next_cursor: int     # Pass as before_id for the following page; None on the last page
+
+
+def _registry_filter(filters: dict):
+    """WHERE clause for {column: [values]}; empty selections don't filter."""
+    table = capability_assessments_table
+    clauses = []
+    for name, values in (filters or {}).items():
+        if name not in REGISTRY_FILTER_COLUMNS:
+            raise ValueError(f"Cannot filter the registry on '{name}'. Expected one of {REGISTRY_FILTER_COLUMNS}.")
+        if values:
+            clauses.append(table.c[name].in_(list(values)))
+    return clauses
+
+
+def count_registry(filters: dict = None, db_engine=None) -> int:
+    table = capability_assessments_table
+    with (db_engine or engine).connect() as conn:
+        return conn.execute(select(func.count()).select_from(table).where(*_registry_filter(filters))).scalar_one()
+
+
+def fetch_registry_page(filters: dict = None, before_id: int = None, page_size: int = REGISTRY_PAGE_SIZE,
+                        db_engine=None) -> RegistryPage:
+    """
+    One page of the registry, newest first. Pages are addressed by the last id of the
+    previous page (keyset), so deep pages cost the same as the first: the filter columns'
+    indexes carry the rowid, and "id < before_id ORDER BY id DESC LIMIT n" walks them directly.
+    """
+    table = capability_assessments_table
+    query = select(*[table.c[name] for name in REGISTRY_COLUMNS]).where(*_registry_filter(filters))
+    if before_id is not None:
+        query = query.where(table.c.id < before_id)
+    query = query.order_by(table.c.id.desc()).limit(page_size + 1) # One extra row tells us if there is a next page
+
+    with (db_engine or engine).connect() as conn:
+        rows = pd.read_sql(query, conn)
+    has_next = len(rows) > page_size
+    rows = rows.iloc[:page_size]
+    return RegistryPage(
+        rows=rows,
+        total=count_registry(filters, db_engine),
+        next_cursor=int(rows["id"].iloc[-1]) if has_next else None,
+    )
+
+
+# Shared process-wide instance (one per Streamlit server process)
+dashboard_store = DashboardDataStore()
@@ -0,0 +1,316 @@
+# data_export.py
+"""
+Columnar export of the cohort, pulse-check and diagnostics tables for analysts.
+
+Each table is streamed in id-ordered chunks from a single read transaction (one consistent
+snapshot, without blocking the app's writers under WAL) and written to Parquet or Arrow IPC
+files that tools like pandas, DuckDB or Power BI can scan instead of the live database.
+Files can be partitioned hive-style by region or by month (region=Europe/, month=2026-10/);
+the region then lives only in the directory name, which readers turn back into a column.
+
+Exports are incremental: a manifest in the output directory records the highest id written
+per table, and the next run writes only newer rows as new part files. Updates to rows that
+were already exported (e.g. an execution_status change) are picked up by a --full re-export.
+
+    python data_export.py exports/
+    python data_export.py exports/ --partition-by month --tables capability_assessments
+    python data_export.py exports/ --full --format arrow
+"""
+import argparse
+import json
+import os
+import shutil
+import time
+from datetime import datetime, timezone
+
+import pandas as pd
+import pyarrow as pa
+import sqlalchemy
+from sqlalchemy import select
+
+from database import (engine, begin_read_snapshot, capability_assessments_table, behaviour_pulse_table,
+                      individual_diagnostics_table)
+
+# 1. Configuration
+# Table -> the column its "month" partition is derived from
+EXPORT_TABLES = {
+    "capability_assessments": (capability_assessments_table, "submission_date"),
+    "behaviour_pulse_checks": (behaviour_pulse_table, "check_date"),
+    "individual_diagnostics": (individual_diagnostics_table, "creation_date"),
+}
+PARTITION_KEYS = ["region", "month"]
+FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+DEFAULT_CHUNK_SIZE = 50_000
+MANIFEST_NAME = "_export_manifest.json"
+UNKNOWN_PARTITION = "__unknown__"
+TMP_SUFFIX = ".tmp"             # Part files being written: hidden, renamed on commit
+STAGING_SUFFIX = ".staging-"    # Full re-exports are built here, then swapped in
+RETIRED_SUFFIX = ".retired-"    # The previous export, while it is being swapped out
+
+_ARROW_TYPES = [
+    (sqlalchemy.Integer, pa.int64()),
+    (sqlalchemy.Float, pa.float64()),
+    (sqlalchemy.DateTime, pa.timestamp("us")),
+    (sqlalchemy.String, pa.string()), # Includes Text
+]
+
+
+def arrow_schema(table: sqlalchemy.Table) -> pa.Schema:
+    """Fixed Arrow schema from the table definition, so every chunk and part file agrees
+    (inferring per chunk would type an all-NULL column as null)."""
+    fields = []
+    for column in table.columns:
+        arrow_type = next((t for sql_type, t in _ARROW_TYPES if isinstance(column.type, sql_type)), pa.string())
+        fields.append(pa.field(column.name, arrow_type))
+    return pa.schema(fields)
+
+
+# 2. Manifest (the incremental watermark)
+def load_manifest(out_dir: str) -> dict:
+    path = os.path.join(out_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _save_manifest(out_dir: str, manifest: dict):
+    path = os.path.join(out_dir, MANIFEST_NAME)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path) # Readers never see a half-written manifest
+
+
+# 3. Reading (keyset chunks, inside the caller's snapshot)
+def read_chunks(conn, table: sqlalchemy.Table, after_id: int = 0, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """Yields DataFrames of rows with id > after_id, in id order."""
+    while True:
+        chunk = pd.read_sql(select(table).where(table.c.id > after_id).order_by(table.c.id).limit(chunk_size), conn)
+        if chunk.empty:
+            return
+        yield chunk
+        after_id = int(chunk["id"].iloc[-1])
+
+
+def _partition_values(chunk: pd.DataFrame, partition_by: str, month_column: str) -> pd.Series:
+    if partition_by == "region":
+        values = chunk["region"]
+    else:
+        dates = pd.to_datetime(chunk[month_column], errors="coerce")
+        values = dates.dt.strftime("%Y-%m")
+    return values.fillna(UNKNOWN_PARTITION).replace("", UNKNOWN_PARTITION).astype(str)
+
+
+# 4. Writing
+class _PartWriters:
+    """
+    One open Parquet/Arrow writer per partition directory, created on first use. Files are written
+    under hidden temporary names (ignored by pandas / pyarrow / DuckDB) and only get their final
+    part-*.parquet names in commit(), so a failed or killed run never leaves readable partial output.
+    """
+
+    def __init__(self, table_dir: str, schema: pa.Schema, file_format: str, file_name: str):
+        self.table_dir = table_dir
+        self.schema = schema
+        self.file_format = file_format
+        self.file_name = file_name
+        self._writers = {}
+        self._paths = {} # Final path -> temporary path
+        self.files = []
+
+    def write(self, batch: pa.Table, partition: str = None):
+        if partition not in self._writers:
+            directory = self.table_dir if partition is None else os.path.join(self.table_dir, partition)
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, self.file_name)
+            tmp_path = os.path.join(directory, f".{self.file_name}{TMP_SUFFIX}")
+            self._paths[path] = tmp_path
+            if self.file_format == "parquet":
+                import pyarrow.parquet as pq
+                writer = pq.ParquetWriter(tmp_path, self.schema, compression="zstd")
+            else:
+                writer = pa.ipc.new_file(tmp_path, self.schema)
+            self._writers[partition] = writer
+        self._writers[partition].write_table(batch)
+
+    def close(self):
+        writers, self._writers = list(self._writers.values()), {}
+        errors = []
+        for writer in writers: # Close every writer even if one fails
+            try:
+                writer.close()
+            except Exception as e:
+                errors.append(e)
+        if errors:
+            raise errors[0]
+
+    def commit(self):
+        """Closes the writers and gives the files their final names."""
+        self.close()
+        for path, tmp_path in self._paths.items():
+            os.replace(tmp_path, path)
+            self.files.append(path)
+        self._paths = {}
+
+    def abort(self):
+        """Closes the writers and deletes this run's files."""
+        try:
+            self.close()
+        finally:
+            for tmp_path in self._paths.values():
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            self._paths = {}
+
+
+def effective_partition(name: str, partition_by: str):
+    """The partition key actually applied to a table (pulse checks have no region; written unpartitioned)."""
+    table, _ = EXPORT_TABLES[name]
+    return None if partition_by == "region" and "region" not in table.c else partition_by
+
+
+def _run_id() -> str:
+    return datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f") # Part file names never collide across runs
+
+
+def _safe_segment(value: str) -> str:
+    return value.replace("/", "-").replace(os.sep, "-")
+
+
+def export_table(conn, name: str, table_dir: str, after_id: int = 0, partition_by: str = None,
+                 file_format: str = "parquet", chunk_size: int = DEFAULT_CHUNK_SIZE, run_id: str = None) -> dict:
+    """
+    Writes rows with id > after_id to new part files under table_dir; returns {rows, last_id, files}.
+    Nothing is left behind if it raises.
+    """
+    table, month_column = EXPORT_TABLES[name]
+    partition_by = effective_partition(name, partition_by)
+    schema = arrow_schema(table)
+    if partition_by in schema.names:
+        # The value lives in the region=... directory; a column too would clash with it when read back
+        schema = schema.remove(schema.get_field_index(partition_by))
+    run_id = run_id or _run_id()
+    writers = _PartWriters(table_dir, schema, file_format, f"part-{run_id}{FORMATS[file_format]}")
+
+    rows, last_id = 0, after_id
+    try:
+        for chunk in read_chunks(conn, table, after_id, chunk_size):
+            batch = pa.Table.from_pandas(chunk[schema.names], schema=schema, preserve_index=False)
+            if partition_by is None:
+                writers.write(batch)
+            else:
+                values = _partition_values(chunk, partition_by, month_column)
+                for value, positions in values.groupby(values, sort=False).indices.items():
+                    writers.write(batch.take(positions), f"{partition_by}={_safe_segment(value)}")
+            rows += len(chunk)
+            last_id = int(chunk["id"].iloc[-1])
+    except BaseException:
+        writers.abort()
+        raise
+    writers.commit()
+    return {"rows": rows, "last_id": last_id, "files": writers.files}
+
+
+def export_tables(out_dir: str, tables: list = None, partition_by: str = None, file_format: str = "parquet",
+                  full: bool = False, chunk_size: int = DEFAULT_CHUNK_SIZE, db_engine=None) -> dict:
+    """
+    Exports the tables from one snapshot and advances the manifest's watermarks.
+    full=True ignores the watermarks and rewrites each table's directory from scratch.
+
+    Each table is committed on its own: its files are complete and the manifest is saved before
+    the next table starts. A rewrite is built in a staging directory and swapped in only once
+    it has succeeded, so a failure keeps the previous export (and its watermark) intact.
+    """
+    tables = tables or list(EXPORT_TABLES)
+    unknown = [t for t in tables if t not in EXPORT_TABLES]
+    if unknown:
+        raise ValueError(f"Cannot export {unknown}. Expected some of {list(EXPORT_TABLES)}.")
+    if partition_by not in (None, *PARTITION_KEYS):
+        raise ValueError(f"Unknown partition key '{partition_by}'. Expected one of {PARTITION_KEYS}.")
+    if file_format not in FORMATS:
+        raise ValueError(f"Unknown format '{file_format}'. Expected one of {list(FORMATS)}.")
+
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = load_manifest(out_dir)
+    run_id = _run_id()
+    results = {}
+    start = time.perf_counter()
+
+    with (db_engine or engine).connect() as conn:
+        begin_read_snapshot(conn) # Every table and chunk reads the same snapshot
+        try:
+            for name in tables:
+                table_dir = os.path.join(out_dir, name)
+                _remove_leftovers(out_dir, name)
+                previous = manifest.get(name)
+                layout = {"partition_by": effective_partition(name, partition_by), "format": file_format}
+                # A changed layout can't be appended to; start that table over
+                restart = full or previous is None or {k: previous.get(k) for k in layout} != layout
+                after_id = 0 if restart else previous["last_id"]
+
+                if restart:
+                    staging_dir = os.path.join(out_dir, f".{name}{STAGING_SUFFIX}{run_id}")
+                    result = export_table(conn, name, staging_dir, 0, partition_by, file_format, chunk_size, run_id)
+                    _swap_in(staging_dir, table_dir)
+                    result["files"] = [os.path.join(table_dir, os.path.relpath(f, staging_dir)) for f in result["files"]]
+                else:
+                    result = export_table(conn, name, table_dir, after_id, partition_by, file_format, chunk_size, run_id)
+
+                results[name] = {**result, "full": restart}
+                manifest[name] = {**layout, "last_id": result["last_id"],
+                                  "rows": (0 if restart else previous.get("rows", 0)) + result["rows"],
+                                  "exported_at": run_id}
+                _save_manifest(out_dir, manifest) # Per table: a later failure can't orphan this table's files
+        finally:
+            conn.rollback() # Read-only: just end the snapshot
+
+    elapsed = time.perf_counter() - start
+    total = sum(r["rows"] for r in results.values())
+    return {"tables": results, "rows": total, "seconds": round(elapsed, 3),
+            "rows_per_sec": round(total / elapsed) if elapsed else 0}
+
+
+def _swap_in(staging_dir: str, table_dir: str):
+    """Replaces table_dir with a completed staging directory."""
+    os.makedirs(staging_dir, exist_ok=True) # An empty table still gets an (empty) directory
+    retired = None
+    if os.path.exists(table_dir):
+        retired = f"{os.path.dirname(table_dir)}{os.sep}.{os.path.basename(table_dir)}{RETIRED_SUFFIX}{_run_id()}"
+        os.replace(table_dir, retired)
+    os.replace(staging_dir, table_dir)
+    if retired is not None:
+        shutil.rmtree(retired, ignore_errors=True)
+
+
+def _remove_leftovers(out_dir: str, name: str):
+    """Staging directories and temporary part files left by a run that was killed mid-export."""
+    prefixes = (f".{name}{STAGING_SUFFIX}", f".{name}{RETIRED_SUFFIX}")
+    for entry in os.listdir(out_dir):
+        if entry.startswith(prefixes):
+            shutil.rmtree(os.path.join(out_dir, entry), ignore_errors=True)
+    for root, _, files in os.walk(os.path.join(out_dir, name)):
+        for file_name in files:
+            if file_name.startswith(".part-") and file_name.endswith(TMP_SUFFIX):
+                os.remove(os.path.join(root, file_name))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export app tables to Parquet/Arrow for analysts.")
+    parser.add_argument("out_dir")
+    parser.add_argument("--tables", nargs="+", choices=list(EXPORT_TABLES), help="Defaults to all tables.")
+    parser.add_argument("--partition-by", choices=PARTITION_KEYS)
+    parser.add_argument("--format", choices=list(FORMATS), default="parquet")
+    parser.add_argument("--full", action="store_true", help="Ignore the watermark and re-export everything.")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    summary = export_tables(args.out_dir, args.tables, args.partition_by, args.format, args.full, args.chunk_size)
+    for name, result in summary["tables"].items():
+        mode = "full" if result["full"] else "incremental"
+        print(f"  {name}: {result['rows']:,} rows ({mode}) -> {len(result['files'])} file(s), last id {result['last_id']}")
+    print(f"Done: exported {summary['rows']:,} rows in {summary['seconds']}s ({summary['rows_per_sec']:,} rows/s).")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,69 @@
 # database.py
+import os
 import sqlalchemy
 
 # Define the database connection
-# CHANGED VERSION TO v3 TO FORCE REBUILD
-DATABASE_URL = "sqlite:///./qbe_evolution_v6.db"
-engine = sqlalchemy.create_engine(DATABASE_URL)
+# The file name stays fixed: schema changes are versioned migrations (migrations.py), not a fresh file
+DATABASE_URL = os.environ.get("QBE_DATABASE_URL", "sqlite:///./qbe_evolution_v6.db")
+
+# --- SQLite Engine Profiles ---
+# Applied to every new connection via a connect event. "performance" lets dashboard
+# readers run concurrently with assessment writers (WAL) instead of blocking on them.
+SQLITE_PROFILES = {
+    "default": {},  # SQLite defaults (rollback journal, synchronous=FULL)
+    "performance": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",         # Safe with WAL; fsync at checkpoints only
+        "mmap_size": 256 * 1024 * 1024,  # 256 MB memory-mapped reads
+        "cache_size": -64000,            # Negative = KiB, i.e. ~64 MB page cache
+        "busy_timeout": 5000,            # ms to wait on a lock before 'database is locked'
+    },
+}
+DB_PROFILE = os.environ.get("QBE_DB_PROFILE", "performance")
+
+
+def create_app_engine(url: str = DATABASE_URL, profile: str = DB_PROFILE):
+    """Creates an engine and applies the named SQLite PRAGMA profile on connect."""
+    pragmas = SQLITE_PROFILES[profile]
+    new_engine = sqlalchemy.create_engine(url)
+
+    if pragmas and new_engine.dialect.name == "sqlite":
+        @sqlalchemy.event.listens_for(new_engine, "connect")
+        def _apply_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+            cursor.close()
+
+    return new_engine
+
+
+def begin_read_snapshot(conn):
+    """
+    Starts a read transaction so every following SELECT on conn sees one snapshot.
+    pysqlite only emits BEGIN before writes, so for SQLite it is issued explicitly (under WAL
+    this doesn't block writers). End it with conn.rollback().
+    """
+    if conn.dialect.name == "sqlite":
+        conn.exec_driver_sql("BEGIN")
+    else:
+        conn.begin()
+
+
+def begin_write(conn):
+    """
+    Starts a write transaction that holds the write lock from its first statement, so rows read
+    inside it can't be changed by another writer before this one commits (read-modify-write).
+    pysqlite's deferred BEGIN only takes the lock at the first write, hence BEGIN IMMEDIATE.
+    End it with conn.commit() / conn.rollback().
+    """
+    if conn.dialect.name == "sqlite":
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+    else:
+        conn.begin()
+
+
+engine = create_app_engine()
 metadata = sqlalchemy.MetaData()
 
 # 1. Main Capability Assessment Table (The "Cohort")
@@ -63,6 +122,15 @@ vendor_registry_table = sqlalchemy.Table(
     sqlalchemy.Column("status", sqlalchemy.String, default="Active")
 )
 
+# 2b. Vendor Registry Version: one row, bumped by triggers on every vendor_registry write
+# (see migrations.py), so the in-memory vendor_registry reloads only when vendors change.
+vendor_registry_version_table = sqlalchemy.Table(
+    "vendor_registry_version",
+    metadata,
+    sqlalchemy.Column("id", sqlalchemy.Integer, primary_key=True),
+    sqlalchemy.Column("version", sqlalchemy.Integer, nullable=False, default=0)
+)
+
 # 3. Behavioural Pulse Checks
 behaviour_pulse_table = sqlalchemy.Table(
     "behaviour_pulse_checks",
@@ -74,6 +142,41 @@ behaviour_pulse_table = sqlalchemy.Table(
     sqlalchemy.Column("notes", sqlalchemy.String)
 )
 
+# 3b. Behavioural Trajectory Summary (materialized from behaviour_pulse_checks by pulse_tracking.py)
+# One row per assessment with pulses; refreshed incrementally so the dashboard never re-aggregates raw pulses.
+behaviour_trajectory_table = sqlalchemy.Table(
+    "behaviour_trajectory_summary",
+    metadata,
+    sqlalchemy.Column("assessment_id", sqlalchemy.Integer, primary_key=True),
+    sqlalchemy.Column("pulse_count", sqlalchemy.Integer),
+    sqlalchemy.Column("last_pulse_id", sqlalchemy.Integer),      # Incremental refresh watermark
+    sqlalchemy.Column("first_check_date", sqlalchemy.String),
+    sqlalchemy.Column("last_check_date", sqlalchemy.String),
+    sqlalchemy.Column("baseline_score", sqlalchemy.Float),       # baseline_behavior_score, else the first pulse
+    sqlalchemy.Column("target_score", sqlalchemy.Float),
+    sqlalchemy.Column("latest_score", sqlalchemy.Float),
+    sqlalchemy.Column("rolling_score", sqlalchemy.Float),        # Mean of the last few pulses
+    sqlalchemy.Column("progress_pct", sqlalchemy.Float),         # Baseline -> target, 0-100+
+    sqlalchemy.Column("rate_per_week", sqlalchemy.Float),        # Trend slope, score points per week
+    sqlalchemy.Column("projected_completion_date", sqlalchemy.String),
+    sqlalchemy.Column("trajectory_status", sqlalchemy.String),   # Achieved / On Track / At Risk / Stalled / No Target
+    sqlalchemy.Column("updated_at", sqlalchemy.DateTime, default=sqlalchemy.func.now())
+)
+
+# 3c. Dashboard Aggregates (maintained on write by dashboard_aggregates.py)
+# One row per (region, execution_status, swp_workstream, audience_level); NULL dimensions are stored as "".
+dashboard_aggregates_table = sqlalchemy.Table(
+    "dashboard_aggregates",
+    metadata,
+    sqlalchemy.Column("region", sqlalchemy.String, primary_key=True),
+    sqlalchemy.Column("execution_status", sqlalchemy.String, primary_key=True),
+    sqlalchemy.Column("swp_workstream", sqlalchemy.String, primary_key=True),
+    sqlalchemy.Column("audience_level", sqlalchemy.String, primary_key=True),
+    sqlalchemy.Column("cohort_count", sqlalchemy.Integer, nullable=False, default=0),
+    sqlalchemy.Column("budget_sum", sqlalchemy.Integer, nullable=False, default=0),
+    sqlalchemy.Column("maturity_score_sum", sqlalchemy.Float, nullable=False, default=0), # Heatmap numerator
+)
+
 # 4. Individual Diagnostics Table (NEW TABLE for LDP Engine)
 individual_diagnostics_table = sqlalchemy.Table(
     "individual_diagnostics",
@@ -102,12 +205,20 @@ individual_diagnostics_table = sqlalchemy.Table(
     sqlalchemy.Column("creation_date", sqlalchemy.DateTime, default=sqlalchemy.func.now())
 )
 
-# --- CRITICAL FIX: AGGRESSIVELY RESET VENDOR TABLE FOR SCHEMA UPDATE ---
-# This ensures the vendor table is dropped if it exists, forcing a clean creation with the new columns.
-# Uncomment this line and run the app once if you get 'no such column' errors
-# vendor_registry_table.drop(engine, checkfirst=True)
-# capability_assessments_table.drop(engine, checkfirst=True) 
-# individual_diagnostics_table.drop(engine, checkfirst=True)
+# --- Secondary Indexes ---
+# Columns the dashboard and lookups filter/group by. Created by the migrations, which also
+# add them to tables that already exist.
+SECONDARY_INDEXES = [
+    sqlalchemy.Index("ix_capability_assessments_region", capability_assessments_table.c.region),
+    sqlalchemy.Index("ix_capability_assessments_execution_status", capability_assessments_table.c.execution_status),
+    sqlalchemy.Index("ix_capability_assessments_swp_workstream", capability_assessments_table.c.swp_workstream),
+    sqlalchemy.Index("ix_capability_assessments_audience_level", capability_assessments_table.c.audience_level),
+    sqlalchemy.Index("ix_vendor_registry_vendor_name", vendor_registry_table.c.vendor_name),
+    sqlalchemy.Index("ix_behaviour_pulse_checks_assessment_id", behaviour_pulse_table.c.assessment_id),
+    sqlalchemy.Index("ix_individual_diagnostics_leader_name", individual_diagnostics_table.c.leader_name),
+    sqlalchemy.Index("ix_behaviour_trajectory_summary_trajectory_status", behaviour_trajectory_table.c.trajectory_status),
+]
 
-# Create the tables
-metadata.create_all(engine)
+# Create / migrate the tables in place (checks schema_version; see migrations.py)
+import migrations
+migrations.check_schema(engine)
@@ -0,0 +1,109 @@
+# fake_ai_client.py
+"""
+Offline stand-in for the OpenAI client used by ai_logic.
+
+Mimics the subset of the SDK the app touches (client.chat.completions.create, with and
+without stream=True), so generators can be exercised without network access:
+
+    import ai_logic
+    from fake_ai_client import FakeOpenAIClient
+    ai_logic.set_api_client(FakeOpenAIClient(first_token_delay=0.2))
+
+Provider trouble can be injected too: fail_times=3, fail_status=429, retry_after=2 makes the
+first three calls fail like a rate-limited API; a first_token_delay longer than the call's
+timeout raises a timeout.
+"""
+import hashlib
+import threading
+import time
+from collections import deque
+from types import SimpleNamespace
+
+FAKE_VOCABULARY = ["Coaching", "protocol", "focus", "on", "psychological", "safety", "and",
+                   "accountability", "for", "the", "leader", "team", "AI", "adoption", "this", "quarter."]
+
+
+class FakeAPIError(Exception):
+    """Shaped like openai.APIStatusError: .status_code plus .response.headers."""
+
+    def __init__(self, status_code: int, retry_after: float = None):
+        super().__init__(f"Error code: {status_code} (simulated)")
+        self.status_code = status_code
+        headers = {} if retry_after is None else {"retry-after": str(retry_after)}
+        self.response = SimpleNamespace(status_code=status_code, headers=headers)
+
+
+def fake_completion_text(prompt: str, tokens: int) -> str:
+    """Deterministic pseudo-completion: same prompt -> same text."""
+    seed = int(hashlib.sha256(prompt.encode("utf-8")).hexdigest(), 16)
+    words = [FAKE_VOCABULARY[(seed >> (i % 200)) % len(FAKE_VOCABULARY)] for i in range(tokens)]
+    return " ".join(words)
+
+
+class _FakeCompletions:
+    def __init__(self, owner):
+        self.owner = owner
+
+    def create(self, messages: list, model: str, stream: bool = False, **kwargs):
+        owner = self.owner
+        with owner._lock: # Executor threads call concurrently; exactly fail_times calls fail
+            owner.call_count += 1
+            owner.calls.append({"messages": messages, "model": model, "stream": stream, **kwargs})
+            failing = owner.call_count <= owner.fail_times
+        if failing:
+            raise FakeAPIError(owner.fail_status, owner.retry_after)
+        timeout = kwargs.get("timeout")
+        if timeout is not None and owner.first_token_delay > timeout:
+            time.sleep(timeout)
+            raise TimeoutError(f"Request timed out after {timeout:.1f}s (simulated)")
+        prompt = messages[-1]["content"]
+        text = owner.response_text if owner.response_text is not None else fake_completion_text(prompt, owner.tokens)
+        finish_reason = "stop"
+        max_tokens = kwargs.get("max_tokens")
+        if max_tokens is not None and len(text.split()) > max_tokens: # One fake "token" per word
+            text, finish_reason = " ".join(text.split()[:max_tokens]), "length"
+        usage = SimpleNamespace(prompt_tokens=len(prompt.split()), completion_tokens=len(text.split()),
+                                total_tokens=len(prompt.split()) + len(text.split()))
+
+        if not stream:
+            time.sleep(owner.first_token_delay + owner.per_token_delay * len(text.split()))
+            return SimpleNamespace(
+                choices=[SimpleNamespace(message=SimpleNamespace(content=text), finish_reason=finish_reason)],
+                usage=usage, model=model,
+            )
+        include_usage = (kwargs.get("stream_options") or {}).get("include_usage", False)
+        return self._stream(text, model, finish_reason, usage if include_usage else None)
+
+    def _stream(self, text: str, model: str, finish_reason: str, usage=None):
+        owner = self.owner
+        time.sleep(owner.first_token_delay)
+        words = text.split(" ")
+        for i, word in enumerate(words):
+            piece = word if i == 0 else " " + word
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=piece), finish_reason=None)],
+                                  model=model)
+            time.sleep(owner.per_token_delay)
+        yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=None), finish_reason=finish_reason)],
+                              model=model)
+        if usage is not None:
+            yield SimpleNamespace(choices=[], usage=usage, model=model) # Like the SDK's include_usage chunk
+
+
+class FakeOpenAIClient:
+    """Configurable-latency fake with the same call shape as openai.OpenAI."""
+
+    def __init__(self, response_text: str = None, tokens: int = 120,
+                 first_token_delay: float = 0.05, per_token_delay: float = 0.005,
+                 fail_times: int = 0, fail_status: int = 503, retry_after: float = None,
+                 max_recorded_calls: int = 1000):
+        self.response_text = response_text
+        self.tokens = tokens
+        self.first_token_delay = first_token_delay
+        self.per_token_delay = per_token_delay
+        self.fail_times = fail_times
+        self.fail_status = fail_status
+        self.retry_after = retry_after
+        self.call_count = 0
+        self.calls = deque(maxlen=max_recorded_calls) # The most recent calls, for inspection
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=_FakeCompletions(self))
@@ -0,0 +1,180 @@
+# ldp_batch.py
+"""
+Bulk 90-Day Protocol generation for a whole leadership population.
+
+The CSV uses the individual_diagnostics column names (leader_name, role_level, loc_score,
+ambidextrous_score, com_b_score, primary_barrier, core_development_theme, ethical_a_score,
+ethical_b_score, safety_a_score, safety_b_score, collab_a_score, collab_b_score,
+growth_a_score, growth_b_score). Leaders that already have a stored protocol are skipped,
+so a crashed run can simply be restarted.
+
+    python ldp_batch.py leaders.csv --concurrency 8
+    python ldp_batch.py leaders.csv --fake   # offline load test with FakeOpenAIClient (scratch DB)
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import insert, select
+
+import ai_logic
+from ai_executor import AIJob, run_ai_jobs, DEFAULT_MAX_CONCURRENCY, DEFAULT_REQUESTS_PER_MINUTE, DEFAULT_TOKENS_PER_MINUTE
+from database import engine, create_app_engine, individual_diagnostics_table
+
+# individual_diagnostics column -> PROMPT_INDIVIDUAL_PROTOCOL placeholder
+PROMPT_FIELDS = {
+    "role_level": "leader_role",
+    "primary_barrier": "primary_barrier",
+    "core_development_theme": "theme",
+    "loc_score": "loc_score",
+    "ambidextrous_score": "ambidextrous_score",
+    "ethical_a_score": "ethical_a",
+    "ethical_b_score": "ethical_b",
+    "safety_a_score": "safety_a",
+    "safety_b_score": "safety_b",
+    "collab_a_score": "collab_a",
+    "collab_b_score": "collab_b",
+    "growth_a_score": "growth_a",
+    "growth_b_score": "growth_b",
+}
+REQUIRED_COLUMNS = ["leader_name", "com_b_score"] + list(PROMPT_FIELDS)
+DEFAULT_BATCH_SIZE = 50
+
+
+def existing_leaders(db_engine=None) -> set:
+    """Leaders that already have a generated protocol (the resume checkpoint)."""
+    table = individual_diagnostics_table
+    with (db_engine or engine).connect() as conn:
+        rows = conn.execute(
+            select(table.c.leader_name).where(table.c.protocol_generated.is_not(None)).distinct()
+        ).fetchall()
+    return {row.leader_name for row in rows}
+
+
+def _to_record(row: dict) -> dict:
+    """CSV row -> individual_diagnostics insert values (numpy scalars unwrapped, NaN -> None)."""
+    record = {}
+    for column in REQUIRED_COLUMNS:
+        value = row[column]
+        if isinstance(value, float) and np.isnan(value):
+            value = None
+        record[column] = value.item() if hasattr(value, "item") else value
+    return record
+
+
+def run_batch(csv_path: str, batch_size: int = DEFAULT_BATCH_SIZE, max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+              requests_per_minute: float = DEFAULT_REQUESTS_PER_MINUTE,
+              tokens_per_minute: float = DEFAULT_TOKENS_PER_MINUTE, api_client=None, db_engine=None) -> dict:
+    """
+    Streams the CSV in batches, generates protocols concurrently and inserts each batch's
+    successes in one executemany. Failed leaders are not written, so a re-run retries them.
+    """
+    done = existing_leaders(db_engine)
+    latencies, queue_waits, failures = [], [], []
+    generated = skipped = 0
+    start = time.perf_counter()
+
+    for chunk in pd.read_csv(csv_path, chunksize=batch_size):
+        missing = [c for c in REQUIRED_COLUMNS if c not in chunk.columns]
+        if missing:
+            raise ValueError(f"CSV is missing required columns: {missing}")
+
+        records = [_to_record(row) for row in chunk.to_dict("records")]
+        pending = []
+        for record in records:
+            if record["leader_name"] in done:
+                skipped += 1
+            else:
+                done.add(record["leader_name"]) # Also de-duplicates repeated leaders within the file
+                pending.append(record)
+        if not pending:
+            continue
+
+        jobs = [
+            AIJob(ai_logic.PROMPT_INDIVIDUAL_PROTOCOL,
+                  {placeholder: record[column] for column, placeholder in PROMPT_FIELDS.items()},
+                  ai_logic.LDP_PROTOCOL_SYSTEM_PROMPT)
+            for record in pending
+        ]
+        results = run_ai_jobs(jobs, max_concurrency=max_concurrency, requests_per_minute=requests_per_minute,
+                              tokens_per_minute=tokens_per_minute, api_client=api_client)
+
+        rows = []
+        for record, result in zip(pending, results):
+            latencies.append(result.latency)
+            queue_waits.append(result.queued)
+            if result.ok:
+                rows.append({**record, "protocol_generated": result.text})
+            else:
+                failures.append((record["leader_name"], result.error))
+                done.discard(record["leader_name"])
+        if rows:
+            with (db_engine or engine).begin() as conn:
+                conn.execute(insert(individual_diagnostics_table), rows)
+        generated += len(rows)
+
+        elapsed = time.perf_counter() - start
+        print(f"  generated {generated:,} | skipped {skipped:,} | failed {len(failures):,} "
+              f"| {generated / elapsed:,.2f} protocols/s")
+
+    elapsed = time.perf_counter() - start
+    return {
+        "generated": generated,
+        "skipped": skipped,
+        "failed": failures,
+        "seconds": round(elapsed, 2),
+        "throughput_per_sec": round(generated / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": _percentiles_ms(latencies),  # Provider call only
+        "queued_ms": _percentiles_ms(queue_waits), # Waiting on the rate limiter
+    }
+
+
+def _percentiles_ms(seconds: list) -> dict:
+    values = np.array(seconds) * 1000
+    return {f"p{p}": round(float(np.percentile(values, p)), 1) if len(values) else None for p in (50, 90, 95, 99)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate 90-Day Protocols for a CSV of leader diagnostics.")
+    parser.add_argument("csv_path")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Leaders per insert batch.")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_MAX_CONCURRENCY)
+    parser.add_argument("--rpm", type=float, default=DEFAULT_REQUESTS_PER_MINUTE, help="Requests per minute.")
+    parser.add_argument("--tpm", type=float, default=DEFAULT_TOKENS_PER_MINUTE, help="Tokens per minute.")
+    parser.add_argument("--fake", action="store_true",
+                        help="Use the offline FakeOpenAIClient and write to a throwaway database.")
+    args = parser.parse_args()
+
+    api_client = db_engine = scratch_dir = None
+    if args.fake:
+        # Fake protocols must never reach individual_diagnostics: existing_leaders() would skip
+        # those leaders on every later real run. (A passed api_client also bypasses the response cache.)
+        from fake_ai_client import FakeOpenAIClient
+        api_client = FakeOpenAIClient()
+        scratch_dir = tempfile.mkdtemp(prefix="qbe_ldp_fake_")
+        db_engine = create_app_engine(f"sqlite:///{os.path.join(scratch_dir, 'scratch.db')}")
+        individual_diagnostics_table.create(db_engine)
+
+    try:
+        summary = run_batch(args.csv_path, batch_size=args.batch_size, max_concurrency=args.concurrency,
+                            requests_per_minute=args.rpm, tokens_per_minute=args.tpm, api_client=api_client,
+                            db_engine=db_engine)
+    finally:
+        if scratch_dir is not None:
+            db_engine.dispose()
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+
+    print(f"Done in {summary['seconds']}s: generated {summary['generated']:,}, skipped {summary['skipped']:,} "
+          f"(already had a protocol), failed {len(summary['failed']):,}.")
+    print(f"Throughput: {summary['throughput_per_sec']} protocols/s | call latency (ms): {summary['latency_ms']} "
+          f"| rate-limit queue wait (ms): {summary['queued_ms']}")
+    for leader, error in summary["failed"]:
+        print(f"  FAILED {leader}: {error}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,7 @@
 # logic.py
+import functools
 import json
+import numpy as np
 import pandas as pd
 
 # 1. Configuration Data (The "Brain")
@@ -25,6 +27,11 @@ REGION_ISO_MAP = {
     "Global": [] 
 }
 
+# NEW: Maturity Scoring for the Heatmap (1=Skeptic ... 5=Leader)
+MATURITY_SCORES = {"Skeptic": 1, "Observer": 2, "Experimenter": 3, "Adopter": 4, "Leader": 5}
+DEFAULT_MATURITY_LABEL = "Observer" # Used when a cohort has no maturity recorded
+DEFAULT_MATURITY_SCORE = 2 # Used for unrecognised maturity labels
+
 # NEW CONFIGURATION: Strategic Workstreams (Module 3)
 SWP_WORKSTREAMS = [
     "AI Pilot / Co-Pilot Rollout (Immediate)",
@@ -53,6 +60,20 @@ DEFAULT_VENDORS = [
     {"vendor_name": "NeuroLeadership Inst", "specialty": "Culture", "avg_daily_rate": 4000, "performance_rating": 5, "compliance_rating": "Green", "data_residency_cert": "AUS-Privacy"},
 ]
 
+# NEW: Declarative Compliance Rules (1.2)
+# Evaluated in order; the first rule that fires gives the risk message. A rule fires when the
+# region matches ("*" = any), the vendor rating is in "ratings" (if given), and - if
+# "cert_must_contain_any" is given - the vendor's residency cert contains none of those tokens
+# and is not listed in "cert_exempt". Vendors with no recorded cert never fail a cert rule.
+COMPLIANCE_RULES = [
+    {"regions": "*", "ratings": ["Red"],
+     "risk": "Major Risk: Vendor is flagged as high-risk."},
+    {"regions": ["Europe"], "cert_must_contain_any": ["GDPR"],
+     "risk": "RISK: European program using non-GDPR certified vendor."},
+    {"regions": ["AUSPAC"], "cert_must_contain_any": ["Privacy"], "cert_exempt": ["Internal"],
+     "risk": "RISK: AUSPAC program using vendor without local privacy certification."},
+]
+
 # The Logic Matrix: Mapping Audience + Maturity to a Pathway
 # This mimics the "Curation" role of the job description
 PATHWAY_LOGIC = {
@@ -173,12 +194,16 @@ EXECUTION_STATUSES = [
 # NEW LOGIC: Calculate Execution Score (Module 3)
 def calculate_execution_score(df: pd.DataFrame) -> dict:
     """Calculates the strategic readiness based on program status."""
-    total = len(df)
+    return execution_score_from_counts(df['execution_status'].value_counts().to_dict(), len(df))
+
+
+def execution_score_from_counts(status_counts: dict, total: int) -> dict:
+    """calculate_execution_score() from cohort counts per execution_status (e.g. the dashboard aggregates)."""
     if total == 0:
         return {"readiness_score": 0, "complete_count": 0}
-        
-    complete = df[df['execution_status'] == 'Complete'].shape[0]
-    scaling = df[df['execution_status'] == 'Scaling'].shape[0]
+
+    complete = int(status_counts.get('Complete', 0))
+    scaling = int(status_counts.get('Scaling', 0))
     
     # Score prioritizes scaling/completion over planning (Weighting: Complete=1.5x, Scaling=1x)
     readiness_score = ((complete * 1.5) + scaling) / total * 100
@@ -186,6 +211,7 @@ def calculate_execution_score(df: pd.DataFrame) -> dict:
     return {"readiness_score": round(readiness_score), "complete_count": complete}
     
 # NEW: Gap Calculation Helper
+@functools.lru_cache(maxsize=1024) # Slider inputs: a small, fixed domain
 def calculate_behavioural_gap(baseline, target):
     """Returns the 'Gap Size' and a strategic tag."""
     delta = target - baseline
@@ -201,40 +227,61 @@ def calculate_behavioural_gap(baseline, target):
 # --- NEW LOGIC FUNCTION (1.2) ---
 def check_compliance_risk(region: str, vendor_name: str) -> bool:
     """Checks if the vendor is compliant for the target region."""
-    import pandas as pd
-    from database import engine
+    return check_compliance_risk_many([(region, vendor_name)])[0]
+
+
+def check_compliance_risk_many(pairs) -> list:
+    """
+    Batch version of check_compliance_risk for (region, vendor_name) pairs.
+    Uses the in-memory vendor registry and the compiled COMPLIANCE_RULES matrix,
+    so auditing N cohorts is one pass, not N table scans.
+    """
+    pairs = list(pairs)
+    if not pairs:
+        return []
+    regions, vendor_names = zip(*pairs)
+    risks = audit_compliance(pd.DataFrame({"region": regions, "vendor": vendor_names}), "region", "vendor")
+    return risks.tolist()
+
+
+def audit_compliance(df: pd.DataFrame, region_col: str = "region", vendor_col: str = "selected_vendor") -> pd.Series:
+    """
+    Vectorized compliance audit: joins each row's vendor to the registry and looks the
+    (region, certification, rating) triple up in the compiled rule matrix.
+    Returns a Series of risk messages (None = no risk), aligned to df's index.
+    """
+    from sqlalchemy.exc import SQLAlchemyError
+    from vendor_registry import vendor_registry
 
+    no_risk = pd.Series([None] * len(df), index=df.index, dtype=object)
     try:
-        vendor_df = pd.read_sql_table("vendor_registry", engine)
-        vendor_row = vendor_df[vendor_df['vendor_name'] == vendor_name].iloc[0]
-        
-        vendor_cert = vendor_row['data_residency_cert']
-        compliance_rating = vendor_row['compliance_rating']
-        
-        if compliance_rating == "Red":
-            return "Major Risk: Vendor is flagged as high-risk."
-        
-        # Simple Logic for Demonstration (Must refine in real-world)
-        if region == "Europe" and "GDPR" not in vendor_cert:
-            return "RISK: European program using non-GDPR certified vendor."
-        
-        if region == "AUSPAC" and "Privacy" not in vendor_cert and vendor_cert != "Internal":
-            return "RISK: AUSPAC program using vendor without local privacy certification."
-
-        return None # No specific risk found
-
-    except:
-        return None # Default to no risk if DB fails
+        vendors = vendor_registry.snapshot()
+        compiled = vendor_registry.compiled_rules(COMPLIANCE_RULES)
+    except SQLAlchemyError:
+        return no_risk # Default to no risk if DB fails
+
+    names = df[vendor_col].astype(object)
+    known = names.isin(list(vendors.keys())).to_numpy()
+    certs = names.map({name: v["data_residency_cert"] for name, v in vendors.items()})
+    ratings = names.map({name: v["compliance_rating"] for name, v in vendors.items()})
+
+    risks = compiled.lookup_many(df[region_col].to_numpy(dtype=object), certs.to_numpy(dtype=object),
+                                 ratings.to_numpy(dtype=object))
+    risks[~known] = None # Unknown vendor: nothing to check against
+    return pd.Series(risks, index=df.index, dtype=object)
 
 
 def curate_pathway(form_data: dict) -> dict:
     """
     The 'Intelligence Engine' that maps inputs to a recommended strategy.
+    Memoized per (audience, maturity, cohort size); callers get their own copy.
     """
-    audience = form_data["audience_level"]
-    maturity = form_data["current_maturity"]
-    cohort_size_str = form_data["cohort_size"] # e.g. "1-20"
-    
+    return dict(_curate_pathway_cached(form_data["audience_level"], form_data["current_maturity"], form_data["cohort_size"]))
+
+
+@functools.lru_cache(maxsize=1024)
+def _curate_pathway_cached(audience: str, maturity: str, cohort_size_str: str) -> dict:
+    """curate_pathway() for one distinct input triple (cohort_size_str e.g. "1-20")."""
     # 1. Determine Pathway Name
     # Check specialized logic first, else fall back
     if audience in PATHWAY_LOGIC:
@@ -285,3 +332,160 @@ def curate_pathway(form_data: dict) -> dict:
         "program_description": program_description,
         "estimated_budget": budget
     }
+
+
+# --- Process-Wide Memoization ---
+# curate_pathway() and calculate_behavioural_gap() are pure functions of a few categorical
+# inputs, so each distinct input is computed once per process and shared by every session.
+def clear_caches():
+    """Invalidation hook: call after changing PATHWAY_LOGIC, LEARNING_PATHWAYS or COST_PER_HEAD at runtime."""
+    _curate_pathway_cached.cache_clear()
+    calculate_behavioural_gap.cache_clear()
+
+
+# --- NEW LOGIC: Batch Curation Engine ---
+# Column-wise twin of curate_pathway() for re-curating the whole registry at once.
+# Any rule change in curate_pathway() must be mirrored here (benchmarks.py checks parity).
+FALLBACK_PATHWAY = "QBE AI Core Skills"
+FALLBACK_COST_PER_HEAD = 100
+
+
+def _factorize(values: pd.Series):
+    """Returns (codes, uniques) so rules run once per distinct value, not once per row."""
+    codes, uniques = pd.factorize(values, sort=False, use_na_sentinel=False)
+    return codes, pd.Series(uniques, dtype=object).astype(str)
+
+
+def _categorical(codes: np.ndarray, values: np.ndarray) -> pd.Categorical:
+    """Expands per-distinct-value results back to rows without materialising row strings."""
+    value_codes, categories = pd.factorize(values, sort=False)
+    return pd.Categorical.from_codes(value_codes[codes], categories=categories)
+
+
+def curate_pathways(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Vectorized curate_pathway() over a DataFrame of cohorts.
+    Expects 'audience_level', 'current_maturity' and 'cohort_size' columns and returns
+    one row per input row (same index) with the same five keys the scalar function returns.
+    Text columns come back as categoricals (a handful of distinct values per column).
+    """
+    aud_codes, audiences = _factorize(df["audience_level"])
+    mat_codes, maturities = _factorize(df["current_maturity"])
+    size_codes, sizes = _factorize(df["cohort_size"])
+
+    # 1. Pathway: an (audience x maturity) lookup grid built from the distinct values.
+    # Like the scalar .get(maturity), an "all" key only matches a literal "all" maturity.
+    grid = np.array([
+        [PATHWAY_LOGIC.get(aud, {}).get(mat, FALLBACK_PATHWAY) for mat in maturities]
+        for aud in audiences
+    ], dtype=object).reshape(len(audiences), len(maturities))
+    path_codes, pathways = pd.factorize(grid[aud_codes, mat_codes], sort=False)
+    pathways = pd.Series(pathways, dtype=object)
+
+    # 2. Description
+    descriptions = pathways.map(LEARNING_PATHWAYS).fillna(DEFAULT_PATHWAY).to_numpy()
+
+    # 3. Vendor (same substring precedence as the scalar if/elif chain)
+    vendors = np.select(
+        [
+            pathways.str.contains("Visionary", regex=False),
+            pathways.str.contains("Builder", regex=False),
+            pathways.str.contains("Resilient", regex=False),
+        ],
+        ["Gartner / External", "Microsoft / Tech", "Internal L&D / Psych"],
+        default="Internal / Platform",
+    ).astype(object)
+
+    # 4. Urgency: base 50, +30 for Exec/Senior audiences, +20 for low maturity
+    senior = (audiences.str.contains("Exec", regex=False) | audiences.str.contains("Senior", regex=False)).to_numpy()[aud_codes]
+    low_maturity = maturities.isin(["Skeptic", "Observer"]).to_numpy()[mat_codes]
+    urgency = np.select(
+        [senior & low_maturity, senior, low_maturity],
+        [100, 80, 70],
+        default=50,
+    )
+
+    # 5. Budget: parsed head count x cost per head
+    head_counts = np.select(
+        [
+            sizes.str.contains("1-20", regex=False),
+            sizes.str.contains("20-100", regex=False),
+        ],
+        [15, 60],
+        default=150,
+    )
+    cost_basis = audiences.map(COST_PER_HEAD).fillna(FALLBACK_COST_PER_HEAD).to_numpy(dtype=np.int64)
+
+    return pd.DataFrame({
+        "urgency_score": urgency.astype(np.int64),
+        "recommended_pathway": _categorical(path_codes, pathways.to_numpy()),
+        "recommended_vendor": _categorical(path_codes, vendors),
+        "program_description": _categorical(path_codes, descriptions),
+        "estimated_budget": head_counts.astype(np.int64)[size_codes] * cost_basis[aud_codes],
+    }, index=df.index)
+
+
+# --- NEW LOGIC: Heatmap Aggregation ---
+def aggregate_maturity_by_country(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Mean maturity score and cohort count per ISO country for the Global Heatmap.
+    Scores each cohort via a categorical maturity code, aggregates per region,
+    then explodes regions to countries with a merge against REGION_ISO_MAP.
+    Returns columns ['iso_alpha', 'maturity', 'cohort_count'], sorted by iso_alpha.
+    """
+    if df.empty:
+        return maturity_by_country_from_regions(pd.DataFrame(columns=["region", "sum", "count"]))
+
+    # 1. Maturity score per cohort
+    scores = maturity_scores(df["current_maturity"])
+
+    # 2. Aggregate per region first (few groups), so the explode is O(#regions)
+    per_region = (
+        pd.DataFrame({"region": df["region"].to_numpy(), "score": scores})
+        .groupby("region", observed=True, sort=False)["score"]
+        .agg(["sum", "count"])
+        .reset_index()
+    )
+    return maturity_by_country_from_regions(per_region)
+
+
+def maturity_score(label) -> float:
+    """Heatmap score for one maturity label: its first word; missing/blank labels count as the default label."""
+    if label is None or label != label or label == "": # None / NaN / blank
+        return float(MATURITY_SCORES.get(DEFAULT_MATURITY_LABEL, DEFAULT_MATURITY_SCORE))
+    return float(MATURITY_SCORES.get(str(label).split(" ", 1)[0], DEFAULT_MATURITY_SCORE))
+
+
+def maturity_scores(labels: pd.Series) -> np.ndarray:
+    """maturity_score() per label, via a categorical so each distinct label is scored once."""
+    labels = labels.astype("category")
+    category_scores = np.array([maturity_score(c) for c in labels.cat.categories] + [maturity_score(None)])
+    return category_scores[labels.cat.codes.to_numpy()] # Code -1 (missing) picks the trailing default
+
+
+def maturity_by_country_from_regions(per_region: pd.DataFrame) -> pd.DataFrame:
+    """
+    Heatmap rows from per-region maturity score totals (columns 'region', 'sum', 'count').
+    Shared by aggregate_maturity_by_country() and the materialized dashboard aggregates.
+    """
+    empty = pd.DataFrame({"iso_alpha": pd.Series(dtype=object),
+                          "maturity": pd.Series(dtype=float),
+                          "cohort_count": pd.Series(dtype=np.int64)})
+    if per_region.empty:
+        return empty
+
+    # Region -> ISO explode via merge, then re-aggregate per country
+    region_iso = pd.DataFrame(
+        [(region, iso) for region, isos in REGION_ISO_MAP.items() for iso in isos],
+        columns=["region", "iso_alpha"],
+    )
+    per_country = per_region.merge(region_iso, on="region", how="inner")
+    if per_country.empty:
+        return empty
+
+    totals = per_country.groupby("iso_alpha")[["sum", "count"]].sum()
+    return pd.DataFrame({
+        "iso_alpha": totals.index.to_numpy(dtype=object),
+        "maturity": (totals["sum"] / totals["count"]).to_numpy(dtype=float),
+        "cohort_count": totals["count"].to_numpy(dtype=np.int64),
+    })
@@ -0,0 +1,262 @@
+# migrations.py
+"""
+Versioned, in-place schema migrations for the main database (replaces drop-and-recreate).
+
+The schema_version table records every migration applied. database.py checks it on startup
+and, by default, applies the pending ones; a database written by newer code than this
+checkout refuses to start instead of being used with the wrong schema.
+
+Migrations only CREATE TABLE / ADD COLUMN / CREATE INDEX / CREATE TRIGGER (SQLite adds a
+column without rewriting the table) and are idempotent, so a database from before versioning, or two
+processes starting at once, converge on the same schema. Data rewrites go through
+batched_update(), which commits per id range so the app's writers are never locked out
+for the length of the whole table.
+
+To change the schema: edit the table in database.py, then append a migration below that
+brings existing databases to it (add_column / create_index / batched_update).
+
+    python migrations.py status
+    python migrations.py upgrade
+
+Set QBE_SCHEMA_MIGRATE=check to have startup only verify the version (e.g. when a large
+migration is run out of hours with `upgrade`).
+"""
+import argparse
+import logging
+import os
+import time
+
+import sqlalchemy
+from sqlalchemy import func, select
+
+logger = logging.getLogger(__name__)
+
+# 1. Configuration
+# auto: apply pending migrations on startup | check: fail startup if any are pending | off: skip
+SCHEMA_MIGRATE = os.environ.get("QBE_SCHEMA_MIGRATE", "auto")
+BATCH_SIZE = 5000 # Rows per transaction in batched_update()
+
+schema_metadata = sqlalchemy.MetaData()
+
+schema_version_table = sqlalchemy.Table(
+    "schema_version",
+    schema_metadata,
+    sqlalchemy.Column("version", sqlalchemy.Integer, primary_key=True),
+    sqlalchemy.Column("name", sqlalchemy.String),
+    sqlalchemy.Column("applied_at", sqlalchemy.DateTime, default=sqlalchemy.func.now()),
+    sqlalchemy.Column("seconds", sqlalchemy.Float),
+)
+
+
+class SchemaVersionError(RuntimeError):
+    """The database schema doesn't match this code (pending migrations, or newer than the code)."""
+
+
+# 2. Building Blocks (each is a no-op when already applied)
+def create_table(db_engine, table: sqlalchemy.Table):
+    table.create(db_engine, checkfirst=True)
+
+
+def create_indexes(db_engine, table: sqlalchemy.Table):
+    """Creates database.SECONDARY_INDEXES declared on table (create_table() skips them for existing tables)."""
+    from database import SECONDARY_INDEXES
+    for index in SECONDARY_INDEXES:
+        if index.table is table:
+            index.create(db_engine, checkfirst=True)
+
+
+def add_column(db_engine, table: sqlalchemy.Table, column_name: str) -> bool:
+    """ALTER TABLE ... ADD COLUMN for a column declared in database.py; existing rows get NULL."""
+    from database import begin_write
+    column_sql = sqlalchemy.schema.CreateColumn(table.c[column_name]).compile(dialect=db_engine.dialect)
+    with db_engine.connect() as conn:
+        begin_write(conn) # Check and ALTER under the write lock: concurrent starts can't both add it
+        try:
+            if column_name in {c["name"] for c in sqlalchemy.inspect(conn).get_columns(table.name)}:
+                conn.rollback()
+                return False
+            conn.exec_driver_sql(f'ALTER TABLE "{table.name}" ADD COLUMN {column_sql}')
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+    return True
+
+
+def add_missing_columns(db_engine, table: sqlalchemy.Table) -> list:
+    """Adds every column declared in database.py that the database's copy of table lacks."""
+    return [c.name for c in table.columns if not c.primary_key and add_column(db_engine, table, c.name)]
+
+
+def batched_update(db_engine, table: sqlalchemy.Table, values: dict, where=None, batch_size: int = BATCH_SIZE) -> int:
+    """
+    UPDATE table SET values [WHERE where], one id range of batch_size rows per transaction.
+    Each batch is a primary-key range scan, and other connections can write between batches.
+    Returns the number of rows updated.
+    """
+    updated, last_id = 0, 0
+    while True:
+        with db_engine.begin() as conn:
+            upper = conn.execute(select(table.c.id).where(table.c.id > last_id).order_by(table.c.id)
+                                 .offset(batch_size - 1).limit(1)).scalar()
+            in_range = table.c.id > last_id
+            if upper is not None:
+                in_range &= table.c.id <= upper
+            if where is not None:
+                in_range &= where
+            updated += conn.execute(sqlalchemy.update(table).where(in_range).values(values)).rowcount
+        if upper is None:
+            return updated
+        last_id = upper
+
+
+# 3. The Migrations (append only; never edit one that has shipped)
+def _core_tables(db_engine):
+    from database import (capability_assessments_table, vendor_registry_table, behaviour_pulse_table,
+                          individual_diagnostics_table)
+    for table in (capability_assessments_table, vendor_registry_table, behaviour_pulse_table,
+                  individual_diagnostics_table):
+        create_table(db_engine, table)
+
+
+def _pre_versioning_columns(db_engine):
+    """Databases created before a column was added (the behaviour, governance and execution fields)."""
+    from database import capability_assessments_table, vendor_registry_table, individual_diagnostics_table
+    for table in (capability_assessments_table, vendor_registry_table, individual_diagnostics_table):
+        added = add_missing_columns(db_engine, table)
+        if added:
+            logger.info("Added columns to %s: %s", table.name, added)
+
+
+def _status_defaults(db_engine):
+    """Rows that predate a status column got NULL rather than its default."""
+    from database import capability_assessments_table, vendor_registry_table, dashboard_aggregates_table
+    table = capability_assessments_table
+    changed = 0
+    for column, default in (("execution_status", "Planning"), ("governance_checklist_status", "Incomplete"),
+                            ("status", "Proposed")):
+        changed += batched_update(db_engine, table, {column: default}, table.c[column].is_(None))
+    batched_update(db_engine, vendor_registry_table, {"status": "Active"}, vendor_registry_table.c.status.is_(None))
+    if changed and sqlalchemy.inspect(db_engine).has_table(dashboard_aggregates_table.name):
+        with db_engine.begin() as conn: # Grouped under the old NULL status; empty = rebuilt on next use
+            conn.execute(sqlalchemy.delete(dashboard_aggregates_table))
+
+
+def _core_indexes(db_engine):
+    from database import (capability_assessments_table, vendor_registry_table, behaviour_pulse_table,
+                          individual_diagnostics_table)
+    for table in (capability_assessments_table, vendor_registry_table, behaviour_pulse_table,
+                  individual_diagnostics_table):
+        create_indexes(db_engine, table)
+
+
+def _trajectory_summary(db_engine):
+    from database import behaviour_trajectory_table
+    create_table(db_engine, behaviour_trajectory_table)
+    create_indexes(db_engine, behaviour_trajectory_table)
+
+
+def _dashboard_aggregates(db_engine):
+    # Filled by dashboard_aggregates on first use (a keyset-chunked recompute)
+    from database import dashboard_aggregates_table
+    create_table(db_engine, dashboard_aggregates_table)
+
+
+def _vendor_registry_version(db_engine):
+    """Version row plus SQLite triggers that bump it on any vendor_registry write (manual SQL included)."""
+    from database import vendor_registry_table, vendor_registry_version_table
+    create_table(db_engine, vendor_registry_version_table)
+    with db_engine.begin() as conn:
+        if conn.execute(select(vendor_registry_version_table.c.id)).first() is None:
+            conn.execute(sqlalchemy.insert(vendor_registry_version_table).values(id=1, version=0))
+        if db_engine.dialect.name != "sqlite":
+            return # Elsewhere vendor_registry.invalidate() is the reload signal
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            conn.exec_driver_sql(
+                f'CREATE TRIGGER IF NOT EXISTS "{vendor_registry_table.name}_version_{event.lower()}" '
+                f'AFTER {event} ON "{vendor_registry_table.name}" BEGIN '
+                f'UPDATE "{vendor_registry_version_table.name}" SET version = version + 1; END')
+
+
+MIGRATIONS = [
+    (1, "core tables", _core_tables),
+    (2, "pre-versioning columns", _pre_versioning_columns),
+    (3, "status defaults for existing rows", _status_defaults),
+    (4, "secondary indexes", _core_indexes),
+    (5, "behaviour trajectory summary", _trajectory_summary),
+    (6, "dashboard aggregates", _dashboard_aggregates),
+    (7, "vendor registry version", _vendor_registry_version),
+]
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+# 4. Running Them
+def current_version(db_engine) -> int:
+    """Highest applied migration (0 for a new or pre-versioning database)."""
+    if not sqlalchemy.inspect(db_engine).has_table(schema_version_table.name):
+        return 0
+    with db_engine.connect() as conn:
+        return conn.execute(select(func.max(schema_version_table.c.version))).scalar() or 0
+
+
+def pending_migrations(db_engine) -> list:
+    version = current_version(db_engine)
+    if version > LATEST_VERSION:
+        raise SchemaVersionError(f"Database schema is at version {version}, newer than this code "
+                                 f"({LATEST_VERSION}). Update the app before running it against this database.")
+    return [m for m in MIGRATIONS if m[0] > version]
+
+
+def upgrade(db_engine) -> list:
+    """Applies pending migrations in order; returns [(version, name, seconds)]."""
+    schema_metadata.create_all(db_engine)
+    applied = []
+    for version, name, migration in pending_migrations(db_engine):
+        start = time.perf_counter()
+        migration(db_engine)
+        seconds = time.perf_counter() - start
+        try:
+            with db_engine.begin() as conn:
+                conn.execute(sqlalchemy.insert(schema_version_table).values(version=version, name=name, seconds=seconds))
+        except sqlalchemy.exc.IntegrityError:
+            pass # Another process applied it concurrently (migrations are idempotent)
+        logger.info("Applied schema migration %d (%s) in %.2fs", version, name, seconds)
+        applied.append((version, name, seconds))
+    return applied
+
+
+def check_schema(db_engine, mode: str = SCHEMA_MIGRATE):
+    """Startup check, called by database.py."""
+    if mode == "off":
+        return
+    if mode == "auto":
+        upgrade(db_engine)
+        return
+    pending = pending_migrations(db_engine)
+    if pending:
+        raise SchemaVersionError(f"Database schema is at version {current_version(db_engine)}; "
+                                 f"{len(pending)} migration(s) pending. Run `python migrations.py upgrade`.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply or inspect schema migrations for the main database.")
+    parser.add_argument("command", choices=["status", "upgrade"])
+    args = parser.parse_args()
+
+    os.environ["QBE_SCHEMA_MIGRATE"] = "off" # This command does the migrating (must run before database is imported)
+    import database
+    logging.basicConfig(level=logging.INFO, format="  %(message)s")
+
+    if args.command == "status":
+        pending = pending_migrations(database.engine)
+        print(f"Schema version {current_version(database.engine)} (latest {LATEST_VERSION}).")
+        for version, name, _ in pending:
+            print(f"  pending: {version} {name}")
+        return
+    applied = upgrade(database.engine)
+    print(f"Done: applied {len(applied)} migration(s) in {sum(s for _, _, s in applied):.2f}s; "
+          f"schema version {current_version(database.engine)}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,340 @@
+# pulse_tracking.py
+"""
+Behaviour pulse check-ins and the trajectory engine that compares them with each cohort's
+baseline_behavior_score / target_behavior_score.
+
+Check-ins are written to behaviour_pulse_checks (one at a time or in bulk), and in the same
+transaction the affected cohorts' rows in behaviour_trajectory_summary are recomputed from
+their pulses. The dashboard reads only that summary table.
+
+    python pulse_tracking.py import pulses.csv      # columns: assessment_id, check_date, new_score[, notes]
+    python pulse_tracking.py refresh                # catch up on pulses written out-of-band
+    python pulse_tracking.py refresh --full
+"""
+import argparse
+import time
+from datetime import date
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import delete, func, insert, select
+
+from database import engine, capability_assessments_table, behaviour_pulse_table, behaviour_trajectory_table
+
+# 1. Configuration
+ROLLING_WINDOW = 3            # Pulses averaged into rolling_score (smooths one-off readings)
+TREND_WINDOW = 6              # Most recent pulses used for the rate-of-change slope
+TARGET_HORIZON_DAYS = 365     # The intake form's target is "where they need to be in 12 months"
+MAX_PROJECTION_DAYS = 5 * 365 # Slower trends are reported as Stalled, not as a date decades out
+MIN_SCORE, MAX_SCORE = 1, 10
+IDS_PER_QUERY = 500           # Keeps IN (...) lists under SQLite's bound-parameter limit
+DEFAULT_CHUNK_SIZE = 5000
+
+TRAJECTORY_STATUSES = ["Achieved", "On Track", "At Risk", "Stalled", "No Target"]
+
+
+# 2. The Trajectory Engine (vectorized over all pulses at once)
+def compute_trajectories(pulses: pd.DataFrame, assessments: pd.DataFrame) -> pd.DataFrame:
+    """
+    One summary row per assessment that has pulses.
+    pulses: id, assessment_id, check_date, new_score.
+    assessments: id, baseline_behavior_score, target_behavior_score, submission_date.
+    Progress uses the rolling score; the rate is a least-squares slope over the last
+    TREND_WINDOW pulses, and the projected completion date extrapolates it to the target.
+    """
+    columns = [c.name for c in behaviour_trajectory_table.columns if c.name != "updated_at"]
+    p = pulses.assign(check_date=pd.to_datetime(pulses["check_date"], errors="coerce"),
+                      new_score=pd.to_numeric(pulses["new_score"], errors="coerce"))
+    p = p.dropna(subset=["check_date", "new_score"])
+    if p.empty:
+        return pd.DataFrame(columns=columns)
+    p = p.sort_values(["assessment_id", "check_date", "id"], kind="stable", ignore_index=True)
+    groups = p.groupby("assessment_id", sort=False)
+
+    # 1. Rolling score: the mean of each cohort's last ROLLING_WINDOW pulses (the window ending
+    # at its latest pulse; a reverse cumcount mask avoids groupby().rolling()'s per-group bounds)
+    from_end = groups.cumcount(ascending=False)
+    rolling_score = p[from_end < ROLLING_WINDOW].groupby("assessment_id")["new_score"].mean()
+
+    # 2. Trend: closed-form least-squares slope from per-group sums (no per-cohort Python loop)
+    recent = p[from_end < TREND_WINDOW]
+    x = (recent["check_date"] - recent.groupby("assessment_id")["check_date"].transform("min")).dt.days.astype(float)
+    y = recent["new_score"].astype(float)
+    sums = pd.DataFrame({"assessment_id": recent["assessment_id"], "n": 1.0, "x": x, "y": y,
+                         "xy": x * y, "xx": x * x}).groupby("assessment_id").sum()
+    denominator = sums["n"] * sums["xx"] - sums["x"] ** 2
+    slope_per_day = ((sums["n"] * sums["xy"] - sums["x"] * sums["y"]) / denominator).where(denominator > 0)
+
+    # 3. Latest state per cohort, joined to its baseline/target
+    last = groups.tail(1).set_index("assessment_id")
+    summary = pd.DataFrame({
+        "pulse_count": groups.size(),
+        "last_pulse_id": groups["id"].max(),
+        "first_check_date": groups["check_date"].min(),
+        "last_check_date": last["check_date"],
+        "first_score": groups["new_score"].first(),
+        "latest_score": last["new_score"],
+        "rolling_score": rolling_score,
+        "slope_per_day": slope_per_day,
+    })
+    targets = assessments.set_index("id").reindex(summary.index)
+    baseline = pd.to_numeric(targets["baseline_behavior_score"], errors="coerce").fillna(summary["first_score"])
+    target = pd.to_numeric(targets["target_behavior_score"], errors="coerce")
+    submitted = pd.to_datetime(targets["submission_date"], errors="coerce").fillna(summary["first_check_date"])
+
+    # 4. Progress, projection and status
+    rolling = summary["rolling_score"]
+    span = target - baseline
+    achieved = (rolling >= target).to_numpy()
+    progress = ((rolling - baseline) / span * 100).where(span > 0, np.where(achieved, 100.0, 0.0))
+    progress = progress.where(target.notna())
+
+    days_left = (target - rolling) / summary["slope_per_day"]
+    projectable = (summary["slope_per_day"] > 0) & ~achieved & (days_left <= MAX_PROJECTION_DAYS)
+    projected = summary["last_check_date"] + pd.to_timedelta(days_left.where(projectable), unit="D")
+    projected = projected.where(~achieved, summary["last_check_date"]) # Achieved: the date it got there (or later)
+    deadline = submitted + pd.Timedelta(days=TARGET_HORIZON_DAYS)
+
+    status = np.select(
+        [target.isna().to_numpy(), achieved, projected.isna().to_numpy(), (projected <= deadline).to_numpy()],
+        ["No Target", "Achieved", "Stalled", "On Track"],
+        default="At Risk",
+    )
+
+    return pd.DataFrame({
+        "assessment_id": summary.index.to_numpy(dtype=np.int64),
+        "pulse_count": summary["pulse_count"].to_numpy(dtype=np.int64),
+        "last_pulse_id": summary["last_pulse_id"].to_numpy(dtype=np.int64),
+        "first_check_date": summary["first_check_date"].dt.strftime("%Y-%m-%d").to_numpy(dtype=object),
+        "last_check_date": summary["last_check_date"].dt.strftime("%Y-%m-%d").to_numpy(dtype=object),
+        "baseline_score": baseline.to_numpy(dtype=float),
+        "target_score": target.to_numpy(dtype=float),
+        "latest_score": summary["latest_score"].to_numpy(dtype=float),
+        "rolling_score": rolling.round(2).to_numpy(dtype=float),
+        "progress_pct": progress.round(1).to_numpy(dtype=float),
+        "rate_per_week": (summary["slope_per_day"] * 7).round(3).to_numpy(dtype=float),
+        "projected_completion_date": projected.dt.strftime("%Y-%m-%d").to_numpy(dtype=object),
+        "trajectory_status": status.astype(object),
+    })[columns]
+
+
+# 3. The Materialized Summary
+def _records(frame: pd.DataFrame) -> list:
+    """DataFrame -> insert params (NaN/NaT -> None, numpy scalars -> Python)."""
+    records = frame.astype(object).where(frame.notna(), None).to_dict("records")
+    for record in records:
+        for key, value in record.items():
+            if isinstance(value, np.generic):
+                record[key] = value.item()
+    return records
+
+
+def stale_assessment_ids(conn) -> list:
+    """Assessments with pulses newer than their summary row (or no summary row yet)."""
+    pulses, summary = behaviour_pulse_table, behaviour_trajectory_table
+    query = (
+        select(pulses.c.assessment_id).distinct()
+        .select_from(pulses.outerjoin(summary, summary.c.assessment_id == pulses.c.assessment_id))
+        .where(summary.c.assessment_id.is_(None) | (pulses.c.id > summary.c.last_pulse_id))
+    )
+    return [row[0] for row in conn.execute(query) if row[0] is not None]
+
+
+def refresh_summaries(conn, assessment_ids: list = None) -> int:
+    """
+    Recomputes the summary rows of the given assessments (default: the stale ones) inside
+    the caller's transaction. Returns the number of assessments refreshed.
+    """
+    if assessment_ids is None:
+        assessment_ids = stale_assessment_ids(conn)
+    assessment_ids = sorted({int(i) for i in assessment_ids})
+    pulses, cohorts, summary = behaviour_pulse_table, capability_assessments_table, behaviour_trajectory_table
+
+    for start in range(0, len(assessment_ids), IDS_PER_QUERY):
+        batch = assessment_ids[start:start + IDS_PER_QUERY]
+        pulse_rows = pd.read_sql(
+            select(pulses.c.id, pulses.c.assessment_id, pulses.c.check_date, pulses.c.new_score)
+            .where(pulses.c.assessment_id.in_(batch)), conn)
+        targets = pd.read_sql(
+            select(cohorts.c.id, cohorts.c.baseline_behavior_score, cohorts.c.target_behavior_score,
+                   cohorts.c.submission_date).where(cohorts.c.id.in_(batch)), conn)
+        rows = compute_trajectories(pulse_rows, targets)
+
+        conn.execute(delete(summary).where(summary.c.assessment_id.in_(batch)))
+        if not rows.empty:
+            conn.execute(insert(summary), _records(rows))
+    return len(assessment_ids)
+
+
+def rebuild_summaries(db_engine=None) -> int:
+    """Drops every summary row and recomputes them all (e.g. after editing the engine's rules)."""
+    with (db_engine or engine).begin() as conn:
+        conn.execute(delete(behaviour_trajectory_table))
+        ids = [row[0] for row in conn.execute(select(behaviour_pulse_table.c.assessment_id).distinct())
+               if row[0] is not None]
+        return refresh_summaries(conn, ids)
+
+
+# 4. Ingestion
+def validate_pulses(pulses: pd.DataFrame, known_ids: set):
+    """Splits check-ins into (valid rows, rejected rows with a 'reason')."""
+    missing = [c for c in ("assessment_id", "new_score") if c not in pulses.columns]
+    if missing:
+        raise ValueError(f"Check-ins are missing required columns: {missing}")
+
+    rows = pulses.copy()
+    if "check_date" not in rows.columns:
+        rows["check_date"] = None
+    if "notes" not in rows.columns:
+        rows["notes"] = None
+    ids = pd.to_numeric(rows["assessment_id"], errors="coerce")
+    scores = pd.to_numeric(rows["new_score"], errors="coerce")
+    blank_date = rows["check_date"].isna() | (rows["check_date"].astype(str).str.strip() == "")
+    dates = pd.to_datetime(rows["check_date"].where(~blank_date), errors="coerce")
+    dates = dates.where(~blank_date, pd.Timestamp(date.today()))
+
+    reasons = pd.Series("", index=rows.index, dtype=object)
+
+    def reject(mask, message):
+        reasons[mask & (reasons == "")] = message
+
+    reject(ids.isna() | ~ids.isin(known_ids), "unknown assessment_id")
+    reject(scores.isna() | (scores % 1 != 0) | (scores < MIN_SCORE) | (scores > MAX_SCORE),
+           f"new_score must be {MIN_SCORE}-{MAX_SCORE}")
+    reject(dates.isna(), "check_date is not a date")
+    reject(dates > pd.Timestamp(date.today()), "check_date is in the future")
+
+    valid = reasons == ""
+    clean = pd.DataFrame({
+        "assessment_id": ids[valid].astype(np.int64),
+        "check_date": dates[valid].dt.strftime("%Y-%m-%d"),
+        "new_score": scores[valid].astype(np.int64),
+        "notes": rows.loc[valid, "notes"].astype(object).where(rows.loc[valid, "notes"].notna(), None),
+    })
+    return clean, pulses.loc[~valid].assign(reason=reasons[~valid])
+
+
+def _existing_assessments(conn, ids) -> set:
+    ids = sorted({int(i) for i in pd.to_numeric(pd.Series(list(ids)), errors="coerce").dropna()})
+    table = capability_assessments_table
+    found = set()
+    for start in range(0, len(ids), IDS_PER_QUERY):
+        batch = ids[start:start + IDS_PER_QUERY]
+        found.update(row[0] for row in conn.execute(select(table.c.id).where(table.c.id.in_(batch))))
+    return found
+
+
+def record_pulses(pulses, db_engine=None) -> dict:
+    """
+    Bulk check-in: validates, inserts the valid pulses with one executemany and refreshes
+    the affected cohorts' summaries, all in one transaction. Accepts a DataFrame or a list of dicts.
+    """
+    pulses = pulses if isinstance(pulses, pd.DataFrame) else pd.DataFrame(list(pulses))
+    with (db_engine or engine).begin() as conn:
+        known = _existing_assessments(conn, pulses["assessment_id"]) if "assessment_id" in pulses else set()
+        valid, rejected = validate_pulses(pulses, known)
+        if not valid.empty:
+            conn.execute(insert(behaviour_pulse_table), _records(valid))
+            refresh_summaries(conn, valid["assessment_id"].unique().tolist())
+    return {
+        "inserted": len(valid),
+        "rejected": len(rejected),
+        "rejected_rows": [{"row": row, "assessment_id": r.get("assessment_id"), "reason": r["reason"]}
+                          for row, r in rejected.head(100).iterrows()],
+    }
+
+
+def record_pulse(assessment_id: int, new_score: int, check_date: str = None, notes: str = None, db_engine=None) -> dict:
+    """Single check-in; raises ValueError if it is rejected. Returns the cohort's refreshed summary."""
+    result = record_pulses([{"assessment_id": assessment_id, "new_score": new_score,
+                             "check_date": check_date, "notes": notes}], db_engine)
+    if result["rejected"]:
+        raise ValueError(f"Check-in rejected: {result['rejected_rows'][0]['reason']}")
+    return get_summary(assessment_id, db_engine)
+
+
+def import_pulses(source, chunk_size: int = DEFAULT_CHUNK_SIZE, db_engine=None, on_chunk=None) -> dict:
+    """Streams a check-in CSV in chunks through record_pulses()."""
+    totals = {"read": 0, "inserted": 0, "rejected": 0, "rejected_rows": []}
+    start = time.perf_counter()
+    for chunk in pd.read_csv(source, chunksize=chunk_size):
+        chunk.index = pd.RangeIndex(totals["read"] + 1, totals["read"] + 1 + len(chunk)) # 1-based file rows
+        result = record_pulses(chunk, db_engine)
+        totals["read"] += len(chunk)
+        totals["inserted"] += result["inserted"]
+        totals["rejected"] += result["rejected"]
+        totals["rejected_rows"] += result["rejected_rows"][:max(0, 100 - len(totals["rejected_rows"]))]
+        elapsed = time.perf_counter() - start
+        totals["seconds"] = round(elapsed, 3)
+        totals["rows_per_sec"] = round(totals["read"] / elapsed) if elapsed else 0
+        if on_chunk is not None:
+            on_chunk(totals)
+    return totals
+
+
+# 5. Reading the Summary (for the dashboard)
+def get_summary(assessment_id: int, db_engine=None):
+    table = behaviour_trajectory_table
+    with (db_engine or engine).connect() as conn:
+        row = conn.execute(select(table).where(table.c.assessment_id == assessment_id)).mappings().first()
+    return dict(row) if row is not None else None
+
+
+def trajectory_overview(db_engine=None) -> pd.DataFrame:
+    """Cohort count and mean progress / rate per trajectory status (a GROUP BY over the summary)."""
+    table = behaviour_trajectory_table
+    query = (
+        select(table.c.trajectory_status, func.count().label("cohorts"),
+               func.avg(table.c.progress_pct).label("avg_progress_pct"),
+               func.avg(table.c.rate_per_week).label("avg_rate_per_week"))
+        .group_by(table.c.trajectory_status)
+    )
+    with (db_engine or engine).connect() as conn:
+        return pd.read_sql(query, conn)
+
+
+def cohorts_needing_attention(limit: int = 20, db_engine=None) -> pd.DataFrame:
+    """At Risk / Stalled cohorts, least progress first."""
+    summary, cohorts = behaviour_trajectory_table, capability_assessments_table
+    query = (
+        select(summary.c.assessment_id, cohorts.c.cohort_name, cohorts.c.region, summary.c.trajectory_status,
+               summary.c.rolling_score, summary.c.target_score, summary.c.progress_pct, summary.c.rate_per_week,
+               summary.c.projected_completion_date, summary.c.last_check_date)
+        .join(cohorts, cohorts.c.id == summary.c.assessment_id)
+        .where(summary.c.trajectory_status.in_(["At Risk", "Stalled"]))
+        .order_by(summary.c.progress_pct.asc(), summary.c.assessment_id)
+        .limit(limit)
+    )
+    with (db_engine or engine).connect() as conn:
+        return pd.read_sql(query, conn)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Behaviour pulse check-ins and trajectory summaries.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_imp = sub.add_parser("import", help="Bulk check-ins from a CSV (assessment_id, check_date, new_score[, notes])")
+    p_imp.add_argument("path")
+    p_imp.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    p_ref = sub.add_parser("refresh", help="Refresh summaries for cohorts with new pulses")
+    p_ref.add_argument("--full", action="store_true", help="Recompute every summary row.")
+    args = parser.parse_args()
+
+    if args.command == "import":
+        summary = import_pulses(args.path, args.chunk_size, on_chunk=lambda t: print(
+            f"  read {t['read']:,} | inserted {t['inserted']:,} | rejected {t['rejected']:,} | {t['rows_per_sec']:,} rows/s"))
+        for row in summary["rejected_rows"]:
+            print(f"  rejected row {row['row']} (assessment {row['assessment_id']}): {row['reason']}")
+        print(f"Done: inserted {summary['inserted']:,} check-ins, rejected {summary['rejected']:,} "
+              f"in {summary.get('seconds', 0)}s ({summary.get('rows_per_sec', 0):,} rows/s).")
+    else:
+        start = time.perf_counter()
+        if args.full:
+            refreshed = rebuild_summaries()
+        else:
+            with engine.begin() as conn:
+                refreshed = refresh_summaries(conn)
+        print(f"Done: refreshed {refreshed:,} cohort summaries in {time.perf_counter() - start:.2f}s.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+# tests/conftest.py
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Point every store at a throwaway directory before any app module (and its engine) is imported
+_SCRATCH = tempfile.mkdtemp(prefix="qbe_tests_")
+for name, file_name in [("QBE_DATABASE_URL", "app.db"), ("QBE_AI_CACHE_URL", "ai_cache.db"),
+                        ("QBE_AI_TELEMETRY_URL", "ai_telemetry.db"), ("QBE_AI_JOBS_URL", "ai_jobs.db")]:
+    os.environ[name] = f"sqlite:///{os.path.join(_SCRATCH, file_name)}"
+os.environ.setdefault("QBE_AI_BACKEND", "fake")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def db_engine(tmp_path):
+    """A fresh, fully migrated main database per test."""
+    import database
+    import migrations
+    engine = database.create_app_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    migrations.upgrade(engine)
+    yield engine
+    engine.dispose()
@@ -0,0 +1,46 @@
+# tests/test_ai_logic.py
+import pytest
+
+import ai_logic
+from ai_cache import make_cache_key, response_cache
+from fake_ai_client import FakeOpenAIClient
+
+SYSTEM_PROMPT = "You are a test."
+TEMPLATE = "Summarise the cohort {cohort}."
+
+
+def _cache_key(payload: dict) -> str:
+    _, model, route = ai_logic.resolve_prompt_route(ai_logic.prompt_name_for(TEMPLATE))
+    return make_cache_key(ai_logic._cache_scope(model, route), SYSTEM_PROMPT, TEMPLATE.format(**payload))
+
+
+@pytest.fixture
+def overridden_client():
+    client = FakeOpenAIClient(response_text="fake protocol", first_token_delay=0, per_token_delay=0)
+    ai_logic.set_api_client(client)
+    yield client
+    ai_logic.set_api_client(None)
+
+
+def test_passed_client_neither_reads_nor_writes_the_cache():
+    payload = {"cohort": "passed client"}
+    response_cache.put(_cache_key(payload), "gpt-4-turbo", "real completion")
+    client = FakeOpenAIClient(response_text="fake protocol", first_token_delay=0, per_token_delay=0)
+
+    assert ai_logic.generate_completion(TEMPLATE, payload, SYSTEM_PROMPT, api_client=client) == "fake protocol"
+    assert response_cache.get(_cache_key(payload)) == "real completion"
+
+    other = {"cohort": "never cached"}
+    ai_logic.generate_completion(TEMPLATE, other, SYSTEM_PROMPT, api_client=client)
+    assert response_cache.get(_cache_key(other)) is None
+
+
+def test_set_api_client_bypasses_the_cache(overridden_client):
+    payload = {"cohort": "override"}
+    assert ai_logic.call_ai_analysis(TEMPLATE, payload, SYSTEM_PROMPT).text == "fake protocol"
+    stream = ai_logic.call_ai_analysis_stream(TEMPLATE, {"cohort": "override stream"}, SYSTEM_PROMPT)
+    assert "".join(stream) == "fake protocol"
+    assert stream.result.ok and not stream.result.cached
+
+    assert response_cache.get(_cache_key(payload)) is None
+    assert response_cache.get(_cache_key({"cohort": "override stream"})) is None
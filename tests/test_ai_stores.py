@@ -0,0 +1,65 @@
+# tests/test_ai_stores.py
+import threading
+
+import pytest
+import sqlalchemy
+
+from ai_cache import AIResponseCache, make_cache_key
+from ai_jobs import AIJobQueue
+from ai_telemetry import TelemetryWriter
+
+
+def _race(fn, threads: int = 8) -> list:
+    """Runs fn on several threads released together; returns the exceptions raised."""
+    barrier, errors = threading.Barrier(threads), []
+
+    def run():
+        barrier.wait()
+        try:
+            fn()
+        except Exception as e:
+            errors.append(e)
+
+    pool = [threading.Thread(target=run) for _ in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return errors
+
+
+@pytest.mark.parametrize("store", [AIResponseCache, AIJobQueue, TelemetryWriter])
+def test_fresh_store_initialises_once_under_concurrent_first_use(tmp_path, store):
+    instance = store(database_url=f"sqlite:///{tmp_path / 'store.db'}")
+    engines = []
+    assert _race(lambda: engines.append(instance.engine)) == []
+    assert len({id(e) for e in engines}) == 1
+
+
+def test_fresh_cache_serves_concurrent_first_requests(tmp_path):
+    cache = AIResponseCache(database_url=f"sqlite:///{tmp_path / 'cache.db'}")
+    key = make_cache_key("gpt-4-turbo", "system", "prompt")
+    assert _race(lambda: cache.get(key)) == []
+
+
+def test_idle_job_claim_only_reads(tmp_path):
+    queue = AIJobQueue(database_url=f"sqlite:///{tmp_path / 'jobs.db'}", workers=1)
+    statements = []
+    sqlalchemy.event.listen(queue.engine, "before_cursor_execute",
+                            lambda conn, cursor, statement, *args: statements.append(statement.split()[0].upper()))
+
+    assert queue._claim() is None
+    assert statements == ["SELECT"]
+
+
+def test_claim_takes_the_oldest_queued_job(tmp_path):
+    from ai_jobs import QUEUED, RUNNING, ai_generation_jobs_table
+    queue = AIJobQueue(database_url=f"sqlite:///{tmp_path / 'jobs.db'}", workers=1)
+    with queue.engine.begin() as conn:
+        conn.execute(sqlalchemy.insert(ai_generation_jobs_table), [
+            {"job_type": "ldp_protocol", "params": "{}", "status": QUEUED, "attempts": 0, "created_at": float(i)}
+            for i in range(2)])
+
+    job = queue._claim()
+    assert (job.id, job.status, job.attempts) == (1, RUNNING, 1)
+    assert queue._claim().id == 2 and queue._claim() is None
@@ -0,0 +1,36 @@
+# tests/test_compliance_rules.py
+import pytest
+from sqlalchemy import insert
+
+import logic
+import vendor_registry
+from benchmarks import REGIONS, _legacy_check_compliance_risk
+from database import vendor_registry_table
+
+EDGE_VENDORS = [
+    {"vendor_name": "Flagged Co", "compliance_rating": "Red", "data_residency_cert": "EU-GDPR"},
+    {"vendor_name": "Flagged Uncertified Co", "compliance_rating": "Red", "data_residency_cert": None},
+    {"vendor_name": "Uncertified Co", "compliance_rating": "Green", "data_residency_cert": None},
+    {"vendor_name": "Yellow GDPR Co", "compliance_rating": "Yellow", "data_residency_cert": "EU-GDPR, AUS-Privacy"},
+    {"vendor_name": "Internal Red", "compliance_rating": "Red", "data_residency_cert": "Internal"},
+]
+
+
+@pytest.fixture
+def registry(db_engine, monkeypatch):
+    """Default plus edge-case vendors, served by a registry on the test database."""
+    with db_engine.begin() as conn:
+        conn.execute(insert(vendor_registry_table), logic.DEFAULT_VENDORS)
+        conn.execute(insert(vendor_registry_table), EDGE_VENDORS)
+    monkeypatch.setattr(vendor_registry, "vendor_registry", vendor_registry.VendorRegistry(db_engine))
+    return [v["vendor_name"] for v in logic.DEFAULT_VENDORS + EDGE_VENDORS]
+
+
+def test_compiled_rules_match_legacy_check_for_every_region_and_vendor(db_engine, registry):
+    pairs = [(region, name) for region in REGIONS + ["Nowhere", None] for name in registry + ["Unregistered"]]
+    legacy = [_legacy_check_compliance_risk(region, name, db_engine) for region, name in pairs]
+
+    assert logic.check_compliance_risk_many(pairs) == legacy
+    assert [logic.check_compliance_risk(region, name) for region, name in pairs] == legacy
+    assert any(legacy) and not all(legacy) # The grid exercises both outcomes
+
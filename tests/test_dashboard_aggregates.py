@@ -0,0 +1,71 @@
+# tests/test_dashboard_aggregates.py
+import threading
+
+import pytest
+from sqlalchemy import insert, select, update
+
+import backfill_curation
+import dashboard_aggregates
+from benchmarks import make_cohorts
+from database import capability_assessments_table
+
+
+def _seed(db_engine, rows: int, maintain: bool = True):
+    cohorts = make_cohorts(rows).assign(execution_status="Planning", recommended_pathway="Stale",
+                                        estimated_budget=1)
+    records = cohorts.to_dict("records")
+    with db_engine.begin() as conn:
+        conn.execute(insert(capability_assessments_table), records)
+        if maintain:
+            dashboard_aggregates.record_inserted(conn, records)
+    with db_engine.connect() as conn:
+        return list(conn.execute(select(capability_assessments_table.c.id)).scalars())
+
+
+def _interleave(monkeypatch, second_writer):
+    """
+    Starts second_writer while the first writer is between its UPDATE and its commit, and
+    gives it time to read the rows before the first writer commits.
+    """
+    record_changed = dashboard_aggregates.record_changed
+    threads = []
+
+    def first_writer_paused(conn, before, after):
+        if not threads:
+            threads.append(threading.Thread(target=second_writer))
+            threads[0].start()
+            threads[0].join(0.5)
+        record_changed(conn, before, after)
+
+    monkeypatch.setattr(dashboard_aggregates, "record_changed", first_writer_paused)
+    return threads
+
+
+@pytest.mark.parametrize("first_writer", ["status change", "backfill"])
+def test_interleaved_writers_leave_no_drift(db_engine, monkeypatch, first_writer):
+    ids = _seed(db_engine, 200)
+    threads = _interleave(monkeypatch, lambda: dashboard_aggregates.update_execution_status(
+        ids[:50], "Scaling", db_engine=db_engine))
+
+    if first_writer == "backfill":
+        backfill_curation.backfill(progress=False, db_engine=db_engine)
+    else:
+        dashboard_aggregates.update_execution_status(ids[:100], "Complete", db_engine=db_engine)
+    threads[0].join()
+
+    assert dashboard_aggregates.check_consistency(db_engine).empty
+    counts = dashboard_aggregates.status_counts(dashboard_aggregates.load_aggregates(db_engine))
+    assert counts.get("Scaling") == 50
+
+
+def test_unbuilt_table_is_not_reported_as_drift(db_engine):
+    _seed(db_engine, 300, maintain=False) # As if the cohorts predate migration 6
+    with db_engine.connect() as conn:
+        assert not dashboard_aggregates.is_built(conn)
+    assert dashboard_aggregates.check_consistency(db_engine).empty
+
+    assert dashboard_aggregates.load_aggregates(db_engine)["cohort_count"].sum() == 300 # Builds it
+    with db_engine.begin() as conn:
+        conn.execute(update(capability_assessments_table).where(capability_assessments_table.c.id == 1)
+                     .values(execution_status="Complete")) # Behind the aggregates' back
+    assert len(dashboard_aggregates.check_consistency(db_engine)) == 2
@@ -0,0 +1,89 @@
+# tests/test_data_export.py
+import os
+
+import pandas as pd
+import pytest
+from sqlalchemy import func, insert, select
+
+import data_export
+from benchmarks import make_cohorts
+from database import capability_assessments_table
+
+
+def _seed(db_engine, rows: int, seed: int = 7):
+    cohorts = make_cohorts(rows, seed=seed)
+    cohorts.loc[::50, "region"] = None # Some cohorts without a region
+    with db_engine.begin() as conn:
+        conn.execute(insert(capability_assessments_table), cohorts.astype(object).where(cohorts.notna(), None).to_dict("records"))
+
+
+def _part_files(directory: str) -> list:
+    return sorted(os.path.join(root, f) for root, _, files in os.walk(directory) for f in files if f.startswith("part-"))
+
+
+def test_region_partitioned_export_reads_back_with_pandas(db_engine, tmp_path):
+    _seed(db_engine, 3000)
+    out_dir = str(tmp_path / "exports")
+    data_export.export_tables(out_dir, ["capability_assessments"], partition_by="region", db_engine=db_engine)
+
+    exported = pd.read_parquet(os.path.join(out_dir, "capability_assessments"))
+    with db_engine.connect() as conn:
+        source = pd.read_sql(select(capability_assessments_table), conn)
+    assert len(exported) == len(source)
+    assert sorted(exported["id"]) == sorted(source["id"])
+    merged = source.merge(exported[["id", "region"]], on="id", suffixes=("", "_exported"))
+    expected = merged["region"].fillna(data_export.UNKNOWN_PARTITION)
+    assert (merged["region_exported"].astype(str) == expected).all()
+
+
+def test_failed_table_keeps_earlier_tables_watermark(db_engine, tmp_path, monkeypatch):
+    _seed(db_engine, 500)
+    out_dir = str(tmp_path / "exports")
+    real_export_table = data_export.export_table
+
+    def fail_on_diagnostics(conn, name, *args, **kwargs):
+        if name == "individual_diagnostics":
+            raise RuntimeError("disk full")
+        return real_export_table(conn, name, *args, **kwargs)
+
+    monkeypatch.setattr(data_export, "export_table", fail_on_diagnostics)
+    with pytest.raises(RuntimeError):
+        data_export.export_tables(out_dir, db_engine=db_engine)
+    assert data_export.load_manifest(out_dir)["capability_assessments"]["last_id"] == 500
+
+    monkeypatch.setattr(data_export, "export_table", real_export_table)
+    summary = data_export.export_tables(out_dir, db_engine=db_engine)
+    assert summary["tables"]["capability_assessments"]["rows"] == 0 # Nothing exported twice
+    assert len(pd.read_parquet(os.path.join(out_dir, "capability_assessments"))) == 500
+
+
+def test_failed_full_export_keeps_previous_export(db_engine, tmp_path, monkeypatch):
+    _seed(db_engine, 500)
+    out_dir = str(tmp_path / "exports")
+    data_export.export_tables(out_dir, ["capability_assessments"], chunk_size=100, db_engine=db_engine)
+    table_dir = os.path.join(out_dir, "capability_assessments")
+    files_before, manifest_before = _part_files(table_dir), data_export.load_manifest(out_dir)
+    _seed(db_engine, 200, seed=8)
+
+    real_read_chunks = data_export.read_chunks
+
+    def fail_midway(*args, **kwargs):
+        for i, chunk in enumerate(real_read_chunks(*args, **kwargs)):
+            if i == 2:
+                raise RuntimeError("killed")
+            yield chunk
+
+    monkeypatch.setattr(data_export, "read_chunks", fail_midway)
+    with pytest.raises(RuntimeError):
+        data_export.export_tables(out_dir, ["capability_assessments"], full=True, chunk_size=100, db_engine=db_engine)
+    assert _part_files(table_dir) == files_before
+    assert data_export.load_manifest(out_dir) == manifest_before
+    assert len(pd.read_parquet(table_dir)) == 500
+
+    monkeypatch.setattr(data_export, "read_chunks", real_read_chunks)
+    data_export.export_tables(out_dir, ["capability_assessments"], chunk_size=100, db_engine=db_engine)
+    exported = pd.read_parquet(table_dir)
+    with db_engine.connect() as conn:
+        total = conn.execute(select(func.count()).select_from(capability_assessments_table)).scalar()
+    assert len(exported) == total == 700 and exported["id"].is_unique
+    assert not [e for e in os.listdir(out_dir) if e.startswith(".")] # No staging leftovers
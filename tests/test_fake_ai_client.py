@@ -0,0 +1,23 @@
+# tests/test_fake_ai_client.py
+from concurrent.futures import ThreadPoolExecutor
+
+from fake_ai_client import FakeAPIError, FakeOpenAIClient
+
+MESSAGES = [{"role": "user", "content": "Hello there"}]
+
+
+def test_exactly_fail_times_concurrent_calls_fail():
+    client = FakeOpenAIClient(first_token_delay=0, per_token_delay=0, fail_times=25, max_recorded_calls=10)
+
+    def call(_):
+        try:
+            client.chat.completions.create(messages=MESSAGES, model="fake-model")
+        except FakeAPIError:
+            return False
+        return True
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        outcomes = list(pool.map(call, range(200)))
+    assert outcomes.count(False) == 25
+    assert client.call_count == 200
+    assert len(client.calls) == 10 # Bounded: only the most recent calls are kept
@@ -0,0 +1,36 @@
+# tests/test_migrations.py
+import threading
+
+import sqlalchemy
+
+import database
+import migrations
+
+
+def test_concurrent_add_column_converges(tmp_path):
+    url = f"sqlite:///{tmp_path / 'old.db'}"
+    with database.create_app_engine(url).begin() as conn: # vendor_registry from before the status column
+        conn.exec_driver_sql('CREATE TABLE vendor_registry (id INTEGER PRIMARY KEY, vendor_name VARCHAR)')
+
+    engines = [database.create_app_engine(url) for _ in range(6)] # One per "process"
+    barrier, results, errors = threading.Barrier(len(engines)), [], []
+
+    def start(db_engine):
+        barrier.wait()
+        try:
+            results.append(migrations.add_column(db_engine, database.vendor_registry_table, "status"))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=start, args=(e,)) for e in engines]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    assert sorted(results) == [False] * (len(engines) - 1) + [True]
+    columns = [c["name"] for c in sqlalchemy.inspect(engines[0]).get_columns("vendor_registry")]
+    assert columns.count("status") == 1
+    for db_engine in engines:
+        db_engine.dispose()
@@ -0,0 +1,26 @@
+# tests/test_vendor_registry.py
+from sqlalchemy import insert, update
+
+import logic
+from database import capability_assessments_table, vendor_registry_table
+from vendor_registry import VendorRegistry
+
+
+def test_reloads_on_vendor_writes_only(db_engine):
+    registry = VendorRegistry(db_engine)
+    assert registry.snapshot() == {}
+    with db_engine.begin() as conn:
+        conn.execute(insert(vendor_registry_table), logic.DEFAULT_VENDORS)
+    assert set(registry.vendor_names()) == {v["vendor_name"] for v in logic.DEFAULT_VENDORS}
+    loaded = registry.version
+
+    with db_engine.begin() as conn: # Other tables' commits don't touch the registry
+        conn.execute(insert(capability_assessments_table).values(cohort_name="Unrelated", region="Europe"))
+    registry.snapshot()
+    assert registry.version == loaded
+
+    with db_engine.begin() as conn: # An out-of-band UPDATE, no invalidate()
+        conn.execute(update(vendor_registry_table).where(vendor_registry_table.c.vendor_name == "Microsoft")
+                     .values(data_residency_cert="US-Only"))
+    assert registry.get("Microsoft")["data_residency_cert"] == "US-Only"
+    assert registry.version == loaded + 1
@@ -0,0 +1,195 @@
+# text_processing.py
+"""
+Token counting, de-duplication and token-budgeted chunking for the comment analysers
+(run_friction_analysis / run_survey_analysis).
+"""
+import re
+import zlib
+from dataclasses import dataclass
+
+import numpy as np
+
+# 1. Token Counting
+# tiktoken gives exact counts for OpenAI models; it is optional because it downloads its
+# BPE tables on first use. Without it we count cl100k-style pre-tokenizer pieces (words
+# with their leading space, 1-3 digit runs, punctuation runs), which tracks real BPE
+# counts closely for English prose and never under-counts short words.
+_PRETOKEN_PATTERN = re.compile(r"""'s|'t|'re|'ve|'m|'ll|'d| ?[^\W\d_]+| ?\d{1,3}| ?[^\s\w]+|\s+(?!\S)|\s+""")
+_ENCODINGS = {}
+
+
+def _get_encoding(model: str):
+    if model not in _ENCODINGS:
+        try:
+            import tiktoken
+            try:
+                _ENCODINGS[model] = tiktoken.encoding_for_model(model)
+            except KeyError:
+                _ENCODINGS[model] = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _ENCODINGS[model] = None # Not installed, or BPE tables unavailable offline
+    return _ENCODINGS[model]
+
+
+def count_tokens(text: str, model: str = "gpt-4-turbo") -> int:
+    """Number of model tokens in `text`."""
+    encoding = _get_encoding(model)
+    if encoding is not None:
+        return len(encoding.encode_ordinary(text))
+    return len(_PRETOKEN_PATTERN.findall(text))
+
+
+def count_tokens_many(texts: list, model: str = "gpt-4-turbo") -> list:
+    """Batch token counts (uses tiktoken's multi-threaded batch encoder when available)."""
+    encoding = _get_encoding(model)
+    if encoding is not None:
+        return [len(tokens) for tokens in encoding.encode_ordinary_batch(texts)]
+    return [len(_PRETOKEN_PATTERN.findall(text)) for text in texts]
+
+
+# 2. Near-Duplicate Collapsing (MinHash + LSH, no network model)
+_NON_WORD = re.compile(r"[^\w\s]+")
+_WHITESPACE = re.compile(r"\s+")
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+MINHASH_PERMUTATIONS = 64
+LSH_BANDS = 16               # 16 bands x 4 rows: pairs above ~0.5 Jaccard become candidates
+NEAR_DUPLICATE_THRESHOLD = 0.7  # Estimated Jaccard needed to merge a candidate pair
+MINHASH_BATCH_SHINGLES = 2_000_000  # Bounds memory of the permutation step
+
+
+def normalize_comment(text: str) -> str:
+    """Lower-cases, strips punctuation and collapses whitespace."""
+    return _WHITESPACE.sub(" ", _NON_WORD.sub(" ", str(text).lower())).strip()
+
+
+def _shingle_hashes(normalized: str) -> list:
+    """Stable 32-bit hashes of the word bigrams (single word for one-word comments)."""
+    words = normalized.split(" ")
+    shingles = [" ".join(words[i:i + 2]) for i in range(len(words) - 1)] or words
+    return [zlib.crc32(s.encode("utf-8")) for s in shingles]
+
+
+def _minhash_signatures(docs: list, num_perm: int, seed: int = 1) -> np.ndarray:
+    """(n_docs x num_perm) MinHash signatures, computed in shingle batches with NumPy."""
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 1 << 32, size=num_perm, dtype=np.uint64)
+    b = rng.integers(0, 1 << 32, size=num_perm, dtype=np.uint64)
+
+    hashes = [_shingle_hashes(doc) for doc in docs]
+    lengths = np.fromiter((len(h) for h in hashes), dtype=np.int64, count=len(hashes))
+    flat = np.fromiter((x for h in hashes for x in h), dtype=np.uint64, count=int(lengths.sum()))
+    offsets = np.concatenate(([0], np.cumsum(lengths)))
+
+    signatures = np.empty((len(docs), num_perm), dtype=np.uint64)
+    start_doc = 0
+    while start_doc < len(docs):
+        # Grow the batch until it holds ~MINHASH_BATCH_SHINGLES shingles
+        end_doc = int(np.searchsorted(offsets, offsets[start_doc] + MINHASH_BATCH_SHINGLES, side="right")) - 1
+        end_doc = min(max(end_doc, start_doc + 1), len(docs))
+        lo, hi = offsets[start_doc], offsets[end_doc]
+        with np.errstate(over="ignore"):
+            permuted = ((flat[lo:hi, None] * a + b) % _MERSENNE_PRIME) & _MAX_HASH
+        signatures[start_doc:end_doc] = np.minimum.reduceat(permuted, offsets[start_doc:end_doc] - lo, axis=0)
+        start_doc = end_doc
+    return signatures
+
+
+@dataclass
+class CollapsedComments:
+    representatives: list  # One original comment per cluster, in first-seen order
+    counts: list           # How many input comments each representative stands for
+    input_count: int
+
+    @property
+    def reduction_ratio(self) -> float:
+        """Fraction of the input removed (0.0 = nothing collapsed)."""
+        return 1 - len(self.representatives) / self.input_count if self.input_count else 0.0
+
+    def as_bullets(self) -> list:
+        """Representatives annotated with their frequency, ready for a prompt."""
+        return [text if n == 1 else f"{text} (repeated {n} times)" for text, n in zip(self.representatives, self.counts)]
+
+
+def collapse_near_duplicates(comments, threshold: float = NEAR_DUPLICATE_THRESHOLD,
+                             num_perm: int = MINHASH_PERMUTATIONS, bands: int = LSH_BANDS) -> CollapsedComments:
+    """
+    Clusters exact and near-duplicate comments and keeps one representative per cluster.
+    Normalised-exact duplicates are grouped first; the distinct forms are then MinHashed and
+    LSH-banded. Each candidate is compared only with its bucket's first member, so the work
+    is linear in the number of comments.
+    """
+    originals = [str(c).strip() for c in comments]
+    originals = [c for c in originals if c]
+    if not originals:
+        return CollapsedComments([], [], 0)
+
+    # 1. Exact duplicates after normalisation
+    form_index, forms, form_first, form_of_comment = {}, [], [], []
+    for i, text in enumerate(originals):
+        form = normalize_comment(text) or text
+        if form not in form_index:
+            form_index[form] = len(forms)
+            forms.append(form)
+            form_first.append(i)
+        form_of_comment.append(form_index[form])
+
+    # 2. MinHash + LSH over the distinct forms
+    parent = np.arange(len(forms))
+
+    def find(x):
+        root = x
+        while parent[root] != root:
+            root = parent[root]
+        while parent[x] != root:
+            parent[x], x = root, parent[x]
+        return root
+
+    if len(forms) > 1:
+        signatures = _minhash_signatures(forms, num_perm)
+        rows = num_perm // bands
+        for band in range(bands):
+            band_keys = np.ascontiguousarray(signatures[:, band * rows:(band + 1) * rows]).view(
+                np.dtype((np.void, rows * 8))).ravel()
+            _, first_in_bucket, bucket_of = np.unique(band_keys, return_index=True, return_inverse=True)
+            leaders = first_in_bucket[bucket_of.ravel()]
+            candidates = np.flatnonzero(leaders != np.arange(len(forms)))
+            if candidates.size == 0:
+                continue
+            similarity = (signatures[candidates] == signatures[leaders[candidates]]).mean(axis=1)
+            for doc, leader in zip(candidates[similarity >= threshold], leaders[candidates[similarity >= threshold]]):
+                root_doc, root_leader = find(doc), find(leader)
+                if root_doc != root_leader:
+                    parent[max(root_doc, root_leader)] = min(root_doc, root_leader)
+
+    # 3. One representative (first-seen comment) and a count per cluster
+    cluster_of_form = np.array([find(f) for f in range(len(forms))])
+    cluster_of_comment = cluster_of_form[np.array(form_of_comment)]
+    clusters, counts = np.unique(cluster_of_comment, return_counts=True)
+    order = np.argsort([form_first[c] for c in clusters], kind="stable")
+    return CollapsedComments(
+        representatives=[originals[form_first[clusters[i]]] for i in order],
+        counts=[int(counts[i]) for i in order],
+        input_count=len(originals),
+    )
+
+
+# 3. Token-Budgeted Chunking
+def chunk_by_tokens(items: list, token_budget: int, model: str = "gpt-4-turbo",
+                    prefix: str = "- ", separator: str = "\n") -> list:
+    """
+    Greedily packs items into chunks whose rendered bullet list stays within token_budget.
+    An item that alone exceeds the budget is placed in a chunk of its own.
+    """
+    costs = count_tokens_many([prefix + item + separator for item in items], model)
+    chunks, current, used = [], [], 0
+    for item, cost in zip(items, costs):
+        if current and used + cost > token_budget:
+            chunks.append(current)
+            current, used = [], 0
+        current.append(item)
+        used += cost
+    if current:
+        chunks.append(current)
+    return chunks
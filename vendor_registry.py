@@ -0,0 +1,77 @@
+# vendor_registry.py
+import threading
+
+from sqlalchemy import select
+
+from compliance_rules import CompiledRules
+from database import engine, vendor_registry_table, vendor_registry_version_table
+
+
+# 1. The Registry Service
+class VendorRegistry:
+    """
+    In-memory vendor_registry keyed by vendor_name.
+    Loaded once, and reloaded only when the table changes: each read checks the
+    vendor_registry_version row, which triggers bump on any vendor write (writes to
+    other tables don't move it). invalidate() forces a reload (e.g. for non-SQLite engines).
+    """
+
+    def __init__(self, db_engine=engine):
+        self.engine = db_engine
+        self.vendors = {}
+        self.version = 0  # Bumped on each reload
+        self._registry_version = None
+        self._stale = True
+        self._compiled = None  # (registry version, rules id, CompiledRules)
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        with self._lock:
+            self._stale = True
+
+    def _current_registry_version(self, conn):
+        if self.engine.dialect.name != "sqlite":
+            return None # No version triggers (see migrations.py)
+        return conn.execute(select(vendor_registry_version_table.c.version)).scalar()
+
+    def _ensure_fresh(self):
+        with self.engine.connect() as conn:
+            registry_version = self._current_registry_version(conn)
+            if not self._stale and registry_version == self._registry_version:
+                return
+            rows = conn.execute(select(vendor_registry_table).order_by(vendor_registry_table.c.id)).mappings().all()
+        # First row wins on duplicate names, matching the old .iloc[0] lookup
+        vendors = {}
+        for row in rows:
+            vendors.setdefault(row["vendor_name"], dict(row))
+
+        self.vendors = vendors
+        self._registry_version = registry_version
+        self._stale = False
+        self.version += 1
+
+    def snapshot(self) -> dict:
+        """Returns the current {vendor_name: row} mapping, reloading first if the table changed."""
+        with self._lock:
+            self._ensure_fresh()
+            return self.vendors
+
+    def get(self, vendor_name: str):
+        """O(1) vendor lookup; None if the vendor is not registered."""
+        return self.snapshot().get(vendor_name)
+
+    def vendor_names(self) -> list:
+        return list(self.snapshot().keys())
+
+    def compiled_rules(self, rules: list) -> CompiledRules:
+        """Compliance rules compiled against the current vendor certifications (recompiled on reload)."""
+        vendors = self.snapshot()
+        with self._lock:
+            if self._compiled is None or self._compiled[:2] != (self.version, id(rules)):
+                certs = {v["data_residency_cert"] for v in vendors.values()}
+                self._compiled = (self.version, id(rules), CompiledRules(rules, certs))
+            return self._compiled[2]
+
+
+# Shared process-wide instance
+vendor_registry = VendorRegistry()